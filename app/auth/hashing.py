@@ -0,0 +1,99 @@
+import asyncio
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# bcrypt costs ~250ms of CPU per call. Running it inline in an async handler
+# freezes the event loop, so hashing and verification go through a bounded pool.
+# "thread" works because bcrypt releases the GIL; "process" isolates the CPU work
+# completely at the cost of pickling the arguments.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Calls waiting for a worker beyond this are rejected with 503 instead of queueing forever
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+class PasswordHashingPool:
+    def __init__(self, kind: str = PASSWORD_HASH_EXECUTOR, workers: int = PASSWORD_HASH_WORKERS, max_pending: int = PASSWORD_HASH_MAX_PENDING):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._slots = None
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    def _get_executor(self):
+        if self._executor is None:
+            executor_class = ThreadPoolExecutor if self.kind == "thread" else ProcessPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Authentication is busy, retry shortly", headers={"Retry-After": "1"})
+        loop = asyncio.get_event_loop()
+        if self._slots is None or self._slots[0] is not loop:
+            self._slots = (loop, asyncio.Semaphore(self.workers))
+        self.pending += 1
+        queued_at = time.perf_counter()
+        try:
+            async with self._slots[1]:
+                wait = time.perf_counter() - queued_at
+                self.total_wait_s += wait
+                self.max_wait_s = max(self.max_wait_s, wait)
+                self._recent_waits.append(wait)
+                self.active += 1
+                try:
+                    return await loop.run_in_executor(self._get_executor(), fn, *args)
+                finally:
+                    self.active -= 1
+                    self.completed += 1
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        waits = sorted(self._recent_waits)
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "active": self.active,
+            "queued": self.pending - self.active,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "mean_wait_ms": round(self.total_wait_s / self.completed * 1000, 3) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait_s * 1000, 3),
+            "recent_p99_wait_ms": round(waits[int(len(waits) * 0.99)] * 1000, 3) if waits else 0.0,
+        }
+
+password_pool = PasswordHashingPool()
+
+async def hash_password(password: str) -> str:
+    return await password_pool.run(hash_password_sync, password)
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_pool.run(verify_password_sync, plain_password, hashed_password)
@@ -0,0 +1,62 @@
+from enum import IntFlag
+from uuid import UUID
+
+class Permission(IntFlag):
+    """What a caller may do; granted through roles and carried in the token's "perm" claim as a bitmask."""
+    ORGANIZATIONS_READ = 1 << 0
+    ORGANIZATIONS_MANAGE = 1 << 1
+    HOSPITALS_READ = 1 << 2
+    DEPARTMENTS_READ = 1 << 3
+    PROVIDERS_READ = 1 << 4
+    # Create and update hospitals, departments and providers
+    FACILITIES_WRITE = 1 << 5
+    FACILITIES_DELETE = 1 << 6
+    PATIENTS_READ = 1 << 7
+    PATIENTS_WRITE = 1 << 8
+    PATIENTS_DELETE = 1 << 9
+    # Bulk import and $export
+    PATIENTS_BULK = 1 << 10
+    HL7_SEND = 1 << 11
+    USERS_READ = 1 << 12
+    USERS_MANAGE = 1 << 13
+    ROLES_READ = 1 << 14
+    ROLES_MANAGE = 1 << 15
+    SYSTEM_STATS = 1 << 16
+    # Act on organizations other than one's own
+    ALL_ORGANIZATIONS = 1 << 17
+
+ALL_PERMISSIONS = Permission(sum(Permission))
+
+_CLINICAL = Permission.PATIENTS_READ | Permission.PATIENTS_WRITE | Permission.DEPARTMENTS_READ | Permission.PROVIDERS_READ
+
+# Permissions of each role, by role name; roles not listed have none
+ROLE_PERMISSIONS = {
+    "System Administrator": ALL_PERMISSIONS,
+    "HIM Specialist": (
+        _CLINICAL | Permission.ORGANIZATIONS_READ | Permission.HOSPITALS_READ | Permission.FACILITIES_WRITE
+        | Permission.PATIENTS_DELETE | Permission.PATIENTS_BULK | Permission.HL7_SEND
+        | Permission.USERS_READ | Permission.ROLES_READ
+    ),
+    "Physician": _CLINICAL | Permission.HOSPITALS_READ,
+    "Nurse": _CLINICAL | Permission.HOSPITALS_READ,
+    "Medical Assistant": _CLINICAL,
+    "Compliance Officer": Permission.ORGANIZATIONS_READ,
+}
+
+def permissions_for_role(role_name: str) -> Permission:
+    return ROLE_PERMISSIONS.get(role_name, Permission(0))
+
+class Principal:
+    """The authenticated caller as described by a verified access token; no database row behind it."""
+
+    __slots__ = ("user_id", "username", "organization_id", "role_id", "permissions")
+
+    def __init__(self, user_id: UUID, username: str, organization_id: UUID, role_id: UUID, permissions: Permission):
+        self.user_id = user_id
+        self.username = username
+        self.organization_id = organization_id
+        self.role_id = role_id
+        self.permissions = permissions
+
+    def has(self, required: Permission) -> bool:
+        return self.permissions & required == required
@@ -0,0 +1,28 @@
+import os
+from uuid import UUID
+from app.cache import TTLLRUCache
+
+# Authenticated users keyed by token subject (username), with the role loaded.
+# Entries are pydantic snapshots, never ORM instances, so they are safe to share
+# between requests. The cache is per process: other workers see changes once
+# their entry expires, so keep the TTL short.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+
+# How long a user's token_version may be served from memory. The cache is per process and
+# only the worker that revokes a user's tokens clears its entry: every other worker keeps
+# accepting the revoked tokens for up to this many seconds. Lower it to shorten that window
+# at the cost of one users.token_version lookup per request per expiry.
+TOKEN_VERSION_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_VERSION_CACHE_TTL_SECONDS", "30"))
+
+principal_cache = TTLLRUCache(max_size=PRINCIPAL_CACHE_MAX_SIZE, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS)
+# user_id -> users.token_version, checked against the "ver" claim of every token
+token_versions = TTLLRUCache(max_size=PRINCIPAL_CACHE_MAX_SIZE, ttl_seconds=TOKEN_VERSION_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: UUID):
+    principal_cache.invalidate_where(lambda user: user.user_id == user_id)
+    token_versions.pop(user_id)
+
+def invalidate_role(role_id: UUID):
+    principal_cache.invalidate_where(lambda user: user.role_id == role_id)
+    token_versions.clear()
@@ -1,14 +1,17 @@
 
 from datetime import datetime, timedelta
 from typing import Optional
+from uuid import UUID
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.crud import user as crud_user
-from app.schemas.user import UserInDB
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.aio import user as crud_user
+from app.schemas.user import User, UserInDB
+from app.auth import hashing
+from app.auth.permissions import Permission, Principal, permissions_for_role
+from app.auth.principal_cache import principal_cache, token_versions
+from app.database import get_async_db
 
 # to get a string like this run:
 # openssl rand -hex 32
@@ -16,23 +19,33 @@ SECRET_KEY = "782599316a2f5c2e818445a6488e74ffe18142b4b278ca31dd1e9a91280ff0c7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_password_sync(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hashing.hash_password_sync(password)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = crud_user.get_user_by_username(db, username)
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await crud_user.get_user_by_username(db, username)
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await hashing.verify_password(password, user.password_hash):
         return False
     return user
 
+def token_claims(user) -> dict:
+    """Claims that let requests be authorized without loading the user: tenant, role, permissions and token version."""
+    return {
+        "sub": user.username,
+        "uid": str(user.user_id),
+        "org": str(user.organization_id),
+        "rid": str(user.role_id),
+        "perm": int(permissions_for_role(user.role.name)),
+        "ver": user.token_version,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -43,7 +56,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -54,14 +67,73 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-    except JWTError:
+        # Tokens issued before the "org" claim existed are still accepted
+        organization_id = UUID(payload["org"]) if payload.get("org") else None
+    except (JWTError, ValueError):
         raise credentials_exception
-    user = crud_user.get_user_by_username(db, username=username)
+    user = principal_cache.get(username)
     if user is None:
-        raise credentials_exception
+        db_user = await crud_user.get_user_by_username(db, username=username, organization_id=organization_id)
+        if db_user is None:
+            raise credentials_exception
+        user = User.from_orm(db_user)
+        principal_cache.set(username, user)
     return user
 
 async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)):
     if current_user.status != "active":
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def current_token_version(db: AsyncSession, user_id: UUID, organization_id: UUID) -> Optional[int]:
+    version = token_versions.get(user_id)
+    if version is None:
+        version = await crud_user.get_token_version(db, user_id, organization_id)
+        if version is not None:
+            token_versions.set(user_id, version)
+    return version
+
+async def get_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    """The caller as stated by the token's claims; the only lookup is the (cached) token version."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if "perm" not in payload:
+        # Tokens issued before permission claims existed: derive them from the stored role
+        user = await get_current_active_user(await get_current_user(token, db))
+        return Principal(user.user_id, user.username, user.organization_id, user.role_id, permissions_for_role(user.role.name))
+    try:
+        principal = Principal(UUID(payload["uid"]), payload["sub"], UUID(payload["org"]), UUID(payload["rid"]), Permission(int(payload["perm"])))
+        version = int(payload["ver"])
+    except (KeyError, TypeError, ValueError):
+        raise credentials_exception
+    # Role, status and password changes bump the stored version and so revoke older tokens
+    if await current_token_version(db, principal.user_id, principal.organization_id) != version:
+        raise credentials_exception
+    return principal
+
+def require_permissions(*required: Permission):
+    """Dependency that admits callers whose token grants every permission in `required`."""
+    needed = Permission(0)
+    for permission in required:
+        needed |= permission
+
+    async def check(principal: Principal = Depends(get_principal)) -> Principal:
+        if not principal.has(needed):
+            raise HTTPException(status_code=403, detail="Not enough permissions")
+        return principal
+    return check
+
+def resolve_organization_id(current_user: Principal, organization_id: Optional[UUID] = None) -> UUID:
+    """Scope a request to the caller's organization; only callers with ALL_ORGANIZATIONS may name another one."""
+    if organization_id is None or organization_id == current_user.organization_id:
+        return current_user.organization_id
+    if not current_user.has(Permission.ALL_ORGANIZATIONS):
+        raise HTTPException(status_code=403, detail="Not enough permissions for this organization")
+    return organization_id
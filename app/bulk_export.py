@@ -0,0 +1,236 @@
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Optional
+from uuid import UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.future import select
+from app.interoperability import patient_to_fhir
+from app.models.patient import Patient
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "infoctor_exports"))
+# Finished (or abandoned) jobs and their files are removed after this long without changes
+EXPORT_RETENTION_SECONDS = float(os.getenv("EXPORT_RETENTION_SECONDS", "86400"))
+JOB_STATE_FILE = "job.json"
+# Rows fetched per round trip from the server-side cursor
+EXPORT_FETCH_SIZE = 1000
+# Resources per output file; larger exports are split across several files
+EXPORT_FILE_MAX_RESOURCES = 100000
+# Compressed bytes buffered before a chunk is handed to the response or file
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+NDJSON_MEDIA_TYPE = "application/fhir+ndjson"
+
+def patient_export_query(organization_id: UUID, since: Optional[datetime] = None):
+    # Plain column rows instead of ORM entities: nothing accumulates in the session's identity map
+    stmt = select(*Patient.__table__.c).where(Patient.organization_id == organization_id)
+    if since is not None:
+        stmt = stmt.where(Patient.updated_at >= since)
+    return stmt.execution_options(stream_results=True, max_row_buffer=EXPORT_FETCH_SIZE)
+
+async def iter_patient_resources(db: AsyncSession, organization_id: UUID, since: Optional[datetime] = None) -> AsyncIterator[dict]:
+    """Yield FHIR Patient resources for one organization, reading through a server-side cursor."""
+    result = await db.stream(patient_export_query(organization_id, since))
+    async for partition in result.partitions(EXPORT_FETCH_SIZE):
+        for row in partition:
+            yield patient_to_fhir(row)
+
+async def gzip_ndjson(resources: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Encode resources as gzip-compressed NDJSON, emitting bounded chunks as they fill up."""
+    compressor = zlib.compressobj(wbits=31)
+    pending = []
+    pending_size = 0
+    async for resource in resources:
+        data = compressor.compress((json.dumps(resource, separators=(",", ":")) + "\n").encode())
+        if data:
+            pending.append(data)
+            pending_size += len(data)
+        if pending_size >= EXPORT_CHUNK_SIZE:
+            yield b"".join(pending)
+            pending, pending_size = [], 0
+    pending.append(compressor.flush())
+    yield b"".join(pending)
+
+class ExportJob:
+    """An asynchronous export. Its state is kept in `job.json` next to its files, so any worker
+    sharing EXPORT_DIR can answer status polls and downloads, not only the one running it."""
+
+    def __init__(self, organization_id: UUID, request_url: str, since: Optional[datetime] = None):
+        self.job_id = uuid.uuid4().hex
+        self.organization_id = organization_id
+        self.request_url = request_url
+        self.since = since
+        self.transaction_time = datetime.now(timezone.utc)
+        self.status = "in-progress"
+        self.exported = 0
+        self.files = []
+        self.error = None
+        self.task = None
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(EXPORT_DIR, self.job_id)
+
+    def manifest(self, base_url: str) -> dict:
+        return {
+            "transactionTime": self.transaction_time.isoformat(),
+            "request": self.request_url,
+            "requiresAccessToken": True,
+            "output": [
+                {"type": "Patient", "url": f"{base_url}bulkfiles/{self.job_id}/{name}", "count": count}
+                for name, count in self.files
+            ],
+            "error": [],
+        }
+
+    def save(self) -> bool:
+        """Write the state file atomically; False once the job's directory is gone (deleted or expired)."""
+        state = {
+            "job_id": self.job_id, "organization_id": str(self.organization_id), "request_url": self.request_url,
+            "transaction_time": self.transaction_time.isoformat(), "status": self.status, "exported": self.exported,
+            "files": self.files, "error": self.error,
+        }
+        path = os.path.join(self.directory, JOB_STATE_FILE)
+        try:
+            with open(path + ".tmp", "w") as f:
+                json.dump(state, f)
+            os.replace(path + ".tmp", path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @classmethod
+    def load(cls, job_id: str) -> Optional["ExportJob"]:
+        try:
+            with open(os.path.join(EXPORT_DIR, job_id, JOB_STATE_FILE)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls(UUID(state["organization_id"]), state["request_url"])
+        job.job_id = state["job_id"]
+        job.transaction_time = datetime.fromisoformat(state["transaction_time"])
+        job.status, job.exported, job.error = state["status"], state["exported"], state["error"]
+        job.files = [tuple(item) for item in state["files"]]
+        return job
+
+# Jobs started by this process; others are read from their state file
+EXPORT_JOBS = {}
+
+class _NdjsonGzipFile:
+    def __init__(self, path: str):
+        self.name = os.path.basename(path)
+        self.count = 0
+        self._file = gzip.open(path, "wb")
+
+    def write(self, resource: dict):
+        self._file.write((json.dumps(resource, separators=(",", ":")) + "\n").encode())
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        return self.name, self.count
+
+class _JobOutput:
+    """Rolls the job's resources over files of at most EXPORT_FILE_MAX_RESOURCES; used from a worker thread."""
+
+    def __init__(self, job: ExportJob):
+        self.job = job
+        self.file = None
+
+    def write(self, rows: list):
+        for row in rows:
+            if self.file is None or self.file.count >= EXPORT_FILE_MAX_RESOURCES:
+                self.finish()
+                self.file = _NdjsonGzipFile(os.path.join(self.job.directory, f"Patient.{len(self.job.files) + 1}.ndjson.gz"))
+            self.file.write(patient_to_fhir(row))
+        self.job.exported += len(rows)
+        return self.job.save()
+
+    def finish(self):
+        if self.file is not None:
+            self.job.files.append(self.file.close())
+            self.file = None
+
+    def abort(self):
+        if self.file is not None:
+            self.file.close()
+
+async def run_export_job(job: ExportJob, session_factory):
+    # Conversion, compression and file writes run in the thread pool, one fetched partition at a time,
+    # so a large export does not stall the event loop
+    await run_in_threadpool(os.makedirs, job.directory, exist_ok=True)
+    await run_in_threadpool(job.save)
+    output = _JobOutput(job)
+    try:
+        async with session_factory() as db:
+            result = await db.stream(patient_export_query(job.organization_id, job.since))
+            async for partition in result.partitions(EXPORT_FETCH_SIZE):
+                if not await run_in_threadpool(output.write, partition):
+                    # Deleted (possibly through another worker) while running
+                    job.status = "cancelled"
+                    return
+        await run_in_threadpool(output.finish)
+        job.status = "completed"
+    except asyncio.CancelledError:
+        job.status = "cancelled"
+        raise
+    except Exception as e:
+        job.status = "error"
+        job.error = str(e)
+    finally:
+        output.abort()
+        if job.status != "cancelled":
+            await run_in_threadpool(job.save)
+
+def start_export_job(job: ExportJob, session_factory) -> ExportJob:
+    EXPORT_JOBS[job.job_id] = job
+    job.task = asyncio.get_event_loop().create_task(run_export_job(job, session_factory))
+    return job
+
+def get_export_job(job_id: str) -> Optional[ExportJob]:
+    """The job from memory while this process runs it, otherwise from its state file (so deletes and
+    expiry by any worker are seen)."""
+    job = EXPORT_JOBS.get(job_id)
+    if job is not None and job.task is not None and not job.task.done():
+        return job
+    return ExportJob.load(job_id) if re.fullmatch(r"[0-9a-f]{32}", job_id) else None
+
+def delete_export_job(job: ExportJob):
+    if job.task is not None and not job.task.done():
+        job.task.cancel()
+    EXPORT_JOBS.pop(job.job_id, None)
+    shutil.rmtree(job.directory, ignore_errors=True)
+
+def expire_export_jobs(now: Optional[float] = None) -> int:
+    """Delete jobs (and files) whose state has not changed for EXPORT_RETENTION_SECONDS, whichever worker ran them."""
+    now = time.time() if now is None else now
+    expired = 0
+    try:
+        job_ids = os.listdir(EXPORT_DIR)
+    except FileNotFoundError:
+        return 0
+    for job_id in job_ids:
+        local = EXPORT_JOBS.get(job_id)
+        if local is not None and local.task is not None and not local.task.done():
+            continue
+        directory = os.path.join(EXPORT_DIR, job_id)
+        try:
+            # A job whose process died before writing its state still expires, by its directory's age
+            state = os.path.join(directory, JOB_STATE_FILE)
+            changed = os.path.getmtime(state if os.path.exists(state) else directory)
+        except OSError:
+            continue
+        if now - changed > EXPORT_RETENTION_SECONDS:
+            EXPORT_JOBS.pop(job_id, None)
+            shutil.rmtree(directory, ignore_errors=True)
+            expired += 1
+    return expired
@@ -0,0 +1,256 @@
+import codecs
+import json
+import uuid
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+from uuid import UUID
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.interoperability import fhir_to_patient
+from app import mpi
+from app.database import parameter_chunks
+from app.models.patient import Patient, PatientBlockingKey
+from app.schemas.patient import PatientCreate
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/fhir+ndjson")
+
+def parse_record(record) -> PatientCreate:
+    """Validate one import record: a FHIR Patient resource or a plain PatientCreate payload."""
+    if not isinstance(record, dict):
+        raise ValueError("Record must be a JSON object")
+    if record.get("resourceType") == "Patient":
+        return fhir_to_patient(record)
+    return PatientCreate(**record)
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Split a streamed body into numbered lines without buffering the whole payload."""
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.decode("utf-8", errors="replace")
+    if buffer:
+        yield line_no + 1, buffer.decode("utf-8", errors="replace")
+
+def iter_bundle(bundle: dict) -> Iterable[Tuple[int, dict]]:
+    """Number the entries of a FHIR Bundle from 1, like NDJSON lines."""
+    if not isinstance(bundle, dict) or bundle.get("resourceType") != "Bundle":
+        raise HTTPException(status_code=400, detail="Expected a FHIR Bundle resource")
+    for index, entry in enumerate(bundle.get("entry") or [], start=1):
+        yield index, (entry or {}).get("resource")
+
+_WHITESPACE = json.decoder.WHITESPACE
+
+def _malformed_bundle() -> HTTPException:
+    return HTTPException(status_code=400, detail="Request body is not a valid FHIR Bundle")
+
+class _JSONStream:
+    """Decode JSON values one at a time from a streamed body; only the undecoded tail is kept."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._done = False
+
+    async def _fill(self) -> bool:
+        if self._done:
+            return False
+        try:
+            text = self._utf8.decode(await self._chunks.__anext__())
+        except StopAsyncIteration:
+            self._done = True
+            text = self._utf8.decode(b"", final=True)
+        except UnicodeDecodeError:
+            raise _malformed_bundle()
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        return True
+
+    async def peek(self) -> str:
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not await self._fill():
+                raise _malformed_bundle()
+
+    async def expect(self, tokens: str) -> str:
+        token = await self.peek()
+        if token not in tokens:
+            raise _malformed_bundle()
+        self._pos += 1
+        return token
+
+    async def value(self):
+        await self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                value, end = None, None
+            # A number that ends the buffer may go on in the next chunk
+            complete = end is not None and (end < len(self._buffer) or self._done or not isinstance(value, (int, float)))
+            if complete:
+                self._pos = end
+                return value
+            if not await self._fill():
+                raise _malformed_bundle()
+
+async def iter_bundle_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict]]:
+    """Like iter_bundle, but decode a streamed Bundle one `entry` element at a time.
+
+    `resourceType` must precede `entry` (as FHIR JSON writes it). A malformed body raises a 400
+    once it is reached; batches imported before that point stay committed.
+    """
+    stream = _JSONStream(chunks)
+    await stream.expect("{")
+    resource_type = None
+    if await stream.peek() == "}":
+        raise HTTPException(status_code=400, detail="Expected a FHIR Bundle resource")
+    while True:
+        key = await stream.value()
+        if not isinstance(key, str):
+            raise _malformed_bundle()
+        await stream.expect(":")
+        if key == "entry":
+            if resource_type != "Bundle":
+                raise HTTPException(status_code=400, detail="Expected a FHIR Bundle resource")
+            await stream.expect("[")
+            index = 0
+            if await stream.peek() == "]":
+                await stream.expect("]")
+            else:
+                while True:
+                    entry = await stream.value()
+                    index += 1
+                    yield index, entry.get("resource") if isinstance(entry, dict) else None
+                    if await stream.expect(",]") == "]":
+                        break
+        else:
+            value = await stream.value()
+            if key == "resourceType":
+                resource_type = value
+        if await stream.expect(",}") == "}":
+            break
+    if resource_type != "Bundle":
+        raise HTTPException(status_code=400, detail="Expected a FHIR Bundle resource")
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error)
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line: int, error: Exception):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": _error_message(error)})
+
+    def dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+async def write_patient_batch(db: AsyncSession, rows: List[dict]) -> List[Optional[Exception]]:
+    """Insert patient rows and their MPI blocking keys and commit; returns the error for each row, or None if it was stored."""
+    table = Patient.__table__
+    keys = PatientBlockingKey.__table__
+    try:
+        # Multi-row INSERTs (one per batch unless it exceeds the bind parameter limit) instead of an INSERT + SELECT per patient
+        for chunk in parameter_chunks(rows, len(table.c)):
+            await db.execute(insert(table).values(chunk))
+        key_rows = [key for values in rows for key in mpi.key_rows(values["patient_id"], values["organization_id"], values)]
+        for chunk in parameter_chunks(key_rows, len(keys.c)):
+            await db.execute(insert(keys).values(chunk))
+        await db.commit()
+        return [None] * len(rows)
+    except DBAPIError:
+        await db.rollback()
+    # A row violated a constraint; retry one by one so only the offending rows fail
+    errors = []
+    for values in rows:
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(table).values(values))
+                key_rows = mpi.key_rows(values["patient_id"], values["organization_id"], values)
+                if key_rows:
+                    await db.execute(insert(keys).values(key_rows))
+            errors.append(None)
+        except DBAPIError as e:
+            errors.append(e.orig or e)
+    await db.commit()
+    return errors
+
+async def _write_batch(db: AsyncSession, batch: List[Tuple[int, dict]], report: ImportReport):
+    errors = await write_patient_batch(db, [values for _, values in batch])
+    for (line, _), error in zip(batch, errors):
+        if error is None:
+            report.created += 1
+        else:
+            report.fail(line, error)
+
+async def import_patients(db: AsyncSession, records, batch_size: int = IMPORT_BATCH_SIZE, organization_id: Optional[UUID] = None) -> dict:
+    """Validate and insert numbered records in batches.
+
+    `records` yields `(line, record)` pairs where `record` is a decoded JSON value or the raw
+    NDJSON line. Invalid lines are reported and skipped; valid ones are committed batch by batch.
+    With `organization_id`, records of any other organization are rejected: `db` is bound to
+    that organization's shard.
+    """
+    report = ImportReport()
+    batch = []
+    async for line, record in _aiter(records):
+        if isinstance(record, str):
+            if not record.strip():
+                continue
+            try:
+                record = json.loads(record)
+            except ValueError as e:
+                report.processed += 1
+                report.fail(line, e)
+                continue
+        report.processed += 1
+        try:
+            patient = parse_record(record)
+        except (HTTPException, ValidationError, ValueError, TypeError) as e:
+            report.fail(line, e)
+            continue
+        if organization_id is not None and patient.organization_id != organization_id:
+            report.fail(line, ValueError(f"Patient belongs to organization {patient.organization_id}, not {organization_id}"))
+            continue
+        batch.append((line, {"patient_id": uuid.uuid4(), **patient.dict()}))
+        if len(batch) >= batch_size:
+            await _write_batch(db, batch, report)
+            batch = []
+    if batch:
+        await _write_batch(db, batch, report)
+    return report.dict()
+
+async def _aiter(records):
+    if hasattr(records, "__aiter__"):
+        async for item in records:
+            yield item
+    else:
+        for item in records:
+            yield item
@@ -0,0 +1,51 @@
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+from fastapi import Request, Response
+from app.crud.hierarchy_cache import CachedRead
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison: W/"x" and "x" name the same representation
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in [tag.removeprefix("W/") for tag in candidates]
+
+def is_not_modified(request: Request, entry: CachedRead, use_last_modified: bool = True) -> bool:
+    """Evaluate If-None-Match, or failing that If-Modified-Since, against a cached read."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, entry.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or not use_last_modified or entry.last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return since.tzinfo is not None and entry.last_modified.replace(microsecond=0) <= since
+
+def conditional(request: Request, response: Response, entry: CachedRead, use_last_modified: bool = True):
+    """Return the cached value with ETag/Last-Modified set, or an empty 304 when the client's copy is current.
+
+    Lists pass use_last_modified=False: deleting a row does not move their Last-Modified, so only
+    the ETag can tell whether a list changed.
+    """
+    headers = {"ETag": entry.etag}
+    if entry.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(entry.last_modified, usegmt=True)
+    if is_not_modified(request, entry, use_last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return entry.value
+
+def if_match_versions(request: Request) -> Optional[List[int]]:
+    """Versions named by If-Match, for update_versioned; None when the header is absent or `*`.
+
+    Weak and unrecognized tags never match (If-Match uses strong comparison), which yields an
+    empty list and so a 412.
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return None
+    tags = [tag.strip() for tag in if_match.split(",")]
+    if "*" in tags:
+        return None
+    return [int(tag[1:-1]) for tag in tags if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit()]
@@ -0,0 +1,57 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.department import Department
+from app.schemas.department import Department as DepartmentSchema, DepartmentCreate, DepartmentUpdate
+from app.crud import hierarchy_cache
+from app.crud.versioning import delete_versioned, update_versioned
+from app.crud.bulk import BulkResource
+from app.pagination import paginate
+from typing import List, Optional
+from uuid import UUID
+
+# Stable ordering for list queries, backed by a composite index of the same columns
+KEYSET = (Department.hospital_id, Department.created_at, Department.department_id)
+# Batched writes behind /departments/bulk
+BULK = BulkResource(Department, "department_id", DepartmentCreate, DepartmentUpdate, DepartmentSchema, after_write=lambda ids: hierarchy_cache.invalidate("departments", cascade=True))
+
+async def create_department(db: AsyncSession, department: DepartmentCreate):
+    db_department = Department(**department.dict())
+    db.add(db_department)
+    await db.commit()
+    hierarchy_cache.invalidate("departments")
+    await db.refresh(db_department)
+    return db_department
+
+async def get_department(db: AsyncSession, department_id: UUID):
+    result = await db.execute(select(Department).filter(Department.department_id == department_id))
+    return result.scalars().first()
+
+async def get_departments(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    result = await db.execute(paginate(select(Department), KEYSET, skip=skip, limit=limit, after=after))
+    return result.scalars().all()
+
+async def get_cached_department(db: AsyncSession, department_id: UUID) -> Optional[hierarchy_cache.CachedRead]:
+    async def load():
+        db_department = await get_department(db, department_id=department_id)
+        return hierarchy_cache.snapshot(db_department, DepartmentSchema) if db_department else None
+    return await hierarchy_cache.read_through("departments", ("id", department_id), load)
+
+async def get_cached_departments(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None) -> hierarchy_cache.CachedRead:
+    async def load():
+        return hierarchy_cache.snapshot(list(await get_departments(db, skip=skip, limit=limit, after=after)), DepartmentSchema)
+    return await hierarchy_cache.read_through("departments", ("list", skip, limit, after), load)
+
+async def update_department(db: AsyncSession, department_id: UUID, department: DepartmentUpdate, versions: Optional[List[int]] = None):
+    db_department = await update_versioned(db, Department, [Department.department_id == department_id], department.dict(exclude_unset=True), versions)
+    if db_department:
+        await db.commit()
+        hierarchy_cache.invalidate("departments")
+    return db_department
+
+async def delete_department(db: AsyncSession, department_id: UUID):
+    db_department = await get_department(db, department_id=department_id)
+    if db_department:
+        if not await delete_versioned(db, db_department):
+            return None
+        hierarchy_cache.invalidate("departments", cascade=True)
+    return db_department
@@ -0,0 +1,57 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.hospital import Hospital
+from app.schemas.hospital import Hospital as HospitalSchema, HospitalCreate, HospitalUpdate
+from app.crud import hierarchy_cache
+from app.crud.versioning import delete_versioned, update_versioned
+from app.crud.bulk import BulkResource
+from app.pagination import paginate
+from typing import List, Optional
+from uuid import UUID
+
+# Stable ordering for list queries, backed by a composite index of the same columns
+KEYSET = (Hospital.organization_id, Hospital.created_at, Hospital.hospital_id)
+# Batched writes behind /hospitals/bulk
+BULK = BulkResource(Hospital, "hospital_id", HospitalCreate, HospitalUpdate, HospitalSchema, after_write=lambda ids: hierarchy_cache.invalidate("hospitals", cascade=True))
+
+async def create_hospital(db: AsyncSession, hospital: HospitalCreate):
+    db_hospital = Hospital(**hospital.dict())
+    db.add(db_hospital)
+    await db.commit()
+    hierarchy_cache.invalidate("hospitals")
+    await db.refresh(db_hospital)
+    return db_hospital
+
+async def get_hospital(db: AsyncSession, hospital_id: UUID):
+    result = await db.execute(select(Hospital).filter(Hospital.hospital_id == hospital_id))
+    return result.scalars().first()
+
+async def get_hospitals(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    result = await db.execute(paginate(select(Hospital), KEYSET, skip=skip, limit=limit, after=after))
+    return result.scalars().all()
+
+async def get_cached_hospital(db: AsyncSession, hospital_id: UUID) -> Optional[hierarchy_cache.CachedRead]:
+    async def load():
+        db_hospital = await get_hospital(db, hospital_id=hospital_id)
+        return hierarchy_cache.snapshot(db_hospital, HospitalSchema) if db_hospital else None
+    return await hierarchy_cache.read_through("hospitals", ("id", hospital_id), load)
+
+async def get_cached_hospitals(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None) -> hierarchy_cache.CachedRead:
+    async def load():
+        return hierarchy_cache.snapshot(list(await get_hospitals(db, skip=skip, limit=limit, after=after)), HospitalSchema)
+    return await hierarchy_cache.read_through("hospitals", ("list", skip, limit, after), load)
+
+async def update_hospital(db: AsyncSession, hospital_id: UUID, hospital: HospitalUpdate, versions: Optional[List[int]] = None):
+    db_hospital = await update_versioned(db, Hospital, [Hospital.hospital_id == hospital_id], hospital.dict(exclude_unset=True), versions)
+    if db_hospital:
+        await db.commit()
+        hierarchy_cache.invalidate("hospitals")
+    return db_hospital
+
+async def delete_hospital(db: AsyncSession, hospital_id: UUID):
+    db_hospital = await get_hospital(db, hospital_id=hospital_id)
+    if db_hospital:
+        if not await delete_versioned(db, db_hospital):
+            return None
+        hierarchy_cache.invalidate("hospitals", cascade=True)
+    return db_hospital
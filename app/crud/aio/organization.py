@@ -0,0 +1,75 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import noload, selectinload
+from app.models.department import Department
+from app.models.hospital import Hospital
+from app.models.organization import Organization
+from app.models.provider import Provider
+from app.schemas.organization import Organization as OrganizationSchema, OrganizationCreate, OrganizationUpdate
+from app.crud import hierarchy_cache
+from app.crud.versioning import delete_versioned, update_versioned
+from app.pagination import paginate
+from typing import List, Optional
+from uuid import UUID
+
+# Stable ordering for list queries, backed by a composite index of the same columns
+KEYSET = (Organization.created_at, Organization.organization_id)
+# Levels below an organization, in the order GET /organizations/{id}/tree descends them
+TREE_LEVELS = ((Organization.hospitals, Hospital), (Hospital.departments, Department), (Department.providers, Provider))
+
+async def create_organization(db: AsyncSession, organization: OrganizationCreate):
+    db_organization = Organization(**organization.dict())
+    db.add(db_organization)
+    await db.commit()
+    hierarchy_cache.invalidate("organizations")
+    await db.refresh(db_organization)
+    return db_organization
+
+async def get_organization(db: AsyncSession, organization_id: UUID):
+    result = await db.execute(select(Organization).filter(Organization.organization_id == organization_id))
+    return result.scalars().first()
+
+async def get_organizations(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    result = await db.execute(paginate(select(Organization), KEYSET, skip=skip, limit=limit, after=after))
+    return result.scalars().all()
+
+async def get_cached_organization(db: AsyncSession, organization_id: UUID) -> Optional[hierarchy_cache.CachedRead]:
+    async def load():
+        db_organization = await get_organization(db, organization_id=organization_id)
+        return hierarchy_cache.snapshot(db_organization, OrganizationSchema) if db_organization else None
+    return await hierarchy_cache.read_through("organizations", ("id", organization_id), load)
+
+async def get_cached_organizations(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None) -> hierarchy_cache.CachedRead:
+    async def load():
+        return hierarchy_cache.snapshot(list(await get_organizations(db, skip=skip, limit=limit, after=after)), OrganizationSchema)
+    return await hierarchy_cache.read_through("organizations", ("list", skip, limit, after), load)
+
+async def get_organization_tree(db: AsyncSession, organization_id: UUID, depth: int = len(TREE_LEVELS), status: Optional[str] = None):
+    """Organization with its hospitals, departments and providers down to `depth` levels, in one query per level.
+
+    Children are filtered by `status` when given; levels below `depth` are left empty rather than lazy-loaded.
+    """
+    loader = None
+    for relationship, model in TREE_LEVELS[:depth]:
+        attribute = relationship.and_(model.status == status) if status else relationship
+        loader = selectinload(attribute) if loader is None else loader.selectinload(attribute)
+    if depth < len(TREE_LEVELS):
+        cut = TREE_LEVELS[depth][0]
+        loader = noload(cut) if loader is None else loader.noload(cut)
+    result = await db.execute(select(Organization).options(loader).filter(Organization.organization_id == organization_id))
+    return result.scalars().first()
+
+async def update_organization(db: AsyncSession, organization_id: UUID, organization: OrganizationUpdate, versions: Optional[List[int]] = None):
+    db_organization = await update_versioned(db, Organization, [Organization.organization_id == organization_id], organization.dict(exclude_unset=True), versions)
+    if db_organization:
+        await db.commit()
+        hierarchy_cache.invalidate("organizations")
+    return db_organization
+
+async def delete_organization(db: AsyncSession, organization_id: UUID):
+    db_organization = await get_organization(db, organization_id=organization_id)
+    if db_organization:
+        if not await delete_versioned(db, db_organization):
+            return None
+        hierarchy_cache.invalidate("organizations", cascade=True)
+    return db_organization
@@ -0,0 +1,75 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.patient import Patient
+from app.schemas.patient import PatientCreate, PatientUpdate, Patient as PatientSchema
+from app.crud.versioning import delete_versioned, update_versioned
+from app.fieldsets import load_only_fields
+from app.fast_json import schema_columns
+from app.pagination import paginate
+from app import mpi
+from typing import List, Optional, Sequence
+from uuid import UUID
+
+# Every query carries organization_id, the partition key of a partitioned `patients`
+# table, so PostgreSQL prunes the scan to the tenant's partition.
+
+# Stable ordering for list queries, backed by a composite index of the same columns
+KEYSET = (Patient.organization_id, Patient.created_at, Patient.patient_id)
+
+async def create_patient(db: AsyncSession, patient: PatientCreate):
+    db_patient = Patient(**patient.dict())
+    db.add(db_patient)
+    await db.flush()
+    await mpi.index_patient(db, db_patient)
+    await db.commit()
+    await db.refresh(db_patient)
+    return db_patient
+
+async def get_patient(db: AsyncSession, patient_id: UUID, organization_id: UUID, fields: Optional[Sequence[str]] = None):
+    stmt = select(Patient).filter(Patient.organization_id == organization_id, Patient.patient_id == patient_id)
+    if fields:
+        # The version is always loaded for the ETag
+        stmt = stmt.options(load_only_fields(Patient, fields, always=("version",)))
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_patients(db: AsyncSession, organization_id: UUID, skip: int = 0, limit: int = 100, after: Optional[str] = None,
+                       fields: Optional[Sequence[str]] = None):
+    stmt = select(Patient).filter(Patient.organization_id == organization_id)
+    if fields:
+        # The keyset columns are always loaded for the next-page cursor
+        stmt = stmt.options(load_only_fields(Patient, fields, always=[column.key for column in KEYSET]))
+    result = await db.execute(paginate(stmt, KEYSET, skip=skip, limit=limit, after=after))
+    return result.scalars().all()
+
+async def get_patient_rows(db: AsyncSession, organization_id: UUID, skip: int = 0, limit: int = 100, after: Optional[str] = None,
+                           fields: Optional[Sequence[str]] = None):
+    """get_patients() as plain rows of the serialized columns, for the fast JSON path."""
+    columns = schema_columns(Patient.__table__, PatientSchema, fields, always=[column.key for column in KEYSET])
+    stmt = select(*columns).filter(Patient.organization_id == organization_id)
+    result = await db.execute(paginate(stmt, KEYSET, skip=skip, limit=limit, after=after))
+    return result.all()
+
+async def get_patients_by_ids(db: AsyncSession, patient_ids: List[UUID], organization_id: UUID):
+    result = await db.execute(select(Patient).filter(Patient.organization_id == organization_id, Patient.patient_id.in_(patient_ids)))
+    return result.scalars().all()
+
+async def search_patients(db: AsyncSession, organization_id: UUID, filters: list, limit: int = 50, after: Optional[str] = None):
+    stmt = select(Patient).filter(Patient.organization_id == organization_id, *filters)
+    result = await db.execute(paginate(stmt, KEYSET, limit=limit, after=after))
+    return result.scalars().all()
+
+async def update_patient(db: AsyncSession, patient_id: UUID, organization_id: UUID, patient: PatientUpdate, versions: Optional[List[int]] = None):
+    where = [Patient.organization_id == organization_id, Patient.patient_id == patient_id]
+    db_patient = await update_versioned(db, Patient, where, patient.dict(exclude_unset=True), versions)
+    if db_patient:
+        await mpi.index_patient(db, db_patient)
+        await db.commit()
+    return db_patient
+
+async def delete_patient(db: AsyncSession, patient_id: UUID, organization_id: UUID):
+    db_patient = await get_patient(db, patient_id, organization_id)
+    if db_patient:
+        if not await delete_versioned(db, db_patient):
+            return None
+    return db_patient
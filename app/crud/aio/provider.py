@@ -0,0 +1,57 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.provider import Provider
+from app.schemas.provider import Provider as ProviderSchema, ProviderCreate, ProviderUpdate
+from app.crud import hierarchy_cache
+from app.crud.versioning import delete_versioned, update_versioned
+from app.crud.bulk import BulkResource
+from app.pagination import paginate
+from typing import List, Optional
+from uuid import UUID
+
+# Stable ordering for list queries, backed by a composite index of the same columns
+KEYSET = (Provider.department_id, Provider.created_at, Provider.provider_id)
+# Batched writes behind /providers/bulk
+BULK = BulkResource(Provider, "provider_id", ProviderCreate, ProviderUpdate, ProviderSchema, after_write=lambda ids: hierarchy_cache.invalidate("providers"))
+
+async def create_provider(db: AsyncSession, provider: ProviderCreate):
+    db_provider = Provider(**provider.dict())
+    db.add(db_provider)
+    await db.commit()
+    hierarchy_cache.invalidate("providers")
+    await db.refresh(db_provider)
+    return db_provider
+
+async def get_provider(db: AsyncSession, provider_id: UUID):
+    result = await db.execute(select(Provider).filter(Provider.provider_id == provider_id))
+    return result.scalars().first()
+
+async def get_providers(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    result = await db.execute(paginate(select(Provider), KEYSET, skip=skip, limit=limit, after=after))
+    return result.scalars().all()
+
+async def get_cached_provider(db: AsyncSession, provider_id: UUID) -> Optional[hierarchy_cache.CachedRead]:
+    async def load():
+        db_provider = await get_provider(db, provider_id=provider_id)
+        return hierarchy_cache.snapshot(db_provider, ProviderSchema) if db_provider else None
+    return await hierarchy_cache.read_through("providers", ("id", provider_id), load)
+
+async def get_cached_providers(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None) -> hierarchy_cache.CachedRead:
+    async def load():
+        return hierarchy_cache.snapshot(list(await get_providers(db, skip=skip, limit=limit, after=after)), ProviderSchema)
+    return await hierarchy_cache.read_through("providers", ("list", skip, limit, after), load)
+
+async def update_provider(db: AsyncSession, provider_id: UUID, provider: ProviderUpdate, versions: Optional[List[int]] = None):
+    db_provider = await update_versioned(db, Provider, [Provider.provider_id == provider_id], provider.dict(exclude_unset=True), versions)
+    if db_provider:
+        await db.commit()
+        hierarchy_cache.invalidate("providers")
+    return db_provider
+
+async def delete_provider(db: AsyncSession, provider_id: UUID):
+    db_provider = await get_provider(db, provider_id=provider_id)
+    if db_provider:
+        if not await delete_versioned(db, db_provider):
+            return None
+        hierarchy_cache.invalidate("providers")
+    return db_provider
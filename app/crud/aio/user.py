@@ -0,0 +1,150 @@
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from app.models.user import User, Role
+from app.schemas.user import UserCreate, UserUpdate, UserInDB, RoleCreate, RoleUpdate, User as UserSchema, Role as RoleSchema
+from app.auth.hashing import hash_password
+from app.pagination import paginate
+from app.fast_json import nested_columns, schema_columns
+from typing import Optional
+from app.auth.principal_cache import invalidate_role, invalidate_user
+from app.crud.bulk import BulkResource
+from uuid import UUID
+
+# Stable orderings for list queries, backed by composite indexes of the same columns
+USER_KEYSET = (User.organization_id, User.created_at, User.user_id)
+ROLE_KEYSET = (Role.created_at, Role.role_id)
+# Changes that revoke the user's outstanding tokens
+TOKEN_REVOKING_FIELDS = {"password_hash", "role_id", "status", "organization_id"}
+
+async def _prepare_bulk_user(values: dict) -> dict:
+    if "password" in values:
+        values["password_hash"] = await hash_password(values.pop("password"))
+    return values
+
+def _bulk_user_extra_set(fields) -> dict:
+    # Unlike update_user this cannot compare old values, so naming a revoking field revokes
+    return {"token_version": User.__table__.c.token_version + 1} if TOKEN_REVOKING_FIELDS & set(fields) else {}
+
+def _invalidate_users(user_ids):
+    for user_id in user_ids:
+        invalidate_user(user_id)
+
+# Batched writes behind /auth/users/bulk, scoped to one organization (the partition key)
+USER_BULK = BulkResource(User, "user_id", UserCreate, UserUpdate, UserInDB, scope="organization_id",
+                         prepare=_prepare_bulk_user, extra_set=_bulk_user_extra_set, after_write=_invalidate_users)
+
+# User CRUD operations
+# Async sessions cannot lazy-load relationships, so every query returning users
+# loads the role eagerly; token claims and /users/me rely on user.role.
+async def create_user(db: AsyncSession, user: UserCreate):
+    hashed_password = await hash_password(user.password)
+    db_user = User(**user.dict(exclude={'password'}), password_hash=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    return await _reload_user(db, db_user.user_id, db_user.organization_id)
+
+async def get_user(db: AsyncSession, user_id: UUID, organization_id: UUID):
+    result = await db.execute(select(User).options(selectinload(User.role)).filter(User.organization_id == organization_id, User.user_id == user_id))
+    return result.scalars().first()
+
+async def get_user_by_username(db: AsyncSession, username: str, organization_id: Optional[UUID] = None):
+    # Only login omits the tenant key: the organization is not known before the user is found
+    stmt = select(User).options(selectinload(User.role)).filter(User.username == username)
+    if organization_id is not None:
+        stmt = stmt.filter(User.organization_id == organization_id)
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+async def get_token_version(db: AsyncSession, user_id: UUID, organization_id: UUID) -> Optional[int]:
+    result = await db.execute(select(User.token_version).filter(User.organization_id == organization_id, User.user_id == user_id))
+    return result.scalar()
+
+async def get_users(db: AsyncSession, organization_id: UUID, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    stmt = select(User).options(selectinload(User.role)).filter(User.organization_id == organization_id)
+    result = await db.execute(paginate(stmt, USER_KEYSET, skip=skip, limit=limit, after=after))
+    return result.scalars().all()
+
+async def get_user_rows(db: AsyncSession, organization_id: UUID, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    """get_users() as plain rows with the role joined in, for the fast JSON path."""
+    columns = schema_columns(User.__table__, UserSchema, always=[column.key for column in USER_KEYSET])
+    stmt = select(*columns, *nested_columns("role", Role.__table__, RoleSchema)).join(Role, User.role_id == Role.role_id)
+    result = await db.execute(paginate(stmt.filter(User.organization_id == organization_id), USER_KEYSET, skip=skip, limit=limit, after=after))
+    return result.all()
+
+async def update_user(db: AsyncSession, user_id: UUID, organization_id: UUID, user: UserUpdate):
+    db_user = await get_user(db, user_id, organization_id)
+    if db_user:
+        update_data = user.dict(exclude_unset=True)
+        if 'password' in update_data:
+            update_data['password_hash'] = await hash_password(update_data['password'])
+            del update_data['password']
+        if any(getattr(db_user, key) != update_data[key] for key in TOKEN_REVOKING_FIELDS & update_data.keys()):
+            update_data['token_version'] = db_user.token_version + 1
+        for key, value in update_data.items():
+            setattr(db_user, key, value)
+        await db.commit()
+        invalidate_user(user_id)
+        db_user = await _reload_user(db, user_id, db_user.organization_id)
+    return db_user
+
+async def delete_user(db: AsyncSession, user_id: UUID, organization_id: UUID):
+    db_user = await get_user(db, user_id, organization_id)
+    if db_user:
+        await db.delete(db_user)
+        await db.commit()
+        invalidate_user(user_id)
+    return db_user
+
+async def _reload_user(db: AsyncSession, user_id: UUID, organization_id: UUID):
+    result = await db.execute(
+        select(User)
+        .options(selectinload(User.role))
+        .filter(User.organization_id == organization_id, User.user_id == user_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+# Role CRUD operations
+async def create_role(db: AsyncSession, role: RoleCreate):
+    db_role = Role(**role.dict())
+    db.add(db_role)
+    await db.commit()
+    await db.refresh(db_role)
+    return db_role
+
+async def get_role(db: AsyncSession, role_id: UUID):
+    result = await db.execute(select(Role).filter(Role.role_id == role_id))
+    return result.scalars().first()
+
+async def get_role_by_name(db: AsyncSession, name: str):
+    result = await db.execute(select(Role).filter(Role.name == name))
+    return result.scalars().first()
+
+async def get_roles(db: AsyncSession, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    result = await db.execute(paginate(select(Role), ROLE_KEYSET, skip=skip, limit=limit, after=after))
+    return result.scalars().all()
+
+async def update_role(db: AsyncSession, role_id: UUID, role: RoleUpdate):
+    db_role = await get_role(db, role_id=role_id)
+    if db_role:
+        update_data = role.dict(exclude_unset=True)
+        renamed = update_data.get("name", db_role.name) != db_role.name
+        for key, value in update_data.items():
+            setattr(db_role, key, value)
+        if renamed:
+            # Permissions follow the role name, so tokens issued under the old one are revoked
+            await db.execute(update(User).where(User.role_id == role_id).values(token_version=User.token_version + 1))
+        await db.commit()
+        invalidate_role(role_id)
+        await db.refresh(db_role)
+    return db_role
+
+async def delete_role(db: AsyncSession, role_id: UUID):
+    db_role = await get_role(db, role_id=role_id)
+    if db_role:
+        await db.delete(db_role)
+        await db.commit()
+        invalidate_role(role_id)
+    return db_role
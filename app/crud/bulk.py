@@ -0,0 +1,269 @@
+import asyncio
+import os
+import uuid
+from typing import Callable, List, Optional, Sequence
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy import any_, bindparam, cast, column, delete, insert, update, values
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database import parameter_chunks
+
+# Items accepted by one bulk request
+MAX_BULK_ITEMS = int(os.getenv("MAX_BULK_ITEMS", "5000"))
+
+class BulkResource:
+    """How the batched repository writes one table.
+
+    `scope` names a column every statement is restricted to (the tenant key), `prepare` turns a
+    validated dict into column values (e.g. hashing passwords), `extra_set` returns additional
+    SET values for the fields an update changes and `after_write` runs with the written ids
+    once the transaction is committed.
+    """
+
+    def __init__(self, model, id_column: str, create_schema, update_schema, schema, scope: Optional[str] = None,
+                 prepare: Optional[Callable] = None, extra_set: Optional[Callable] = None, after_write: Optional[Callable] = None):
+        self.table = model.__table__
+        self.id = self.table.c[id_column]
+        self.create_schema = create_schema
+        self.update_schema = update_schema
+        self.schema = schema
+        self.scope = self.table.c[scope] if scope else None
+        self.prepare = prepare
+        self.extra_set = extra_set
+        self.after_write = after_write
+
+    def scoped(self, stmt, scope):
+        return stmt.where(self.scope == scope) if self.scope is not None and scope is not None else stmt
+
+class BulkReport:
+    """Per-item outcome of a bulk request, in request order."""
+
+    def __init__(self, size: int, atomic: bool):
+        self.atomic = atomic
+        self.results = [None] * size
+
+    def ok(self, index: int, status: str, id, data: Optional[dict] = None):
+        self.results[index] = {"index": index, "status": status, "id": id, "data": data}
+
+    def fail(self, index: int, error, id=None):
+        self.results[index] = {"index": index, "status": "error", "id": id, "error": _error_message(error)}
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for result in self.results if result is not None and result["status"] == "error")
+
+    def roll_back(self):
+        # All-or-nothing: the items that would have succeeded were not applied either
+        for result in self.results:
+            if result is not None and result["status"] != "error":
+                result.update(status="rolled_back", data=None)
+
+    def dict(self) -> dict:
+        succeeded = sum(1 for result in self.results if result is not None and result["status"] not in ("error", "rolled_back"))
+        return {"atomic": self.atomic, "succeeded": succeeded, "failed": self.failed, "results": self.results}
+
+def _error_message(error) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    if isinstance(error, DBAPIError):
+        return str(error.orig or error).splitlines()[0]
+    return str(error)
+
+def check_size(items: Sequence):
+    if len(items) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ITEMS} items per bulk request")
+
+def _returning(db: AsyncSession) -> bool:
+    # PostgreSQL returns the written rows from the statement itself; elsewhere they are read back with one SELECT
+    return db.bind.dialect.full_returning
+
+async def _select_by_ids(db: AsyncSession, resource: BulkResource, ids: list, scope=None) -> dict:
+    stmt = resource.scoped(select(resource.table).where(resource.id.in_(ids)), scope)
+    return {row[resource.id.key]: row for row in (await db.execute(stmt)).mappings().all()}
+
+async def _prepare(resource: BulkResource, prepared: List[tuple], report: BulkReport) -> List[tuple]:
+    if resource.prepare is None:
+        return prepared
+    outcomes = await asyncio.gather(*(resource.prepare(row) for _, row in prepared), return_exceptions=True)
+    ready = []
+    for (index, row), outcome in zip(prepared, outcomes):
+        if isinstance(outcome, Exception):
+            report.fail(index, outcome, id=row.get("__id__"))
+        else:
+            ready.append((index, outcome))
+    return ready
+
+async def _run(db: AsyncSession, statements: List[tuple], report: BulkReport) -> List[tuple]:
+    """Run each `(write, rows)` as one statement and return `(rows, written)` pairs.
+
+    When a row violates a constraint the whole batch is retried row by row in savepoints,
+    so in partial mode only the offending rows fail.
+    """
+    try:
+        return [(rows, await write([row for _, row in rows])) for write, rows in statements if rows]
+    except DBAPIError:
+        await db.rollback()
+    done = []
+    for write, rows in statements:
+        for index, row in rows:
+            try:
+                async with db.begin_nested():
+                    done.append(([(index, row)], await write([row])))
+            except DBAPIError as e:
+                report.fail(index, e, id=row.get("__id__"))
+    return done
+
+async def _finish(db: AsyncSession, resource: BulkResource, report: BulkReport, ids: list) -> dict:
+    if report.atomic and report.failed:
+        await db.rollback()
+        report.roll_back()
+        return report.dict()
+    await db.commit()
+    if resource.after_write is not None and ids:
+        resource.after_write(ids)
+    return report.dict()
+
+def _serialize(resource: BulkResource, row) -> dict:
+    return resource.schema.parse_obj(dict(row)).dict()
+
+async def bulk_create(db: AsyncSession, resource: BulkResource, items: List[dict], atomic: bool = True, check: Optional[Callable] = None) -> dict:
+    """Insert the items with one multi-row INSERT ... RETURNING (more if they exceed the bind parameter limit)."""
+    check_size(items)
+    report = BulkReport(len(items), atomic)
+    prepared = []
+    for index, item in enumerate(items):
+        try:
+            row = resource.create_schema.parse_obj(item).dict()
+            if check is not None:
+                check(row)
+        except (ValidationError, HTTPException) as e:
+            report.fail(index, e)
+            continue
+        prepared.append((index, row))
+    prepared = await _prepare(resource, prepared, report)
+    if atomic and report.failed:
+        report.roll_back()
+        return report.dict()
+    for _, row in prepared:
+        row.setdefault(resource.id.key, uuid.uuid4())
+
+    async def write(rows):
+        stmt = insert(resource.table).values(rows)
+        if _returning(db):
+            return (await db.execute(stmt.returning(*resource.table.c))).mappings().all()
+        await db.execute(stmt)
+        return list((await _select_by_ids(db, resource, [row[resource.id.key] for row in rows])).values())
+
+    written = []
+    # Every column may be bound for every row (Python-side defaults included)
+    statements = [(write, rows) for rows in parameter_chunks(prepared, len(resource.table.c))]
+    for rows, returned in await _run(db, statements, report):
+        by_id = {row[resource.id.key]: row for row in returned}
+        for index, row in rows:
+            report.ok(index, "created", row[resource.id.key], _serialize(resource, by_id[row[resource.id.key]]))
+            written.append(row[resource.id.key])
+    return await _finish(db, resource, report, written)
+
+def _update_writer(db: AsyncSession, resource: BulkResource, fields: tuple, scope):
+    extra = resource.extra_set(fields) if resource.extra_set is not None else {}
+    if "version" in resource.table.c:
+        extra["version"] = resource.table.c.version + 1
+    types = [("__id__", resource.id.type)] + [(field, resource.table.c[field].type) for field in fields]
+
+    async def write(rows):
+        if _returning(db):
+            # Typed casts let the VALUES list bind UUIDs, timestamps etc. like the target columns
+            data = values(*[column(name, type_) for name, type_ in types], name="v").data(
+                [tuple(cast(bindparam(None, row[name], type_=type_), type_) for name, type_ in types) for row in rows]
+            )
+            stmt = update(resource.table).where(resource.id == data.c["__id__"]).values({**{field: data.c[field] for field in fields}, **extra})
+            return (await db.execute(resource.scoped(stmt, scope).returning(*resource.table.c))).mappings().all()
+        # SET parameters cannot share their column's name in an executemany UPDATE
+        stmt = update(resource.table).where(resource.id == bindparam("__id__")).values({**{field: bindparam(f"new_{field}") for field in fields}, **extra})
+        await db.execute(resource.scoped(stmt, scope), [{"__id__": row["__id__"], **{f"new_{field}": row[field] for field in fields}} for row in rows])
+        return list((await _select_by_ids(db, resource, [row["__id__"] for row in rows], scope)).values())
+    return write
+
+async def bulk_update(db: AsyncSession, resource: BulkResource, items: List[dict], atomic: bool = True, scope=None, check: Optional[Callable] = None) -> dict:
+    """Apply partial updates; items changing the same fields share one UPDATE ... FROM (VALUES ...) RETURNING.
+
+    Every item names the row it updates with the resource's id field.
+    """
+    check_size(items)
+    report = BulkReport(len(items), atomic)
+    prepared = []
+    for index, item in enumerate(items):
+        item = dict(item)
+        id_ = item.pop(resource.id.key, None)
+        try:
+            if id_ is None:
+                raise ValueError(f"{resource.id.key} is required")
+            id_ = uuid.UUID(str(id_))
+            changes = resource.update_schema.parse_obj(item).dict(exclude_unset=True)
+            if not changes:
+                raise ValueError("No fields to update")
+            if check is not None:
+                check(changes)
+        except (ValidationError, HTTPException, ValueError) as e:
+            report.fail(index, e, id=id_)
+            continue
+        prepared.append((index, {"__id__": id_, **changes}))
+    prepared = await _prepare(resource, prepared, report)
+    if atomic and report.failed:
+        report.roll_back()
+        return report.dict()
+    groups = {}
+    for index, row in prepared:
+        groups.setdefault(tuple(sorted(key for key in row if key != "__id__")), []).append((index, row))
+
+    written = []
+    # Each row binds its id and changed fields; the scope and the SET expressions are bound once per statement
+    statements = [(_update_writer(db, resource, fields, scope), chunk) for fields, rows in groups.items()
+                  for chunk in parameter_chunks(rows, len(fields) + 1, fixed=len(resource.table.c) + 1)]
+    for rows, returned in await _run(db, statements, report):
+        by_id = {row[resource.id.key]: row for row in returned}
+        for index, row in rows:
+            if row["__id__"] in by_id:
+                report.ok(index, "updated", row["__id__"], _serialize(resource, by_id[row["__id__"]]))
+                written.append(row["__id__"])
+            else:
+                report.fail(index, "Not found", id=row["__id__"])
+    return await _finish(db, resource, report, written)
+
+async def bulk_delete(db: AsyncSession, resource: BulkResource, ids: List[uuid.UUID], atomic: bool = True, scope=None) -> dict:
+    """Delete the rows with one DELETE ... WHERE id = ANY(...) RETURNING."""
+    check_size(ids)
+    report = BulkReport(len(ids), atomic)
+
+    async def write(rows):
+        batch = [row["__id__"] for row in rows]
+        if _returning(db):
+            stmt = delete(resource.table).where(resource.id == any_(bindparam("ids", batch, type_=ARRAY(resource.id.type))))
+            return (await db.execute(resource.scoped(stmt, scope).returning(resource.id))).scalars().all()
+        existing = list(await _select_by_ids(db, resource, batch, scope))
+        if existing:
+            await db.execute(delete(resource.table).where(resource.id.in_(existing)))
+        return existing
+
+    deleted = []
+    for rows, returned in await _run(db, [(write, [(index, {"__id__": id_}) for index, id_ in enumerate(ids)])], report):
+        returned = set(returned)
+        for index, row in rows:
+            if row["__id__"] in returned:
+                report.ok(index, "deleted", row["__id__"])
+                deleted.append(row["__id__"])
+            else:
+                report.fail(index, "Not found", id=row["__id__"])
+    return await _finish(db, resource, report, deleted)
+
+def bulk_response(report: dict) -> JSONResponse:
+    """200 when every item was applied, 207 when a partial request had failures, 422 when an atomic one was rolled back."""
+    status_code = 200 if not report["failed"] else 422 if report["atomic"] else 207
+    return JSONResponse(status_code=status_code, content=jsonable_encoder(report))
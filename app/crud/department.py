@@ -15,7 +15,7 @@ def get_department(db: Session, department_id: UUID):
     return db.query(Department).filter(Department.department_id == department_id).first()
 
 def get_departments(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Department).offset(skip).limit(limit).all()
+    return db.query(Department).order_by(Department.hospital_id, Department.created_at, Department.department_id).offset(skip).limit(limit).all()
 
 def update_department(db: Session, department_id: UUID, department: DepartmentUpdate):
     db_department = db.query(Department).filter(Department.department_id == department_id).first()
@@ -0,0 +1,73 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from app.cache import TTLLRUCache
+from app.crud.versioning import etag
+
+# Organizations, hospitals, departments and providers change rarely but are polled constantly.
+# Reads are cached per process as pydantic snapshots, keyed by id or list query. Writes through
+# the async CRUD clear the resource's cache in this process; other workers catch up within the TTL.
+HIERARCHY_CACHE_TTL_SECONDS = float(os.getenv("HIERARCHY_CACHE_TTL_SECONDS", "60"))
+HIERARCHY_CACHE_MAX_SIZE = int(os.getenv("HIERARCHY_CACHE_MAX_SIZE", "1000"))
+
+RESOURCES = ("organizations", "hospitals", "departments", "providers")
+
+caches = {resource: TTLLRUCache(max_size=HIERARCHY_CACHE_MAX_SIZE, ttl_seconds=HIERARCHY_CACHE_TTL_SECONDS) for resource in RESOURCES}
+
+class CachedRead:
+    """A snapshot (or list of snapshots) with the validators clients use for conditional requests."""
+
+    __slots__ = ("value", "etag", "last_modified")
+
+    def __init__(self, value, etag: str, last_modified: Optional[datetime]):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite (tests) returns naive timestamps; PostgreSQL stores them in UTC
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def snapshot(value, schema) -> CachedRead:
+    """Wrap an ORM row or list of rows. A row's ETag is its version, which PUT accepts in If-Match. A list's
+    hashes the serialized snapshots, so it changes with any edit or deletion even within the resolution of
+    updated_at, which only feeds Last-Modified."""
+    rows = value if isinstance(value, list) else [value]
+    snapshots = [schema.from_orm(row) for row in rows]
+    if isinstance(value, list):
+        digest = hashlib.sha1()
+        for row in snapshots:
+            digest.update(row.json().encode())
+        tag = f'W/"{digest.hexdigest()}"'
+    else:
+        tag = etag(value.version)
+    modified = [_utc(row.updated_at) for row in snapshots if row.updated_at is not None]
+    return CachedRead(snapshots if isinstance(value, list) else snapshots[0], tag, max(modified) if modified else None)
+
+async def read_through(resource: str, key, load: Callable[[], Awaitable[Optional[CachedRead]]]) -> Optional[CachedRead]:
+    cache = caches[resource]
+    entry = cache.get(key)
+    if entry is None:
+        entry = await load()
+        if entry is not None:
+            cache.set(key, entry)
+    return entry
+
+# Resources whose rows are deleted with a parent's (ON DELETE CASCADE)
+CASCADES = {
+    "organizations": ("hospitals", "departments", "providers"),
+    "hospitals": ("departments", "providers"),
+    "departments": ("providers",),
+}
+
+def invalidate(resource: str, cascade: bool = False):
+    # Any write can change every list page, so the whole resource is dropped; writes are rare.
+    # A delete (`cascade`) also drops the resources its cascade reaches
+    for name in (resource, *CASCADES.get(resource, ())) if cascade else (resource,):
+        caches[name].clear()
+
+def stats() -> dict:
+    return {resource: cache.stats() for resource, cache in caches.items()}
@@ -15,7 +15,7 @@ def get_hospital(db: Session, hospital_id: UUID):
     return db.query(Hospital).filter(Hospital.hospital_id == hospital_id).first()
 
 def get_hospitals(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Hospital).offset(skip).limit(limit).all()
+    return db.query(Hospital).order_by(Hospital.organization_id, Hospital.created_at, Hospital.hospital_id).offset(skip).limit(limit).all()
 
 def update_hospital(db: Session, hospital_id: UUID, hospital: HospitalUpdate):
     db_hospital = db.query(Hospital).filter(Hospital.hospital_id == hospital_id).first()
@@ -15,7 +15,7 @@ def get_organization(db: Session, organization_id: UUID):
     return db.query(Organization).filter(Organization.organization_id == organization_id).first()
 
 def get_organizations(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Organization).offset(skip).limit(limit).all()
+    return db.query(Organization).order_by(Organization.created_at, Organization.organization_id).offset(skip).limit(limit).all()
 
 def update_organization(db: Session, organization_id: UUID, organization: OrganizationUpdate):
     db_organization = db.query(Organization).filter(Organization.organization_id == organization_id).first()
@@ -1,9 +1,11 @@
-
 from sqlalchemy.orm import Session
 from app.models.patient import Patient
 from app.schemas.patient import PatientCreate, PatientUpdate
 from uuid import UUID
 
+# Every query carries organization_id, the partition key of a partitioned `patients`
+# table, so PostgreSQL prunes the scan to the tenant's partition.
+
 def create_patient(db: Session, patient: PatientCreate):
     db_patient = Patient(**patient.dict())
     db.add(db_patient)
@@ -11,14 +13,19 @@ def create_patient(db: Session, patient: PatientCreate):
     db.refresh(db_patient)
     return db_patient
 
-def get_patient(db: Session, patient_id: UUID):
-    return db.query(Patient).filter(Patient.patient_id == patient_id).first()
+def get_patient(db: Session, patient_id: UUID, organization_id: UUID):
+    return db.query(Patient).filter(Patient.organization_id == organization_id, Patient.patient_id == patient_id).first()
 
-def get_patients(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Patient).offset(skip).limit(limit).all()
+def get_patients(db: Session, organization_id: UUID, skip: int = 0, limit: int = 100):
+    return (
+        db.query(Patient)
+        .filter(Patient.organization_id == organization_id)
+        .order_by(Patient.organization_id, Patient.created_at, Patient.patient_id)
+        .offset(skip).limit(limit).all()
+    )
 
-def update_patient(db: Session, patient_id: UUID, patient: PatientUpdate):
-    db_patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
+def update_patient(db: Session, patient_id: UUID, organization_id: UUID, patient: PatientUpdate):
+    db_patient = get_patient(db, patient_id, organization_id)
     if db_patient:
         for key, value in patient.dict(exclude_unset=True).items():
             setattr(db_patient, key, value)
@@ -26,8 +33,8 @@ def update_patient(db: Session, patient_id: UUID, patient: PatientUpdate):
         db.refresh(db_patient)
     return db_patient
 
-def delete_patient(db: Session, patient_id: UUID):
-    db_patient = db.query(Patient).filter(Patient.patient_id == patient_id).first()
+def delete_patient(db: Session, patient_id: UUID, organization_id: UUID):
+    db_patient = get_patient(db, patient_id, organization_id)
     if db_patient:
         db.delete(db_patient)
         db.commit()
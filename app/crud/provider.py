@@ -0,0 +1,34 @@
+
+from sqlalchemy.orm import Session
+from app.models.provider import Provider
+from app.schemas.provider import ProviderCreate, ProviderUpdate
+from uuid import UUID
+
+def create_provider(db: Session, provider: ProviderCreate):
+    db_provider = Provider(**provider.dict())
+    db.add(db_provider)
+    db.commit()
+    db.refresh(db_provider)
+    return db_provider
+
+def get_provider(db: Session, provider_id: UUID):
+    return db.query(Provider).filter(Provider.provider_id == provider_id).first()
+
+def get_providers(db: Session, skip: int = 0, limit: int = 100):
+    return db.query(Provider).order_by(Provider.department_id, Provider.created_at, Provider.provider_id).offset(skip).limit(limit).all()
+
+def update_provider(db: Session, provider_id: UUID, provider: ProviderUpdate):
+    db_provider = db.query(Provider).filter(Provider.provider_id == provider_id).first()
+    if db_provider:
+        for key, value in provider.dict(exclude_unset=True).items():
+            setattr(db_provider, key, value)
+        db.commit()
+        db.refresh(db_provider)
+    return db_provider
+
+def delete_provider(db: Session, provider_id: UUID):
+    db_provider = db.query(Provider).filter(Provider.provider_id == provider_id).first()
+    if db_provider:
+        db.delete(db_provider)
+        db.commit()
+    return db_provider
@@ -2,13 +2,14 @@
 from sqlalchemy.orm import Session
 from app.models.user import User, Role
 from app.schemas.user import UserCreate, UserUpdate, RoleCreate, RoleUpdate
+from app.auth.principal_cache import invalidate_role, invalidate_user
+from app.crud.aio.user import TOKEN_REVOKING_FIELDS
+from typing import Optional
 from uuid import UUID
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.auth.hashing import hash_password_sync
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hash_password_sync(password)
 
 # User CRUD operations
 def create_user(db: Session, user: UserCreate):
@@ -19,33 +20,46 @@ def create_user(db: Session, user: UserCreate):
     db.refresh(db_user)
     return db_user
 
-def get_user(db: Session, user_id: UUID):
-    return db.query(User).filter(User.user_id == user_id).first()
+def get_user(db: Session, user_id: UUID, organization_id: UUID):
+    return db.query(User).filter(User.organization_id == organization_id, User.user_id == user_id).first()
 
-def get_user_by_username(db: Session, username: str):
-    return db.query(User).filter(User.username == username).first()
+def get_user_by_username(db: Session, username: str, organization_id: Optional[UUID] = None):
+    # Only login omits the tenant key: the organization is not known before the user is found
+    query = db.query(User).filter(User.username == username)
+    if organization_id is not None:
+        query = query.filter(User.organization_id == organization_id)
+    return query.first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(db: Session, organization_id: UUID, skip: int = 0, limit: int = 100):
+    return (
+        db.query(User)
+        .filter(User.organization_id == organization_id)
+        .order_by(User.organization_id, User.created_at, User.user_id)
+        .offset(skip).limit(limit).all()
+    )
 
-def update_user(db: Session, user_id: UUID, user: UserUpdate):
-    db_user = db.query(User).filter(User.user_id == user_id).first()
+def update_user(db: Session, user_id: UUID, organization_id: UUID, user: UserUpdate):
+    db_user = get_user(db, user_id, organization_id)
     if db_user:
         update_data = user.dict(exclude_unset=True)
         if 'password' in update_data:
             update_data['password_hash'] = get_password_hash(update_data['password'])
             del update_data['password']
+        if any(getattr(db_user, key) != update_data[key] for key in TOKEN_REVOKING_FIELDS & update_data.keys()):
+            update_data['token_version'] = db_user.token_version + 1
         for key, value in update_data.items():
             setattr(db_user, key, value)
         db.commit()
+        invalidate_user(user_id)
         db.refresh(db_user)
     return db_user
 
-def delete_user(db: Session, user_id: UUID):
-    db_user = db.query(User).filter(User.user_id == user_id).first()
+def delete_user(db: Session, user_id: UUID, organization_id: UUID):
+    db_user = get_user(db, user_id, organization_id)
     if db_user:
         db.delete(db_user)
         db.commit()
+        invalidate_user(user_id)
     return db_user
 
 # Role CRUD operations
@@ -63,14 +77,18 @@ def get_role_by_name(db: Session, name: str):
     return db.query(Role).filter(Role.name == name).first()
 
 def get_roles(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Role).offset(skip).limit(limit).all()
+    return db.query(Role).order_by(Role.created_at, Role.role_id).offset(skip).limit(limit).all()
 
 def update_role(db: Session, role_id: UUID, role: RoleUpdate):
     db_role = db.query(Role).filter(Role.role_id == role_id).first()
     if db_role:
-        for key, value in role.dict(exclude_unset=True).items():
+        update_data = role.dict(exclude_unset=True)
+        if update_data.get("name", db_role.name) != db_role.name:
+            db.query(User).filter(User.role_id == role_id).update({User.token_version: User.token_version + 1}, synchronize_session=False)
+        for key, value in update_data.items():
             setattr(db_role, key, value)
         db.commit()
+        invalidate_role(role_id)
         db.refresh(db_role)
     return db_role
 
@@ -79,4 +97,5 @@ def delete_role(db: Session, role_id: UUID):
     if db_role:
         db.delete(db_role)
         db.commit()
+        invalidate_role(role_id)
     return db_role
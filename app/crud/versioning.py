@@ -0,0 +1,55 @@
+from typing import Iterable, Optional
+from fastapi import HTTPException
+from sqlalchemy import inspect, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm.exc import StaleDataError
+
+def etag(version: int) -> str:
+    # Strong validator: If-Match only compares strong ETags
+    return f'"{version}"'
+
+async def update_versioned(db: AsyncSession, model, where: list, values: dict, versions: Optional[Iterable[int]] = None):
+    """Apply `values` to the row matching `where` and increment its version, in one UPDATE ... RETURNING.
+
+    With `versions` (from If-Match) the row is only written if its current version is one of them;
+    otherwise 412 is raised with the current ETag. Returns the updated instance, or None when no row
+    matches `where`. The caller commits.
+    """
+    table = model.__table__
+    stmt = update(table).where(*where).values(**values, version=table.c.version + 1)
+    if versions is not None:
+        stmt = stmt.where(table.c.version.in_(list(versions)))
+    if db.bind.dialect.full_returning:
+        result = await db.execute(select(model).from_statement(stmt.returning(*table.c)).execution_options(populate_existing=True))
+        instance = result.scalars().first()
+    else:
+        # No UPDATE ... RETURNING before SQLAlchemy 2.0 outside PostgreSQL (tests run on SQLite)
+        matched = (await db.execute(stmt)).rowcount
+        instance = (await db.execute(select(model).where(*where).execution_options(populate_existing=True))).scalars().first() if matched else None
+    if instance is None and versions is not None:
+        # The precondition failed or the row is gone; only this slow path needs another query
+        current = (await db.execute(select(table.c.version).where(*where))).scalar()
+        if current is not None:
+            raise HTTPException(status_code=412, detail="Resource was modified by another request", headers={"ETag": etag(current)})
+    return instance
+
+async def delete_versioned(db: AsyncSession, instance) -> bool:
+    """Delete a loaded instance and commit.
+
+    The ORM guards the DELETE with the version that was read. If another request updated the row
+    in between, 409 is raised with the current ETag; if it deleted the row, False is returned.
+    """
+    state = inspect(instance)
+    table = state.mapper.local_table
+    where = [column == value for column, value in zip(state.mapper.primary_key, state.identity)]
+    await db.delete(instance)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        current = (await db.execute(select(table.c.version).where(*where))).scalar()
+        if current is None:
+            return False
+        raise HTTPException(status_code=409, detail="Resource was modified by another request", headers={"ETag": etag(current)})
+    return True
@@ -0,0 +1,105 @@
+import calendar
+from datetime import date
+from typing import List, Tuple
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import false, func, or_
+from app.models.patient import Patient
+
+SEARCH_DEFAULT_COUNT = 50
+SEARCH_MAX_COUNT = 1000
+# Query parameters that control the search rather than filter it
+CONTROL_PARAMS = ("_count", "_cursor", "organization_id")
+
+DATE_PREFIXES = ("eq", "ne", "lt", "gt", "le", "ge", "sa", "eb")
+STRING_COLUMNS = {"family": Patient.last_name, "given": Patient.first_name}
+
+def _bad_request(detail: str):
+    return HTTPException(status_code=400, detail=detail)
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def parse_date(value: str) -> Tuple[str, date, date]:
+    """Split a FHIR date search value into (prefix, first day, last day) of the precision given."""
+    prefix = value[:2] if value[:2] in DATE_PREFIXES else "eq"
+    raw = value[2:] if value[:2] in DATE_PREFIXES else value
+    try:
+        parts = [int(part) for part in raw.split("-")]
+        if len(parts) == 1:
+            return prefix, date(parts[0], 1, 1), date(parts[0], 12, 31)
+        if len(parts) == 2:
+            return prefix, date(parts[0], parts[1], 1), date(parts[0], parts[1], calendar.monthrange(parts[0], parts[1])[1])
+        if len(parts) == 3:
+            day = date(*parts)
+            return prefix, day, day
+    except ValueError:
+        pass
+    raise _bad_request(f"Invalid birthdate search value: {value}")
+
+def date_filter(column, value: str):
+    prefix, start, end = parse_date(value)
+    if prefix == "eq":
+        return column.between(start, end)
+    if prefix == "ne":
+        return ~column.between(start, end)
+    if prefix in ("lt", "eb"):
+        return column < start
+    if prefix in ("gt", "sa"):
+        return column > end
+    if prefix == "le":
+        return column <= end
+    return column >= start
+
+def string_filter(column, modifier: str, value: str):
+    # Matches the lower(...) expression indexes: text_pattern_ops for prefixes, trigram for contains
+    if modifier == "exact":
+        return column == value
+    if modifier == "contains":
+        return func.lower(column).like(f"%{_like_escape(value.lower())}%", escape="\\")
+    if modifier == "":
+        return func.lower(column).like(f"{_like_escape(value.lower())}%", escape="\\")
+    raise _bad_request(f"Unsupported search modifier :{modifier}")
+
+def _ids(values: List[str]):
+    try:
+        return [UUID(value.split("|")[-1].strip()) for value in values if value.strip()]
+    except ValueError:
+        return None
+
+def patient_search_filters(params: List[Tuple[str, str]]) -> list:
+    """Translate FHIR Patient search parameters into SQL filters, ANDed across parameters.
+
+    Comma-separated values within one parameter are ORed, as in the FHIR spec. Unknown
+    parameters are ignored (lenient handling).
+    """
+    filters = []
+    for key, value in params:
+        name, _, modifier = key.partition(":")
+        if name in CONTROL_PARAMS or not value:
+            continue
+        values = value.split(",")
+        if name in STRING_COLUMNS:
+            column = STRING_COLUMNS[name]
+            clauses = [string_filter(column, modifier, v) for v in values]
+        elif name == "birthdate":
+            clauses = [date_filter(Patient.date_of_birth, v) for v in values]
+        elif name == "gender":
+            clauses = [Patient.gender == v for v in values]
+        elif name in ("_id", "identifier"):
+            ids = _ids(values)
+            # A malformed id cannot match any patient
+            clauses = [Patient.patient_id.in_(ids)] if ids else [false()]
+        else:
+            continue
+        filters.append(clauses[0] if len(clauses) == 1 else or_(*clauses))
+    return filters
+
+def search_count(value) -> int:
+    if value is None:
+        return SEARCH_DEFAULT_COUNT
+    try:
+        count = int(value)
+    except ValueError:
+        raise _bad_request("_count must be an integer")
+    return max(1, min(count, SEARCH_MAX_COUNT))
@@ -0,0 +1,44 @@
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import create_model
+from sqlalchemy.orm import load_only
+
+# Sparse fieldsets: `?fields=first_name,last_name` selects only those columns and serializes
+# them through a trimmed copy of the response model.
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return, e.g. first_name,last_name,date_of_birth; all fields when omitted"
+
+def parse_fields(fields: Optional[str], schema) -> Optional[Tuple[str, ...]]:
+    """The requested fields in the schema's order (so equal selections share a model), or None for all."""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - schema.__fields__.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in schema.__fields__ if name in requested) or None
+
+def load_only_fields(model, fields: Sequence[str], always: Sequence[str] = ()):
+    """load_only() of the selected columns plus those the caller needs itself (cursor keys, version)."""
+    columns = model.__table__.c
+    return load_only(*[getattr(model, name) for name in dict.fromkeys((*fields, *always)) if name in columns])
+
+@lru_cache(maxsize=256)
+def sparse_model(schema, fields: Tuple[str, ...]):
+    definitions = {}
+    for name in fields:
+        field = schema.__fields__[name]
+        type_ = Optional[field.outer_type_] if field.allow_none else field.outer_type_
+        definitions[name] = (type_, ... if field.required else field.default)
+    return create_model(f"{schema.__name__}Fields", __config__=schema.__config__, **definitions)
+
+def sparse_response(value, schema, fields: Tuple[str, ...], response: Response) -> JSONResponse:
+    """Serialize rows through the trimmed model, bypassing the route's full response_model; headers
+    already set on `response` (cursor, ETag) are kept."""
+    model = sparse_model(schema, fields)
+    content = [model.from_orm(row) for row in value] if isinstance(value, list) else model.from_orm(value)
+    headers = {key: header for key, header in response.headers.items() if key != "content-length"}
+    return JSONResponse(content=jsonable_encoder(content), headers=headers)
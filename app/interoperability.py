@@ -3,14 +3,35 @@ from fhir.resources.patient import Patient as FHIRPatient
 from fhir.resources.humanname import HumanName
 from fhir.resources.identifier import Identifier
 from hl7 import parse as hl7_parse
-from hl7.client import MLLPClient
+from app.mllp import get_pool
 from app.models.patient import Patient
 from app.schemas.patient import PatientCreate
+from typing import Optional
 from uuid import UUID
 import json
+import os
 from fastapi import HTTPException
 
-def patient_to_fhir(patient: Patient) -> dict:
+# Build resources through fhir.resources (full validation) instead of the direct mapping
+FHIR_STRICT_SERIALIZATION = os.getenv("FHIR_STRICT_SERIALIZATION", "false").lower() in ("1", "true", "yes")
+
+def patient_to_fhir(patient: Patient, strict: Optional[bool] = None) -> dict:
+    if strict if strict is not None else FHIR_STRICT_SERIALIZATION:
+        return _patient_to_fhir_strict(patient)
+    try:
+        # Same keys, order and omissions as the fhir.resources output, without the model round trip
+        patient_id = str(patient.patient_id)
+        resource = {"id": patient_id, "birthDate": patient.date_of_birth.isoformat()}
+        if patient.gender is not None:
+            resource["gender"] = patient.gender
+        resource["identifier"] = [{"value": patient_id}]
+        resource["name"] = [{"family": patient.last_name, "given": [patient.first_name]}]
+        resource["resourceType"] = "Patient"
+        return resource
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error converting patient to FHIR: {str(e)}")
+
+def _patient_to_fhir_strict(patient: Patient) -> dict:
     try:
         fhir_patient = FHIRPatient(
             id=str(patient.patient_id),
@@ -23,6 +44,15 @@ def patient_to_fhir(patient: Patient) -> dict:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error converting patient to FHIR: {str(e)}")
 
+def patients_to_bundle(patients, strict: Optional[bool] = None, link: Optional[list] = None, total: Optional[int] = None) -> dict:
+    bundle = {"resourceType": "Bundle", "type": "searchset"}
+    if total is not None:
+        bundle["total"] = total
+    if link:
+        bundle["link"] = link
+    bundle["entry"] = [{"resource": patient_to_fhir(patient, strict), "search": {"mode": "match"}} for patient in patients]
+    return bundle
+
 def fhir_to_patient(fhir_data: dict) -> PatientCreate:
     try:
         return PatientCreate(
@@ -37,9 +67,9 @@ def fhir_to_patient(fhir_data: dict) -> PatientCreate:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error converting FHIR to patient: {str(e)}")
 
-def patient_to_hl7(patient: Patient) -> str:
+def patient_to_hl7(patient: Patient, control_id: str = "MSG00001") -> str:
     try:
-        hl7_message = f"MSH|^~\&|INFOCTOR|HOSPITAL|HL7RECV|ANYWHERE|20230101000000||ADT^A01|MSG00001|P|2.3\r"
+        hl7_message = f"MSH|^~\\&|INFOCTOR|HOSPITAL|HL7RECV|ANYWHERE|20230101000000||ADT^A01|{control_id}|P|2.3\r"
         hl7_message += f"PID|||{patient.patient_id}||{patient.last_name}^{patient.first_name}||{patient.date_of_birth}|{patient.gender}"
         return hl7_message
     except Exception as e:
@@ -50,9 +80,10 @@ def hl7_to_patient(hl7_message: str) -> PatientCreate:
         parsed_message = hl7_parse(hl7_message)
         pid_segment = parsed_message.segment('PID')
         
+        # PID-5 is an XPN: the first repetition's components are family^given
         return PatientCreate(
-            first_name=str(pid_segment[5][1]),
-            last_name=str(pid_segment[5][0]),
+            first_name=str(pid_segment[5][0][1]),
+            last_name=str(pid_segment[5][0][0]),
             date_of_birth=str(pid_segment[7]),
             gender=str(pid_segment[8]),
             organization_id=UUID(str(pid_segment[3][0]))
@@ -64,8 +95,6 @@ def hl7_to_patient(hl7_message: str) -> PatientCreate:
 
 async def send_hl7_message(host: str, port: int, message: str):
     try:
-        async with MLLPClient(host, port) as client:
-            response = await client.send_message(message)
-        return response
+        return await get_pool(host, port).send(message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error sending HL7 message: {str(e)}")
@@ -0,0 +1,255 @@
+import bisect
+import contextvars
+import threading
+import time
+from collections import Counter
+from typing import Dict, Sequence, Tuple
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (seconds) of the connection wait histogram buckets
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Request latency and per-request database time
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+# Database queries issued by one request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style: bucket i counts observations <= bounds[i]."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            return {"count": self.count, "sum": round(self.sum, 6), "buckets": buckets}
+
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_events = 0
+        self.wait_seconds = Histogram(POOL_WAIT_BUCKETS)
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        return {
+            "size": pool.size() if pool is not None else 0,
+            "checked_out": pool.checkedout() if pool is not None else 0,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "overflow_events": self.overflow_events,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+# Metrics of every instrumented pool, by engine name
+POOLS: Dict[str, PoolMetrics] = {}
+
+class InstrumentedPoolMixin:
+    """Times every wait for a connection and counts timeouts and overflow connections."""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        metrics = self.metrics
+        if metrics is None:
+            return super()._do_get()
+        started = time.perf_counter()
+        overflow = self._overflow
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.wait_seconds.observe(time.perf_counter() - started)
+        metrics.checkouts += 1
+        # _overflow counts up from -pool_size; above zero the connection was opened beyond the pool
+        if self._overflow > max(overflow, 0):
+            metrics.overflow_events += 1
+        return connection
+
+    def recreate(self):
+        # Engine.dispose() swaps in a fresh pool; keep reporting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def instrument(engine, name: str) -> PoolMetrics:
+    """Attach metrics to an engine created with one of the instrumented pool classes."""
+    pool = getattr(engine, "sync_engine", engine).pool
+    metrics = POOLS[name] = PoolMetrics(name)
+    if isinstance(pool, InstrumentedPoolMixin):
+        pool.metrics = metrics
+        metrics.pool = pool
+    return metrics
+
+def pool_stats() -> dict:
+    return {name: metrics.snapshot() for name, metrics in POOLS.items()}
+
+class RouteMetrics:
+    def __init__(self):
+        self.latency = Histogram(REQUEST_BUCKETS)
+        self.db_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = Histogram(REQUEST_BUCKETS)
+        self.responses = Counter()
+
+# Per (method, route template); requests that match no route share the "unmatched" template
+ROUTES: Dict[Tuple[str, str], RouteMetrics] = {}
+# Duration of every statement, by engine name
+QUERIES: Dict[str, Histogram] = {}
+in_flight = 0
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Set by MetricsMiddleware for the duration of a request; the cursor hooks add to it
+request_stats: contextvars.ContextVar = contextvars.ContextVar("request_stats", default=None)
+
+def track_queries(engine, name: str):
+    """Time every statement run on `engine` and charge it to the current request, if any."""
+    histogram = QUERIES[name] = Histogram(QUERY_BUCKETS)
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        histogram.observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    event.listen(sync_engine, "before_cursor_execute", before)
+    event.listen(sync_engine, "after_cursor_execute", after)
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status, query count and database time per route template."""
+
+    def __init__(self, app):
+        self.app = app
+        self._templates = None
+
+    def _template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._templates is None:
+            # Routes are all registered by the first request
+            self._templates = {getattr(route, "endpoint", None): route.path for route in scope["app"].routes}
+        return self._templates.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        global in_flight
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight -= 1
+            request_stats.reset(token)
+            key = (scope["method"], self._template(scope))
+            route = ROUTES.get(key)
+            if route is None:
+                route = ROUTES.setdefault(key, RouteMetrics())
+            route.latency.observe(elapsed)
+            route.db_queries.observe(stats.queries)
+            route.db_seconds.observe(stats.db_seconds)
+            route.responses[status] += 1
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+def _histogram_lines(name: str, histogram: Histogram, **labels):
+    snapshot = histogram.snapshot()
+    prefix = _labels(**labels)
+    for bound, count in snapshot["buckets"].items():
+        yield f"{name}_bucket{{{prefix}{',' if prefix else ''}le=\"{bound}\"}} {count}"
+    yield f"{name}_sum{{{prefix}}} {snapshot['sum']}"
+    yield f"{name}_count{{{prefix}}} {snapshot['count']}"
+
+def render_prometheus() -> str:
+    """All request, query and pool metrics in the Prometheus text exposition format."""
+    lines = ["# HELP http_requests_in_flight Requests being handled.", "# TYPE http_requests_in_flight gauge",
+             f"http_requests_in_flight {in_flight}"]
+    routes = list(ROUTES.items())
+    lines += ["# HELP http_requests_total Responses by route and status.", "# TYPE http_requests_total counter"]
+    for (method, path), route in routes:
+        for status, count in list(route.responses.items()):
+            lines.append(f"http_requests_total{{{_labels(method=method, route=path, status=status)}}} {count}")
+    for name, attribute, help_text in (
+        ("http_request_duration_seconds", "latency", "Request latency by route."),
+        ("http_request_db_queries", "db_queries", "Database queries issued per request."),
+        ("http_request_db_seconds", "db_seconds", "Time per request spent in database queries."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (method, path), route in routes:
+            lines += _histogram_lines(name, getattr(route, attribute), method=method, route=path)
+    lines += ["# HELP db_query_duration_seconds Statement duration by engine.", "# TYPE db_query_duration_seconds histogram"]
+    for engine, histogram in list(QUERIES.items()):
+        lines += _histogram_lines("db_query_duration_seconds", histogram, engine=engine)
+    pools = {name: metrics.snapshot() for name, metrics in list(POOLS.items())}
+    for name, key, kind, help_text in (
+        ("db_pool_size", "size", "gauge", "Connections kept open by the pool."),
+        ("db_pool_checked_out", "checked_out", "gauge", "Connections in use."),
+        ("db_pool_overflow", "overflow", "gauge", "Connections open beyond the pool size."),
+        ("db_pool_checkouts_total", "checkouts", "counter", "Connections handed out."),
+        ("db_pool_timeouts_total", "timeouts", "counter", "Checkouts that gave up after DB_POOL_TIMEOUT."),
+        ("db_pool_overflow_events_total", "overflow_events", "counter", "Checkouts that opened an overflow connection."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        lines += [f"{name}{{{_labels(pool=pool)}}} {snapshot[key]}" for pool, snapshot in pools.items()]
+    lines += ["# HELP db_pool_wait_seconds Time spent waiting for a connection.", "# TYPE db_pool_wait_seconds histogram"]
+    for pool, metrics in list(POOLS.items()):
+        lines += _histogram_lines("db_pool_wait_seconds", metrics.wait_seconds, pool=pool)
+    return "\n".join(lines) + "\n"
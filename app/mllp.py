@@ -0,0 +1,238 @@
+import asyncio
+import os
+import random
+import socket
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# MLLP block framing: <VT> message <FS><CR>
+START_BLOCK = b"\x0b"
+END_BLOCK = b"\x1c\x0d"
+
+MLLP_POOL_SIZE = int(os.getenv("MLLP_POOL_SIZE", "2"))
+MLLP_MAX_IN_FLIGHT = int(os.getenv("MLLP_MAX_IN_FLIGHT", "32"))
+MLLP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("MLLP_CONNECT_TIMEOUT_SECONDS", "5"))
+MLLP_ACK_TIMEOUT_SECONDS = float(os.getenv("MLLP_ACK_TIMEOUT_SECONDS", "30"))
+MLLP_MAX_RETRIES = int(os.getenv("MLLP_MAX_RETRIES", "3"))
+MLLP_BACKOFF_BASE_SECONDS = 0.1
+MLLP_BACKOFF_MAX_SECONDS = 5.0
+
+class MLLPError(Exception):
+    pass
+
+def frame(message: str, encoding: str = "utf-8") -> bytes:
+    return START_BLOCK + message.encode(encoding) + END_BLOCK
+
+async def read_frame(reader: asyncio.StreamReader, encoding: str = "utf-8") -> str:
+    """Read one MLLP block; raises asyncio.IncompleteReadError when the peer closes."""
+    data = await reader.readuntil(END_BLOCK)
+    start = data.find(START_BLOCK)
+    return data[start + 1 if start >= 0 else 0:-len(END_BLOCK)].decode(encoding)
+
+def _segments(message: str) -> List[List[str]]:
+    return [segment.split("|") for segment in message.replace("\n", "\r").split("\r") if segment]
+
+def control_id(message: str) -> str:
+    """MSH-10 of a message; MSH-1 is the field separator itself, so MSH-n is field n-1."""
+    for fields in _segments(message):
+        if fields[0] == "MSH" and len(fields) > 9:
+            return fields[9]
+    raise MLLPError("Message has no MSH-10 control ID")
+
+def parse_ack(ack: str) -> Tuple[str, str]:
+    """Return the (MSA-1 acknowledgment code, MSA-2 original control ID) of an ACK."""
+    for fields in _segments(ack):
+        if fields[0] == "MSA" and len(fields) > 2:
+            return fields[1], fields[2]
+    raise MLLPError("ACK has no MSA segment")
+
+def new_control_id() -> str:
+    # MSH-10 is limited to 20 characters
+    return uuid.uuid4().hex[:20]
+
+def build_ack(message: str, code: str = "AA", text: Optional[str] = None) -> str:
+    """Build an ACK for `message`, swapping sender and receiver and echoing MSH-10 in MSA-2."""
+    msh = next((fields for fields in _segments(message) if fields[0] == "MSH"), None)
+    if msh is None:
+        raise MLLPError("Message has no MSH segment")
+    msh = msh + [""] * (12 - len(msh))
+    trigger = msh[8].split("^")[1] if "^" in msh[8] else ""
+    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    header = "|".join(["MSH", msh[1], msh[4], msh[5], msh[2], msh[3], timestamp, "", f"ACK^{trigger}" if trigger else "ACK", new_control_id(), msh[10], msh[11]])
+    msa = f"MSA|{code}|{msh[9]}" + (f"|{text}" if text else "")
+    return f"{header}\r{msa}"
+
+class MLLPConnection:
+    """One persistent MLLP connection with pipelined sends.
+
+    Up to `max_in_flight` messages may be awaiting an ACK at once; ACKs are matched to
+    their message by MSA-2, so the receiver may answer out of order.
+    """
+
+    def __init__(self, host: str, port: int, max_in_flight: int = MLLP_MAX_IN_FLIGHT, ack_timeout: float = MLLP_ACK_TIMEOUT_SECONDS, encoding: str = "utf-8"):
+        self.host = host
+        self.port = port
+        self.ack_timeout = ack_timeout
+        self.encoding = encoding
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing() and self._reader_task is not None and not self._reader_task.done()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+
+    async def connect(self, timeout: float = MLLP_CONNECT_TIMEOUT_SECONDS):
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout)
+        sock = self._writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self._reader_task = asyncio.get_event_loop().create_task(self._read_acks())
+
+    async def _read_acks(self):
+        error = None
+        try:
+            while True:
+                ack = await read_frame(self._reader, self.encoding)
+                try:
+                    _, original_id = parse_ack(ack)
+                except MLLPError:
+                    continue
+                future = self._pending.pop(original_id, None)
+                if future is not None and not future.done():
+                    future.set_result(ack)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            error = e
+        finally:
+            self._fail_pending(ConnectionError(f"MLLP connection to {self.host}:{self.port} closed: {error}"))
+
+    def _fail_pending(self, error: Exception):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def send(self, message: str) -> str:
+        message_id = control_id(message)
+        async with self._slots:
+            if not self.connected:
+                raise ConnectionError(f"MLLP connection to {self.host}:{self.port} is not open")
+            if message_id in self._pending:
+                raise MLLPError(f"Control ID {message_id} is already awaiting an ACK")
+            future = asyncio.get_event_loop().create_future()
+            self._pending[message_id] = future
+            try:
+                async with self._write_lock:
+                    self._writer.write(frame(message, self.encoding))
+                    await self._writer.drain()
+                return await asyncio.wait_for(future, self.ack_timeout)
+            finally:
+                self._pending.pop(message_id, None)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._fail_pending(ConnectionError("MLLP connection closed"))
+
+class MLLPConnectionPool:
+    """Persistent connections to one MLLP destination, reconnecting with exponential backoff."""
+
+    def __init__(self, host: str, port: int, size: int = MLLP_POOL_SIZE, max_in_flight: int = MLLP_MAX_IN_FLIGHT,
+                 ack_timeout: float = MLLP_ACK_TIMEOUT_SECONDS, max_retries: int = MLLP_MAX_RETRIES):
+        self.host = host
+        self.port = port
+        self.size = size
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self._connections: List[MLLPConnection] = []
+        self._lock = asyncio.Lock()
+        self.connects = 0
+        self.reconnects = 0
+        self.sent = 0
+        self.failed = 0
+
+    async def _connection(self) -> MLLPConnection:
+        async with self._lock:
+            self._connections = [c for c in self._connections if c.connected]
+            # Fill an open connection's pipeline before paying for another handshake
+            available = [c for c in self._connections if c.in_flight < self.max_in_flight]
+            if available:
+                return min(available, key=lambda c: c.in_flight)
+            if len(self._connections) < self.size:
+                connection = MLLPConnection(self.host, self.port, self.max_in_flight, self.ack_timeout)
+                await connection.connect()
+                self.connects += 1
+                self._connections.append(connection)
+                return connection
+            return min(self._connections, key=lambda c: c.in_flight)
+
+    async def send(self, message: str) -> str:
+        attempt = 0
+        while True:
+            try:
+                connection = await self._connection()
+                ack = await connection.send(message)
+                self.sent += 1
+                return ack
+            except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.failed += 1
+                    raise MLLPError(f"Could not deliver message to {self.host}:{self.port}: {e}") from e
+                self.reconnects += 1
+                delay = min(MLLP_BACKOFF_MAX_SECONDS, MLLP_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+                await asyncio.sleep(delay * (0.5 + random.random() / 2))
+
+    async def send_many(self, messages: List[str]) -> List[object]:
+        """Pipeline many messages; each result is the ACK or the exception for that message."""
+        return await asyncio.gather(*(self.send(message) for message in messages), return_exceptions=True)
+
+    async def close(self):
+        async with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            await connection.close()
+
+    def stats(self) -> dict:
+        return {
+            "destination": f"{self.host}:{self.port}",
+            "open_connections": sum(1 for c in self._connections if c.connected),
+            "in_flight": sum(c.in_flight for c in self._connections),
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+_pools: Dict[Tuple[str, int], MLLPConnectionPool] = {}
+
+def get_pool(host: str, port: int) -> MLLPConnectionPool:
+    pool = _pools.get((host, port))
+    if pool is None:
+        pool = _pools[(host, port)] = MLLPConnectionPool(host, port)
+    return pool
+
+async def close_pools():
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        await pool.close()
@@ -0,0 +1,313 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict, deque
+from typing import List, Optional
+from uuid import UUID
+from fastapi import HTTPException
+from hl7 import ParseException, parse as hl7_parse
+from sqlalchemy import select, update
+from sqlalchemy.exc import DBAPIError
+from app import mpi
+from app.bulk_import import write_patient_batch
+from app.interoperability import hl7_to_patient
+from app.mllp import MLLPError, build_ack, frame, read_frame
+from app.models.patient import Patient
+
+MLLP_LISTEN_HOST = os.getenv("MLLP_LISTEN_HOST", "0.0.0.0")
+MLLP_LISTEN_PORT = int(os.getenv("MLLP_LISTEN_PORT", "2575"))
+# Patients written per transaction, and how long a partial batch may wait for more messages
+MLLP_WRITE_BATCH_SIZE = int(os.getenv("MLLP_WRITE_BATCH_SIZE", "500"))
+MLLP_WRITE_BATCH_WAIT_SECONDS = float(os.getenv("MLLP_WRITE_BATCH_WAIT_SECONDS", "0.02"))
+# Parsed messages waiting for the writer; when full, connections stop reading (TCP back-pressure)
+MLLP_WRITE_QUEUE_SIZE = int(os.getenv("MLLP_WRITE_QUEUE_SIZE", "5000"))
+# Unacknowledged messages a single connection may have outstanding
+MLLP_CONNECTION_MAX_IN_FLIGHT = int(os.getenv("MLLP_CONNECTION_MAX_IN_FLIGHT", "256"))
+
+INSERT_EVENTS = ("A01", "A04", "A05", "A28")
+UPDATE_EVENTS = ("A08", "A31")
+
+class InboundError(Exception):
+    pass
+
+class PatientOperation:
+    def __init__(self, kind: str, values: dict, patient_id: Optional[UUID] = None):
+        self.kind = kind
+        self.values = values
+        self.patient_id = patient_id
+
+def parse_adt(message: str) -> PatientOperation:
+    """Map an ADT message to an insert (A01/A04/A05/A28) or an update keyed on PID-2 (A08/A31)."""
+    try:
+        parsed = hl7_parse(message)
+        message_type = str(parsed.segment("MSH")[9])
+    except (ParseException, KeyError, IndexError, ValueError) as e:
+        raise InboundError(f"Invalid HL7 message: {e}")
+    event_type = message_type.split("^")[1] if "^" in message_type else ""
+    if not message_type.startswith("ADT") or event_type not in INSERT_EVENTS + UPDATE_EVENTS:
+        raise InboundError(f"Unsupported message type {message_type}")
+    try:
+        patient = hl7_to_patient(message)
+    except HTTPException as e:
+        raise InboundError(e.detail)
+    if event_type in INSERT_EVENTS:
+        return PatientOperation("insert", {"patient_id": uuid.uuid4(), **patient.dict()})
+    # An update only sets what the message carries: defaults (status, contact fields) and
+    # empty components would otherwise overwrite the stored demographics
+    values = {key: value for key, value in patient.dict(exclude_unset=True).items() if value != ""}
+    try:
+        patient_id = UUID(str(parsed.segment("PID")[2]))
+    except (IndexError, ValueError):
+        raise InboundError(f"ADT^{event_type} requires the patient ID in PID-2")
+    return PatientOperation("update", values, patient_id)
+
+class PatientBatchWriter:
+    """Drains parsed ADT operations from a bounded queue and writes them in batches.
+
+    `submit` blocks while the queue is full, which stops the submitting connection from
+    reading further frames; senders then see their TCP window close instead of the
+    listener buffering without limit.
+    """
+
+    def __init__(self, session_factory, batch_size: int = MLLP_WRITE_BATCH_SIZE,
+                 max_wait: float = MLLP_WRITE_BATCH_WAIT_SECONDS, queue_size: int = MLLP_WRITE_QUEUE_SIZE, shard_router=None):
+        self.session_factory = session_factory
+        # With a shard router, each batch is split by the shard of the patients' organizations
+        self.shard_router = shard_router
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._task = None
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.duplicates = 0
+        self._recent_batch_ms = deque(maxlen=1000)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def submit(self, operation: PatientOperation) -> asyncio.Future:
+        future = asyncio.get_event_loop().create_future()
+        await self.queue.put((operation, future))
+        return future
+
+    async def _next_batch(self) -> List[tuple]:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            started = time.perf_counter()
+            try:
+                errors = await self._write(batch)
+            except Exception as e:
+                errors = [e] * len(batch)
+            self._recent_batch_ms.append((time.perf_counter() - started) * 1000)
+            self.batches += 1
+            for (_, future), error in zip(batch, errors):
+                if error is None:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                if not future.done():
+                    future.set_result(error)
+
+    async def _write(self, batch: List[tuple]) -> List[Optional[Exception]]:
+        errors: List[Optional[Exception]] = [None] * len(batch)
+        shards = defaultdict(list)
+        for i, (operation, _) in enumerate(batch):
+            if self.shard_router is None:
+                shards[None].append(i)
+                continue
+            try:
+                shards[await self.shard_router.shard_for(operation.values["organization_id"])].append(i)
+            except HTTPException as e:
+                errors[i] = InboundError(e.detail)
+        for shard, indexes in shards.items():
+            session_factory = self.session_factory if shard is None else self.shard_router.session_factory(shard)
+            await self._write_shard(session_factory, batch, indexes, errors)
+        return errors
+
+    async def _write_shard(self, session_factory, batch: List[tuple], indexes: List[int], errors: List[Optional[Exception]]):
+        inserts = [i for i in indexes if batch[i][0].kind == "insert"]
+        updates = [i for i in indexes if batch[i][0].kind == "update"]
+        async with session_factory() as db:
+            inserts = await self._skip_duplicates(db, batch, inserts)
+            if inserts:
+                for i, error in zip(inserts, await write_patient_batch(db, [batch[i][0].values for i in inserts])):
+                    errors[i] = error
+            updated = []
+            for i in updates:
+                operation = batch[i][0]
+                try:
+                    async with db.begin_nested():
+                        result = await db.execute(
+                            update(Patient)
+                            .where(Patient.patient_id == operation.patient_id, Patient.organization_id == operation.values["organization_id"])
+                            .values(**operation.values, version=Patient.version + 1)
+                        )
+                    if result.rowcount == 0:
+                        errors[i] = InboundError(f"Patient {operation.patient_id} not found")
+                    else:
+                        updated.append(operation.patient_id)
+                except DBAPIError as e:
+                    errors[i] = e.orig or e
+            if updates:
+                # Blocking keys are rebuilt from the whole stored row, not just the fields the messages changed
+                if updated:
+                    rows = await db.execute(select(*Patient.__table__.c).where(Patient.patient_id.in_(updated)))
+                    await mpi.index_patients(db, [dict(row._mapping) for row in rows])
+                await db.commit()
+
+    async def _skip_duplicates(self, db, batch: List[tuple], inserts: List[int]) -> List[int]:
+        """Drop A01/A04s for patients already registered (typically re-sent messages); they are still ACKed with AA."""
+        by_organization = defaultdict(list)
+        for i in inserts:
+            by_organization[batch[i][0].values["organization_id"]].append(i)
+        kept = []
+        for organization_id, indexes in by_organization.items():
+            records = [batch[i][0].values for i in indexes]
+            matches = await mpi.find_matches_batch(db, organization_id, records, threshold=mpi.MPI_MATCH_THRESHOLD)
+            # Repeats within the batch itself, found through the same blocking keys
+            seen = defaultdict(list)
+            for i, record, found in zip(indexes, records, matches):
+                keys = mpi.blocking_keys(record)
+                if found or any(mpi.score(record, other) >= mpi.MPI_MATCH_THRESHOLD for key in keys for other in seen[key]):
+                    self.duplicates += 1
+                    continue
+                for key in keys:
+                    seen[key].append(record)
+                kept.append(i)
+        return sorted(kept)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        recent = sorted(self._recent_batch_ms)
+        return {
+            "queued": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "duplicates": self.duplicates,
+            "mean_batch_size": round((self.written + self.failed) / self.batches, 1) if self.batches else 0.0,
+            "recent_p99_batch_ms": round(recent[int(len(recent) * 0.99)], 3) if recent else 0.0,
+        }
+
+class MLLPListener:
+    """Asyncio MLLP server for inbound ADT feeds.
+
+    Messages are parsed as they arrive, handed to the shared batch writer and acknowledged
+    with AA once stored or AE with the reason otherwise. ACKs go out as each message
+    completes, so pipelining senders must correlate them by MSA-2.
+    """
+
+    def __init__(self, session_factory, host: str = MLLP_LISTEN_HOST, port: int = MLLP_LISTEN_PORT,
+                 max_in_flight: int = MLLP_CONNECTION_MAX_IN_FLIGHT, **writer_options):
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.writer = PatientBatchWriter(session_factory, **writer_options)
+        self._server = None
+        self.connections = 0
+        self.received = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    @property
+    def sockets(self):
+        return self._server.sockets if self._server is not None else []
+
+    async def start(self):
+        self.writer.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        slots = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    message = await read_frame(reader)
+                except (asyncio.IncompleteReadError, UnicodeDecodeError):
+                    slots.release()
+                    break
+                self.received += 1
+                task = asyncio.get_event_loop().create_task(self._process(message, writer, slots))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            self.connections -= 1
+            writer.close()
+
+    async def _process(self, message: str, writer: asyncio.StreamWriter, slots: asyncio.Semaphore):
+        try:
+            try:
+                error = await (await self.writer.submit(parse_adt(message)))
+            except InboundError as e:
+                error = e
+            if error is None:
+                self.accepted += 1
+                ack = build_ack(message, "AA")
+            else:
+                self.rejected += 1
+                ack = build_ack(message, "AE", _ack_text(error))
+            if not writer.is_closing():
+                writer.write(frame(ack))
+                await writer.drain()
+        except (MLLPError, ConnectionError, OSError):
+            # No MSH to acknowledge or the peer went away; nothing more can be sent
+            self.rejected += 1
+        finally:
+            slots.release()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.writer.close()
+
+    def stats(self) -> dict:
+        return {
+            "open_connections": self.connections,
+            "received": self.received,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "writer": self.writer.stats(),
+        }
+
+def _ack_text(error: Exception) -> str:
+    # MSA-3 must not contain HL7 delimiters or segment breaks
+    text = str(error).splitlines()[0] if str(error) else type(error).__name__
+    for delimiter in "|^~\\&\r":
+        text = text.replace(delimiter, " ")
+    return text[:80]
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Index, Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -7,6 +7,7 @@ import uuid
 
 class Department(Base):
     __tablename__ = "departments"
+    __table_args__ = (Index("idx_departments_keyset", "hospital_id", "created_at", "department_id"),)
 
     department_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     hospital_id = Column(UUID(as_uuid=True), ForeignKey('hospitals.hospital_id'), nullable=False)
@@ -14,7 +15,11 @@ class Department(Base):
     specialty = Column(String)
     status = Column(String, default="active")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # See Organization.version
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     hospital = relationship("Hospital", back_populates="departments")
-    providers = relationship("Provider", back_populates="department")
+    providers = relationship("Provider", back_populates="department", order_by="(Provider.created_at, Provider.provider_id)")
+
+    __mapper_args__ = {"version_id_col": version}
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Index, Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -7,6 +7,7 @@ import uuid
 
 class Hospital(Base):
     __tablename__ = "hospitals"
+    __table_args__ = (Index("idx_hospitals_keyset", "organization_id", "created_at", "hospital_id"),)
 
     hospital_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     organization_id = Column(UUID(as_uuid=True), ForeignKey('organizations.organization_id'), nullable=False)
@@ -15,7 +16,11 @@ class Hospital(Base):
     phone = Column(String)
     status = Column(String, default="active")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # See Organization.version
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     organization = relationship("Organization", back_populates="hospitals")
-    departments = relationship("Department", back_populates="hospital")
+    departments = relationship("Department", back_populates="hospital", order_by="(Department.created_at, Department.department_id)")
+
+    __mapper_args__ = {"version_id_col": version}
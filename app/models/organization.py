@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, func
+from sqlalchemy import Column, Index, Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -6,13 +6,30 @@ import uuid
 
 class Organization(Base):
     __tablename__ = "organizations"
+    __table_args__ = (Index("idx_organizations_keyset", "created_at", "organization_id"),)
 
     organization_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
     subscription_plan = Column(String)
     status = Column(String, default="active")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Incremented by every update (ORM flushes included); the ETag clients send back in If-Match
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
-    hospitals = relationship("Hospital", back_populates="organization")
+    # Ordered like the keyset index so tree loads read it in order
+    hospitals = relationship("Hospital", back_populates="organization", order_by="(Hospital.created_at, Hospital.hospital_id)")
     users = relationship("User", back_populates="organization")
+    patients = relationship("Patient", back_populates="organization")
+
+    __mapper_args__ = {"version_id_col": version}
+
+class TenantShard(Base):
+    """Database shard holding an organization's patient data; lives in the directory database."""
+    __tablename__ = "tenant_shards"
+
+    organization_id = Column(UUID(as_uuid=True), ForeignKey("organizations.organization_id", ondelete="CASCADE"), primary_key=True)
+    shard = Column(String(100), nullable=False)
+    # "moving" while the tenant is copied to another shard; requests get 503 meanwhile
+    status = Column(String(20), nullable=False, default="active")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, func, Date
+from sqlalchemy import Column, Index, Integer, String, DateTime, ForeignKey, func, Date
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -7,6 +7,7 @@ import uuid
 
 class Patient(Base):
     __tablename__ = "patients"
+    __table_args__ = (Index("idx_patients_keyset", "organization_id", "created_at", "patient_id"),)
 
     patient_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     organization_id = Column(UUID(as_uuid=True), ForeignKey('organizations.organization_id'), nullable=False)
@@ -19,6 +20,30 @@ class Patient(Base):
     address = Column(String)
     status = Column(String, default="active")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # See Organization.version
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     organization = relationship("Organization", back_populates="patients")
+
+    # The ORM addresses rows by (organization_id, patient_id) so that its UPDATEs and
+    # DELETEs carry the partition key when `patients` is partitioned
+    __mapper_args__ = {"primary_key": [organization_id, patient_id], "version_id_col": version}
+
+# Search indexes, mirrored in multi_tenant_schema.sql. The trigram indexes for
+# `:contains` searches need the pg_trgm extension and exist only in the SQL schema.
+Index("idx_patients_org_family", Patient.organization_id, func.lower(Patient.last_name).label("family"),
+      postgresql_ops={"family": "text_pattern_ops"})
+Index("idx_patients_org_given", Patient.organization_id, func.lower(Patient.first_name).label("given"),
+      postgresql_ops={"given": "text_pattern_ops"})
+Index("idx_patients_org_birthdate", Patient.organization_id, Patient.date_of_birth)
+
+class PatientBlockingKey(Base):
+    """Precomputed match keys for the master patient index (see app/mpi.py)."""
+    __tablename__ = "patient_blocking_keys"
+    __table_args__ = (Index("idx_patient_blocking_keys_lookup", "organization_id", "key_type", "key_value"),)
+
+    patient_id = Column(UUID(as_uuid=True), ForeignKey('patients.patient_id', ondelete="CASCADE"), primary_key=True)
+    key_type = Column(String, primary_key=True)
+    key_value = Column(String, primary_key=True)
+    organization_id = Column(UUID(as_uuid=True), ForeignKey('organizations.organization_id'), nullable=False)
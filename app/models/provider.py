@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Index, Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -7,6 +7,7 @@ import uuid
 
 class Provider(Base):
     __tablename__ = "providers"
+    __table_args__ = (Index("idx_providers_keyset", "department_id", "created_at", "provider_id"),)
 
     provider_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     department_id = Column(UUID(as_uuid=True), ForeignKey('departments.department_id'), nullable=False)
@@ -17,6 +18,10 @@ class Provider(Base):
     phone = Column(String)
     status = Column(String, default="active")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # See Organization.version
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     department = relationship("Department", back_populates="providers")
+
+    __mapper_args__ = {"version_id_col": version}
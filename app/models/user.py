@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Index, Integer, String, DateTime, ForeignKey, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -7,6 +7,7 @@ import uuid
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("idx_users_keyset", "organization_id", "created_at", "user_id"),)
 
     user_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     organization_id = Column(UUID(as_uuid=True), ForeignKey('organizations.organization_id'), nullable=False)
@@ -17,17 +18,23 @@ class User(Base):
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     status = Column(String, default="active")
+    # Bumped when the role, status or password changes; tokens carrying an older value are rejected
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     organization = relationship("Organization", back_populates="users")
     role = relationship("Role")
 
+    # See Patient: ORM UPDATEs and DELETEs carry the partition key
+    __mapper_args__ = {"primary_key": [organization_id, user_id]}
+
 class Role(Base):
     __tablename__ = "roles"
+    __table_args__ = (Index("idx_roles_keyset", "created_at", "role_id"),)
 
     role_id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, unique=True, nullable=False)
     description = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
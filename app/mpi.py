@@ -0,0 +1,228 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database import parameter_chunks
+from app.models.patient import Patient, PatientBlockingKey
+
+# Scores at or above this reject a create with 409 unless it is forced
+MPI_MATCH_THRESHOLD = float(os.getenv("MPI_MATCH_THRESHOLD", "0.85"))
+# Scores at or above this are reported as possible duplicates
+MPI_REVIEW_THRESHOLD = float(os.getenv("MPI_REVIEW_THRESHOLD", "0.65"))
+# Blocks larger than this (e.g. a shared front-desk phone number) are too common to discriminate
+MPI_MAX_BLOCK_SIZE = int(os.getenv("MPI_MAX_BLOCK_SIZE", "200"))
+
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(["AEIOUYHW", "BFPV", "CGJKQSXZ", "DT", "L", "MN", "R"]) for c in letters}
+
+def soundex(name: str) -> str:
+    """American Soundex: first letter plus three digits, so spelling variants share a code."""
+    letters = [c for c in (name or "").upper() if "A" <= c <= "Z"]
+    if not letters:
+        return ""
+    code, last = letters[0], _SOUNDEX_CODES[letters[0]]
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES[c]
+        if digit != "0" and digit != last:
+            code += digit
+        # H and W do not separate letters with the same code; vowels do
+        if c not in "HW":
+            last = digit
+        if len(code) == 4:
+            break
+    return code.ljust(4, "0")
+
+def normalize_name(name: Optional[str]) -> str:
+    return re.sub(r"[^a-z]", "", (name or "").lower())
+
+def normalize_phone(phone: Optional[str]) -> str:
+    digits = re.sub(r"\D", "", phone or "")
+    # Compare national numbers so "+1 (555) 123-4567" and "5551234567" agree
+    return digits[-10:] if len(digits) >= 7 else ""
+
+def normalize_email(email: Optional[str]) -> str:
+    return (email or "").strip().lower()
+
+def _get(record, name):
+    return record.get(name) if isinstance(record, dict) else getattr(record, name, None)
+
+def _dob(record) -> str:
+    value = _get(record, "date_of_birth")
+    return value.isoformat() if hasattr(value, "isoformat") else str(value or "")
+
+def blocking_keys(record) -> List[Tuple[str, str]]:
+    """Keys under which a patient is filed; two patients are compared only if they share one."""
+    keys = []
+    dob = _dob(record)
+    last, first = soundex(_get(record, "last_name")), soundex(_get(record, "first_name"))
+    if last and dob:
+        keys.append(("sdx_last_dob", f"{last}|{dob}"))
+    # Catches surname changes (marriage) and first/last swaps
+    if first and dob:
+        keys.append(("sdx_first_dob", f"{first}|{dob}"))
+    phone = normalize_phone(_get(record, "phone"))
+    if phone:
+        keys.append(("phone", phone))
+    email = normalize_email(_get(record, "email"))
+    if email:
+        keys.append(("email", email))
+    return keys
+
+def score(a, b) -> float:
+    """Weighted agreement between two patient records, from 0 (unrelated) to 1."""
+    total = 0.0
+    if _dob(a) and _dob(a) == _dob(b):
+        total += 0.35
+    last_a, last_b = normalize_name(_get(a, "last_name")), normalize_name(_get(b, "last_name"))
+    if last_a and last_a == last_b:
+        total += 0.3
+    elif last_a and soundex(last_a) == soundex(last_b):
+        total += 0.15
+    first_a, first_b = normalize_name(_get(a, "first_name")), normalize_name(_get(b, "first_name"))
+    if first_a and first_a == first_b:
+        total += 0.25
+    elif first_a and first_b and (soundex(first_a) == soundex(first_b) or first_a.startswith(first_b) or first_b.startswith(first_a)):
+        # Spelling variants and short forms ("Jon", "Jonathan")
+        total += 0.12
+    phone_a = normalize_phone(_get(a, "phone"))
+    if phone_a and phone_a == normalize_phone(_get(b, "phone")):
+        total += 0.1
+    email_a = normalize_email(_get(a, "email"))
+    if email_a and email_a == normalize_email(_get(b, "email")):
+        total += 0.1
+    gender_a, gender_b = _get(a, "gender"), _get(b, "gender")
+    if gender_a and gender_b and gender_a != gender_b:
+        total -= 0.2
+    return round(max(0.0, min(total, 1.0)), 3)
+
+def key_rows(patient_id: UUID, organization_id: UUID, record) -> List[dict]:
+    return [
+        {"patient_id": patient_id, "organization_id": organization_id, "key_type": key_type, "key_value": key_value}
+        for key_type, key_value in dict.fromkeys(blocking_keys(record))
+    ]
+
+async def _insert_keys(db: AsyncSession, rows: List[dict]):
+    table = PatientBlockingKey.__table__
+    for chunk in parameter_chunks(rows, len(table.c)):
+        await db.execute(insert(table).values(chunk))
+
+async def index_patients(db: AsyncSession, records: Sequence[dict]):
+    """(Re)write the blocking keys of patients given as column dicts; the caller commits."""
+    if not records:
+        return
+    await db.execute(delete(PatientBlockingKey).where(PatientBlockingKey.patient_id.in_([r["patient_id"] for r in records])))
+    rows = [row for r in records for row in key_rows(r["patient_id"], r["organization_id"], r)]
+    await _insert_keys(db, rows)
+
+async def index_patient(db: AsyncSession, patient: Patient):
+    await db.execute(delete(PatientBlockingKey).where(PatientBlockingKey.patient_id == patient.patient_id))
+    rows = key_rows(patient.patient_id, patient.organization_id, patient)
+    if rows:
+        await db.execute(insert(PatientBlockingKey.__table__).values(rows))
+
+async def find_matches_batch(db: AsyncSession, organization_id: UUID, records: Sequence, threshold: float = MPI_REVIEW_THRESHOLD,
+                             exclude: Iterable[UUID] = ()) -> List[List[Tuple[float, Patient]]]:
+    """Score each record against existing patients that share a blocking key, with one lookup for the whole batch."""
+    record_keys = [blocking_keys(record) for record in records]
+    wanted = {key for keys in record_keys for key in keys}
+    if not wanted:
+        return [[] for _ in records]
+    result = await db.execute(
+        select(PatientBlockingKey.key_type, PatientBlockingKey.key_value, PatientBlockingKey.patient_id)
+        .where(PatientBlockingKey.organization_id == organization_id,
+               tuple_(PatientBlockingKey.key_type, PatientBlockingKey.key_value).in_(list(wanted)))
+    )
+    blocks: Dict[Tuple[str, str], Set[UUID]] = defaultdict(set)
+    for key_type, key_value, patient_id in result:
+        blocks[(key_type, key_value)].add(patient_id)
+    excluded = set(exclude)
+    candidates_per_record = []
+    for keys in record_keys:
+        candidates = set()
+        for key in keys:
+            if len(blocks.get(key, ())) <= MPI_MAX_BLOCK_SIZE:
+                candidates |= blocks.get(key, set())
+        candidates_per_record.append(candidates - excluded)
+    candidate_ids = set().union(*candidates_per_record)
+    patients = {}
+    if candidate_ids:
+        rows = await db.execute(select(Patient).where(Patient.organization_id == organization_id, Patient.patient_id.in_(list(candidate_ids))))
+        patients = {patient.patient_id: patient for patient in rows.scalars()}
+    matches = []
+    for record, candidates in zip(records, candidates_per_record):
+        scored = [(score(record, patients[pid]), patients[pid]) for pid in candidates if pid in patients]
+        matches.append(sorted((m for m in scored if m[0] >= threshold), key=lambda m: -m[0]))
+    return matches
+
+async def find_matches(db: AsyncSession, organization_id: UUID, record, threshold: float = MPI_REVIEW_THRESHOLD,
+                       exclude: Iterable[UUID] = ()) -> List[Tuple[float, Patient]]:
+    return (await find_matches_batch(db, organization_id, [record], threshold, exclude))[0]
+
+def _candidate(score_value: float, patient: Patient) -> dict:
+    return {
+        "patient_id": str(patient.patient_id),
+        "score": score_value,
+        "first_name": patient.first_name,
+        "last_name": patient.last_name,
+        "date_of_birth": patient.date_of_birth.isoformat(),
+    }
+
+async def check_duplicates(db: AsyncSession, record, force: bool = False):
+    """Raise 409 listing likely duplicates of a patient about to be created, unless forced."""
+    if force:
+        return
+    matches = await find_matches(db, _get(record, "organization_id"), record, threshold=MPI_MATCH_THRESHOLD)
+    if matches:
+        raise HTTPException(status_code=409, detail={
+            "message": "Possible duplicate patient; retry with force=true to create it anyway",
+            "candidates": [_candidate(s, p) for s, p in matches[:10]],
+        })
+
+async def rebuild_keys(db: AsyncSession, organization_id: UUID, batch_size: int = 5000) -> int:
+    """Recompute the blocking keys of every patient of an organization; used to backfill the index."""
+    await db.execute(delete(PatientBlockingKey).where(PatientBlockingKey.organization_id == organization_id))
+    result = await db.stream(
+        select(*Patient.__table__.c).where(Patient.organization_id == organization_id)
+        .execution_options(stream_results=True, max_row_buffer=batch_size)
+    )
+    indexed = 0
+    async for partition in result.partitions(batch_size):
+        rows = [row for r in partition for row in key_rows(r.patient_id, r.organization_id, r)]
+        await _insert_keys(db, rows)
+        indexed += len(partition)
+    await db.commit()
+    return indexed
+
+async def find_duplicates(db: AsyncSession, organization_id: UUID, threshold: float = MPI_REVIEW_THRESHOLD, batch_size: int = 5000) -> List[dict]:
+    """Pairs of existing patients sharing a blocking key and scoring at least `threshold`."""
+    keys = PatientBlockingKey.__table__
+    # Only blocks with more than one member and small enough to discriminate
+    blocks = (
+        select(keys.c.key_type, keys.c.key_value).where(keys.c.organization_id == organization_id)
+        .group_by(keys.c.key_type, keys.c.key_value)
+        .having(func.count().between(2, MPI_MAX_BLOCK_SIZE))
+        .subquery()
+    )
+    a, b = keys.alias("a"), keys.alias("b")
+    same_block = (a.c.key_type == blocks.c.key_type) & (a.c.key_value == blocks.c.key_value)
+    pairs = await db.execute(
+        select(a.c.patient_id, b.c.patient_id).distinct()
+        .select_from(blocks.join(a, same_block).join(b, (b.c.key_type == a.c.key_type) & (b.c.key_value == a.c.key_value)))
+        .where(a.c.organization_id == organization_id, b.c.organization_id == organization_id, a.c.patient_id < b.c.patient_id)
+    )
+    pairs = pairs.all()
+    duplicates = []
+    for start in range(0, len(pairs), batch_size):
+        chunk = pairs[start:start + batch_size]
+        ids = list({pid for pair in chunk for pid in pair})
+        rows = await db.execute(select(*Patient.__table__.c).where(Patient.organization_id == organization_id, Patient.patient_id.in_(ids)))
+        patients = {row.patient_id: row for row in rows}
+        for first, second in chunk:
+            value = score(patients[first], patients[second])
+            if value >= threshold:
+                duplicates.append({"patient_id": str(first), "duplicate_of": str(second), "score": value})
+    return sorted(duplicates, key=lambda d: -d["score"])
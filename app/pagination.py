@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional, Sequence
+from uuid import UUID
+from fastapi import HTTPException, Response
+from sqlalchemy import Date, DateTime, bindparam, tuple_
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, PG_UUID):
+        return UUID(value)
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    return value
+
+def encode_cursor(row, columns: Sequence) -> str:
+    """Build an opaque cursor from the ordering columns of the last row of a page."""
+    values = [_encode_value(getattr(row, column.key)) for column in columns]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("cursor does not match ordering")
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+def keyset_after(columns: Sequence, values: Sequence):
+    """Row-value comparison `(c1, c2, ...) > (v1, v2, ...)`, which PostgreSQL answers with one index range scan."""
+    return tuple_(*columns) > tuple_(*[bindparam(None, value, type_=column.type) for column, value in zip(columns, values)])
+
+def paginate(stmt, columns: Sequence, skip: int = 0, limit: int = 100, after: Optional[str] = None):
+    """Apply a stable ordering and either keyset (`after`) or legacy offset pagination."""
+    stmt = stmt.order_by(*columns)
+    if after:
+        stmt = stmt.where(keyset_after(columns, decode_cursor(after, columns)))
+    else:
+        stmt = stmt.offset(skip)
+    return stmt.limit(limit)
+
+def set_next_cursor(response: Response, rows: Sequence, columns: Sequence, limit: int):
+    """Expose the cursor for the following page; a short page means there is none."""
+    if rows and len(rows) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1], columns)
@@ -0,0 +1,125 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from typing import List, Optional
+from sqlalchemy import event
+
+# Opt-in query profiling for development and canary deployments
+QUERY_PROFILING = os.getenv("QUERY_PROFILING", "false").lower() in ("1", "true", "yes")
+# A fingerprint run this many times in one request is reported as an N+1 pattern
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+# Statements slower than this are logged with their EXPLAIN plan
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+QUERY_PROFILE_HEADER = "X-Query-Profile"
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|%s|\?")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE = re.compile(r"\s+")
+
+def fingerprint(statement: str) -> str:
+    """The statement with literals and parameters replaced by `?`, so repeats with other values match."""
+    normalized = _STRING.sub("?", statement)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("(?+)", normalized)
+    return _SPACE.sub(" ", normalized).strip()
+
+class QueryProfile:
+    """Statements run on behalf of one request (or test), grouped by fingerprint."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.seconds = 0.0
+        self.slow = []
+
+    @property
+    def queries(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, statement: str, elapsed: float):
+        self.counts[fingerprint(statement)] += 1
+        self.seconds += elapsed
+
+    def n_plus_one(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[dict]:
+        return [{"fingerprint": sql, "count": count} for sql, count in self.counts.most_common() if count >= threshold]
+
+    def summary(self, threshold: int = N_PLUS_ONE_THRESHOLD, max_length: int = 200) -> dict:
+        return {
+            "queries": self.queries,
+            "db_ms": round(self.seconds * 1000, 2),
+            "slow": len(self.slow),
+            "n_plus_one": [{"fingerprint": item["fingerprint"][:max_length], "count": item["count"]} for item in self.n_plus_one(threshold)[:5]],
+        }
+
+# Set by QueryProfileMiddleware (or the query_budget test plugin) while a profile is collected
+current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+
+def explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    """Plan of a statement from a separate cursor, so the result of the profiled statement is not disturbed."""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    conn.info["explaining"] = True
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception:
+        return None
+    finally:
+        cursor.close()
+        conn.info["explaining"] = False
+
+def on_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+def on_after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+    profile = current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    if elapsed * 1000 >= SLOW_QUERY_MS and not executemany and not conn.info.get("explaining"):
+        plan = explain(conn, statement, parameters) if statement.lstrip()[:6].upper() in ("SELECT", "UPDATE", "DELETE", "INSERT") else None
+        if profile is not None:
+            profile.slow.append(fingerprint(statement))
+        logger.warning("Slow query (%.1f ms): %s\nPlan:\n%s", elapsed * 1000, fingerprint(statement), "\n".join(plan or ["(unavailable)"]))
+
+def profile_queries(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", on_before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", on_after_cursor_execute)
+
+class QueryProfileMiddleware:
+    """ASGI middleware collecting a QueryProfile per request; the summary goes in the X-Query-Profile header
+    and N+1 patterns are logged."""
+
+    def __init__(self, app, threshold: int = N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile()
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                # Statements run while a streaming body is sent are not in the header
+                header = json.dumps(profile.summary(self.threshold), separators=(",", ":"))
+                message["headers"] = list(message.get("headers", [])) + [(QUERY_PROFILE_HEADER.lower().encode(), header.encode())]
+            await send(message)
+
+        token = current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            current_profile.reset(token)
+            for item in profile.n_plus_one(self.threshold):
+                logger.warning("Possible N+1 in %s %s: %d x %s", scope["method"], scope["path"], item["count"], item["fingerprint"])
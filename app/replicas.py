@@ -0,0 +1,136 @@
+import asyncio
+import itertools
+import os
+import time
+from typing import List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+from app.cache import TTLLRUCache
+from app.database import create_instrumented_engine
+
+# Comma-separated async URLs of streaming replicas of the main database
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# "round_robin" or "least_connections"
+REPLICA_STRATEGY = os.getenv("REPLICA_STRATEGY", "round_robin")
+# Replicas further behind the primary than this are skipped
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "2"))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", "5"))
+# A replica whose lag query takes longer than this is treated as down until the next check
+REPLICA_LAG_TIMEOUT_SECONDS = float(os.getenv("REPLICA_LAG_TIMEOUT_SECONDS", "1"))
+# After committing a write, a user's reads go to the primary for this long. Tracked per process:
+# a write handled by one worker does not pin that user's reads served by another
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Zero when the replica has replayed everything it received, so an idle primary does not look like lag
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+recent_writers = TTLLRUCache(100000, READ_YOUR_WRITES_SECONDS)
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session):
+    # Sessions opened on behalf of a user carry it in `info`
+    user = session.info.get("user")
+    if user is not None and not session.info.get("replica"):
+        recent_writers.set(user, True)
+
+def wrote_recently(user: Optional[str]) -> bool:
+    return user is not None and recent_writers.get(user) is not None
+
+async def postgres_lag(replica: "Replica") -> float:
+    async with replica.engine.connect() as conn:
+        return float((await conn.execute(LAG_QUERY)).scalar())
+
+class Replica:
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name
+        self.engine = create_instrumented_engine(url, name)
+        self.session_factory = sessionmaker(self.engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False)
+        self.in_use = 0
+        self.lag = None
+        self.checked_at = float("-inf")
+        event.listen(self.engine.sync_engine.pool, "checkout", self._checkout)
+        event.listen(self.engine.sync_engine.pool, "checkin", self._checkin)
+
+    def _checkout(self, dbapi_connection, record, proxy):
+        self.in_use += 1
+
+    def _checkin(self, dbapi_connection, record):
+        self.in_use -= 1
+
+class ReplicaSet:
+    """Picks a replica for read-only sessions, skipping replicas that lag or do not answer.
+
+    Lag is probed every `check_interval` seconds by a background task, started by the first
+    `choose`; `choose` itself only reads the last measurements, so a slow or unreachable replica
+    never delays a request. It returns None when no replica is usable (including before the
+    first check has finished, or when the last measurement is more than two intervals old), and
+    the caller falls back to the primary.
+    """
+
+    def __init__(self, urls: List[str], name: str = "replica", strategy: str = REPLICA_STRATEGY, max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_LAG_CHECK_SECONDS, lag_timeout: float = REPLICA_LAG_TIMEOUT_SECONDS,
+                 lag_probe=postgres_lag, clock=time.monotonic):
+        if strategy not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica strategy {strategy!r}")
+        self.replicas = [Replica(url, f"{name}-{i}") for i, url in enumerate(urls)]
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag_timeout = lag_timeout
+        self.lag_probe = lag_probe
+        self._clock = clock
+        self._turn = itertools.count()
+        self._monitor = None
+        self.fallbacks = 0
+
+    async def _check(self, replica: Replica):
+        try:
+            replica.lag = await asyncio.wait_for(self.lag_probe(replica), timeout=self.lag_timeout)
+        except Exception:
+            # Unreachable or not a replica; retried at the next interval
+            replica.lag = None
+        finally:
+            replica.checked_at = self._clock()
+
+    async def check(self):
+        """Measure every replica's lag concurrently."""
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _monitor_lag(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    async def choose(self) -> Optional[Replica]:
+        if (self._monitor is None or self._monitor.done()) and self.replicas:
+            # Also restarts a monitor that died (e.g. its event loop was closed under it)
+            self._monitor = asyncio.get_event_loop().create_task(self._monitor_lag())
+        # A reading older than two intervals means the monitor is not keeping up; do not trust it
+        fresh_since = self._clock() - 2 * self.check_interval
+        usable = [r for r in self.replicas if r.lag is not None and r.lag <= self.max_lag and r.checked_at >= fresh_since]
+        if not usable:
+            if self.replicas:
+                self.fallbacks += 1
+            return None
+        if self.strategy == "least_connections":
+            return min(usable, key=lambda r: r.in_use)
+        return usable[next(self._turn) % len(usable)]
+
+    async def dispose(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "strategy": self.strategy,
+            "fallbacks": self.fallbacks,
+            "replicas": [{"name": r.name, "lag_seconds": r.lag, "in_use": r.in_use} for r in self.replicas],
+        }
@@ -1,48 +1,61 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.crud import department as crud_department
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.crud import bulk
+from app.crud.aio import department as crud_department
 from app.schemas.department import Department, DepartmentCreate, DepartmentUpdate
-from app.database import get_db
-from app.auth.utils import get_current_active_user
-from app.auth.role_checker import role_required
-from app.schemas.user import User
+from app.database import get_async_db
+from app.pagination import set_next_cursor
+from app.conditional import conditional, if_match_versions
+from app.crud.versioning import etag
+from app.auth.utils import require_permissions
+from app.auth.permissions import Permission, Principal
 from uuid import UUID
 
 router = APIRouter()
 
+# Bulk routes come first so "/bulk" is not taken for a department id
+@router.post("/bulk")
+async def bulk_create_departments(items: List[dict] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return bulk.bulk_response(await bulk.bulk_create(db, crud_department.BULK, items, atomic=atomic))
+
+@router.patch("/bulk")
+async def bulk_update_departments(items: List[dict] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return bulk.bulk_response(await bulk.bulk_update(db, crud_department.BULK, items, atomic=atomic))
+
+@router.delete("/bulk")
+async def bulk_delete_departments(ids: List[UUID] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_DELETE))):
+    return bulk.bulk_response(await bulk.bulk_delete(db, crud_department.BULK, ids, atomic=atomic))
+
 @router.post("/", response_model=Department)
-@role_required(["System Administrator", "HIM Specialist"])
-async def create_department(department: DepartmentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    return crud_department.create_department(db=db, department=department)
+async def create_department(department: DepartmentCreate, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return await crud_department.create_department(db=db, department=department)
 
 @router.get("/{department_id}", response_model=Department)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def read_department(department_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_department = crud_department.get_department(db, department_id=department_id)
-    if db_department is None:
+async def read_department(department_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.DEPARTMENTS_READ))):
+    cached = await crud_department.get_cached_department(db, department_id=department_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Department not found")
-    return db_department
+    return conditional(request, response, cached)
 
 @router.get("/", response_model=List[Department])
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def read_departments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    departments = crud_department.get_departments(db, skip=skip, limit=limit)
-    return departments
+async def read_departments(request: Request, response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.DEPARTMENTS_READ))):
+    cached = await crud_department.get_cached_departments(db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, cached.value, crud_department.KEYSET, limit)
+    return conditional(request, response, cached, use_last_modified=False)
 
 @router.put("/{department_id}", response_model=Department)
-@role_required(["System Administrator", "HIM Specialist"])
-async def update_department(department_id: UUID, department: DepartmentUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_department = crud_department.update_department(db, department_id=department_id, department=department)
+async def update_department(department_id: UUID, department: DepartmentUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    db_department = await crud_department.update_department(db, department_id=department_id, department=department, versions=if_match_versions(request))
     if db_department is None:
         raise HTTPException(status_code=404, detail="Department not found")
+    response.headers["ETag"] = etag(db_department.version)
     return db_department
 
 @router.delete("/{department_id}", response_model=Department)
-@role_required(["System Administrator"])
-async def delete_department(department_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_department = crud_department.delete_department(db, department_id=department_id)
+async def delete_department(department_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_DELETE))):
+    db_department = await crud_department.delete_department(db, department_id=department_id)
     if db_department is None:
         raise HTTPException(status_code=404, detail="Department not found")
     return db_department
@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+from datetime import datetime
+from app import bulk_export, fhir_search
+from app.crud.aio import patient as crud_patient
+from app.interoperability import patients_to_bundle
+from app.pagination import encode_cursor
+from app.auth.utils import require_permissions, resolve_organization_id
+from app.auth.permissions import Permission, Principal
+from app.sharding import get_read_db, shard_router
+from uuid import UUID
+import os
+
+router = APIRouter()
+
+NDJSON_FORMATS = ("application/fhir+ndjson", "application/ndjson", "ndjson")
+FHIR_JSON_MEDIA_TYPE = "application/fhir+json"
+# Upper bound on `_id` values in one batch read
+MAX_BUNDLE_IDS = 1000
+
+def _get_job(job_id: str, current_user: Principal) -> bulk_export.ExportJob:
+    job = bulk_export.get_export_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    resolve_organization_id(current_user, job.organization_id)
+    return job
+
+@router.get("/Patient")
+async def search_patients(request: Request, organization_id: Optional[UUID] = None, _count: Optional[int] = None, _cursor: Optional[str] = None, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_READ))):
+    """FHIR Patient search: family, given (with :exact/:contains), birthdate (with eq/ne/lt/gt/le/ge prefixes), gender, identifier and _id."""
+    params = list(request.query_params.multi_items())
+    if sum(len(value.split(",")) for key, value in params if key == "_id") > MAX_BUNDLE_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BUNDLE_IDS} ids may be requested at once")
+    filters = fhir_search.patient_search_filters(params)
+    count = fhir_search.search_count(_count)
+    organization_id = resolve_organization_id(current_user, organization_id)
+    patients = await crud_patient.search_patients(db, organization_id, filters, limit=count, after=_cursor)
+    link = [{"relation": "self", "url": str(request.url)}]
+    if len(patients) >= count:
+        cursor = encode_cursor(patients[-1], crud_patient.KEYSET)
+        link.append({"relation": "next", "url": str(request.url.include_query_params(_cursor=cursor))})
+    return JSONResponse(content=patients_to_bundle(patients, link=link), media_type=FHIR_JSON_MEDIA_TYPE)
+
+@router.get("/Patient/$export")
+async def export_patients(request: Request, organization_id: Optional[UUID] = None, _since: Optional[datetime] = None, _outputFormat: str = "application/fhir+ndjson", prefer: Optional[str] = Header(None), db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_BULK))):
+    if _outputFormat not in NDJSON_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported _outputFormat: {_outputFormat}")
+    organization_id = resolve_organization_id(current_user, organization_id)
+    if prefer is None or "respond-async" not in prefer:
+        # Synchronous variant: stream gzip'd NDJSON straight from the cursor to the client
+        resources = bulk_export.iter_patient_resources(db, organization_id, _since)
+        return StreamingResponse(
+            bulk_export.gzip_ndjson(resources),
+            media_type=bulk_export.NDJSON_MEDIA_TYPE,
+            headers={"Content-Encoding": "gzip"},
+        )
+    await run_in_threadpool(bulk_export.expire_export_jobs)
+    job = bulk_export.ExportJob(organization_id, str(request.url), since=_since)
+    bulk_export.start_export_job(job, shard_router.session_factory(db.info["shard"]))
+    return Response(status_code=202, headers={"Content-Location": f"{request.base_url}bulkstatus/{job.job_id}"})
+
+@router.get("/bulkstatus/{job_id}")
+async def export_status(job_id: str, request: Request, current_user: Principal = Depends(require_permissions(Permission.PATIENTS_BULK))):
+    job = _get_job(job_id, current_user)
+    if job.status == "in-progress":
+        return Response(status_code=202, headers={"X-Progress": f"{job.exported} resources exported", "Retry-After": "5"})
+    if job.status != "completed":
+        return JSONResponse(status_code=500, content={
+            "resourceType": "OperationOutcome",
+            "issue": [{"severity": "error", "code": "exception", "diagnostics": job.error or job.status}],
+        })
+    return JSONResponse(content=job.manifest(str(request.base_url)))
+
+@router.delete("/bulkstatus/{job_id}", status_code=202)
+async def delete_export(job_id: str, current_user: Principal = Depends(require_permissions(Permission.PATIENTS_BULK))):
+    bulk_export.delete_export_job(_get_job(job_id, current_user))
+    return Response(status_code=202)
+
+@router.get("/bulkfiles/{job_id}/{file_name}")
+async def download_export_file(job_id: str, file_name: str, current_user: Principal = Depends(require_permissions(Permission.PATIENTS_BULK))):
+    job = _get_job(job_id, current_user)
+    if file_name not in {name for name, _ in job.files}:
+        raise HTTPException(status_code=404, detail="Export file not found")
+    return FileResponse(
+        os.path.join(job.directory, file_name),
+        media_type=bulk_export.NDJSON_MEDIA_TYPE,
+        headers={"Content-Encoding": "gzip"},
+    )
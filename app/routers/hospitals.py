@@ -1,48 +1,61 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.crud import hospital as crud_hospital
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.crud import bulk
+from app.crud.aio import hospital as crud_hospital
 from app.schemas.hospital import Hospital, HospitalCreate, HospitalUpdate
-from app.database import get_db
-from app.auth.utils import get_current_active_user
-from app.auth.role_checker import role_required
-from app.schemas.user import User
+from app.database import get_async_db
+from app.pagination import set_next_cursor
+from app.conditional import conditional, if_match_versions
+from app.crud.versioning import etag
+from app.auth.utils import require_permissions
+from app.auth.permissions import Permission, Principal
 from uuid import UUID
 
 router = APIRouter()
 
+# Bulk routes come first so "/bulk" is not taken for a hospital id
+@router.post("/bulk")
+async def bulk_create_hospitals(items: List[dict] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return bulk.bulk_response(await bulk.bulk_create(db, crud_hospital.BULK, items, atomic=atomic))
+
+@router.patch("/bulk")
+async def bulk_update_hospitals(items: List[dict] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return bulk.bulk_response(await bulk.bulk_update(db, crud_hospital.BULK, items, atomic=atomic))
+
+@router.delete("/bulk")
+async def bulk_delete_hospitals(ids: List[UUID] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_DELETE))):
+    return bulk.bulk_response(await bulk.bulk_delete(db, crud_hospital.BULK, ids, atomic=atomic))
+
 @router.post("/", response_model=Hospital)
-@role_required(["System Administrator", "HIM Specialist"])
-async def create_hospital(hospital: HospitalCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    return crud_hospital.create_hospital(db=db, hospital=hospital)
+async def create_hospital(hospital: HospitalCreate, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return await crud_hospital.create_hospital(db=db, hospital=hospital)
 
 @router.get("/{hospital_id}", response_model=Hospital)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse"])
-async def read_hospital(hospital_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_hospital = crud_hospital.get_hospital(db, hospital_id=hospital_id)
-    if db_hospital is None:
+async def read_hospital(hospital_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.HOSPITALS_READ))):
+    cached = await crud_hospital.get_cached_hospital(db, hospital_id=hospital_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Hospital not found")
-    return db_hospital
+    return conditional(request, response, cached)
 
 @router.get("/", response_model=List[Hospital])
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse"])
-async def read_hospitals(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    hospitals = crud_hospital.get_hospitals(db, skip=skip, limit=limit)
-    return hospitals
+async def read_hospitals(request: Request, response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.HOSPITALS_READ))):
+    cached = await crud_hospital.get_cached_hospitals(db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, cached.value, crud_hospital.KEYSET, limit)
+    return conditional(request, response, cached, use_last_modified=False)
 
 @router.put("/{hospital_id}", response_model=Hospital)
-@role_required(["System Administrator", "HIM Specialist"])
-async def update_hospital(hospital_id: UUID, hospital: HospitalUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_hospital = crud_hospital.update_hospital(db, hospital_id=hospital_id, hospital=hospital)
+async def update_hospital(hospital_id: UUID, hospital: HospitalUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    db_hospital = await crud_hospital.update_hospital(db, hospital_id=hospital_id, hospital=hospital, versions=if_match_versions(request))
     if db_hospital is None:
         raise HTTPException(status_code=404, detail="Hospital not found")
+    response.headers["ETag"] = etag(db_hospital.version)
     return db_hospital
 
 @router.delete("/{hospital_id}", response_model=Hospital)
-@role_required(["System Administrator"])
-async def delete_hospital(hospital_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_hospital = crud_hospital.delete_hospital(db, hospital_id=hospital_id)
+async def delete_hospital(hospital_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_DELETE))):
+    db_hospital = await crud_hospital.delete_hospital(db, hospital_id=hospital_id)
     if db_hospital is None:
         raise HTTPException(status_code=404, detail="Hospital not found")
     return db_hospital
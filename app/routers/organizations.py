@@ -1,48 +1,58 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.crud import organization as crud_organization
-from app.schemas.organization import Organization, OrganizationCreate, OrganizationUpdate
-from app.database import get_db
-from app.auth.utils import get_current_active_user
-from app.auth.role_checker import role_required
-from app.schemas.user import User
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.crud.aio import organization as crud_organization
+from app.schemas.organization import Organization, OrganizationCreate, OrganizationTree, OrganizationUpdate
+from app.database import get_async_db
+from app.pagination import set_next_cursor
+from app.conditional import conditional, if_match_versions
+from app.crud.versioning import etag
+from app.auth.utils import require_permissions
+from app.auth.permissions import Permission, Principal
+from app.sharding import shard_router
 from uuid import UUID
 
 router = APIRouter()
 
 @router.post("/", response_model=Organization)
-@role_required(["System Administrator"])
-async def create_organization(organization: OrganizationCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    return crud_organization.create_organization(db=db, organization=organization)
+async def create_organization(organization: OrganizationCreate, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ORGANIZATIONS_MANAGE))):
+    db_organization = await crud_organization.create_organization(db=db, organization=organization)
+    await shard_router.provision(db_organization.organization_id)
+    return db_organization
 
 @router.get("/{organization_id}", response_model=Organization)
-@role_required(["System Administrator", "HIM Specialist", "Compliance Officer"])
-async def read_organization(organization_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_organization = crud_organization.get_organization(db, organization_id=organization_id)
+async def read_organization(organization_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ORGANIZATIONS_READ))):
+    cached = await crud_organization.get_cached_organization(db, organization_id=organization_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    return conditional(request, response, cached)
+
+@router.get("/{organization_id}/tree", response_model=OrganizationTree)
+async def read_organization_tree(organization_id: UUID, depth: int = Query(3, ge=0, le=3), status: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ORGANIZATIONS_READ, Permission.HOSPITALS_READ, Permission.DEPARTMENTS_READ, Permission.PROVIDERS_READ))):
+    # The ORM tree is returned as is so response_model converts it once
+    db_organization = await crud_organization.get_organization_tree(db, organization_id=organization_id, depth=depth, status=status)
     if db_organization is None:
         raise HTTPException(status_code=404, detail="Organization not found")
     return db_organization
 
 @router.get("/", response_model=List[Organization])
-@role_required(["System Administrator", "HIM Specialist", "Compliance Officer"])
-async def read_organizations(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    organizations = crud_organization.get_organizations(db, skip=skip, limit=limit)
-    return organizations
+async def read_organizations(request: Request, response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ORGANIZATIONS_READ))):
+    cached = await crud_organization.get_cached_organizations(db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, cached.value, crud_organization.KEYSET, limit)
+    return conditional(request, response, cached, use_last_modified=False)
 
 @router.put("/{organization_id}", response_model=Organization)
-@role_required(["System Administrator"])
-async def update_organization(organization_id: UUID, organization: OrganizationUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_organization = crud_organization.update_organization(db, organization_id=organization_id, organization=organization)
+async def update_organization(organization_id: UUID, organization: OrganizationUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ORGANIZATIONS_MANAGE))):
+    db_organization = await crud_organization.update_organization(db, organization_id=organization_id, organization=organization, versions=if_match_versions(request))
     if db_organization is None:
         raise HTTPException(status_code=404, detail="Organization not found")
+    response.headers["ETag"] = etag(db_organization.version)
     return db_organization
 
 @router.delete("/{organization_id}", response_model=Organization)
-@role_required(["System Administrator"])
-async def delete_organization(organization_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_organization = crud_organization.delete_organization(db, organization_id=organization_id)
+async def delete_organization(organization_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ORGANIZATIONS_MANAGE))):
+    db_organization = await crud_organization.delete_organization(db, organization_id=organization_id)
     if db_organization is None:
         raise HTTPException(status_code=404, detail="Organization not found")
     return db_organization
@@ -1,87 +1,139 @@
 
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from typing import List
-from app.crud import patient as crud_patient
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.crud.aio import patient as crud_patient
 from app.schemas.patient import Patient, PatientCreate, PatientUpdate
-from app.database import get_db
-from app.auth.utils import get_current_active_user
-from app.auth.role_checker import role_required
-from app.schemas.user import User
+from app.pagination import set_next_cursor
+from app.conditional import if_match_versions
+from app.fast_json import FAST_JSON_RESPONSES, fast_json_response
+from app.fieldsets import FIELDS_DESCRIPTION, parse_fields, sparse_response
+from app.crud.versioning import etag
+from app.auth.utils import require_permissions, resolve_organization_id
+from app.auth.permissions import Permission, Principal
+from app import bulk_import, mpi
 from app.interoperability import patient_to_fhir, fhir_to_patient, patient_to_hl7, hl7_to_patient, send_hl7_message
+from app.mllp import MLLPError, get_pool, new_control_id, parse_ack
+from app.sharding import get_read_db, get_tenant_db, shard_router
 from uuid import UUID
 
 router = APIRouter()
 
 @router.post("/", response_model=Patient)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def create_patient(patient: PatientCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    return crud_patient.create_patient(db=db, patient=patient)
+async def create_patient(patient: PatientCreate, force: bool = False, current_user: Principal = Depends(require_permissions(Permission.PATIENTS_WRITE))):
+    # Routed by the organization in the body rather than the caller's
+    async with await shard_router.tenant_session(resolve_organization_id(current_user, patient.organization_id), user=current_user.username) as db:
+        await mpi.check_duplicates(db, patient, force=force)
+        return await crud_patient.create_patient(db=db, patient=patient)
 
 @router.get("/{patient_id}", response_model=Patient)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def read_patient(patient_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_patient = crud_patient.get_patient(db, patient_id=patient_id)
+async def read_patient(patient_id: UUID, response: Response, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION), organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_READ))):
+    selected = parse_fields(fields, Patient)
+    db_patient = await crud_patient.get_patient(db, patient_id, resolve_organization_id(current_user, organization_id), fields=selected)
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return db_patient
+    # Sent back in If-Match by PUT so concurrent edits are rejected instead of overwritten
+    response.headers["ETag"] = etag(db_patient.version)
+    return sparse_response(db_patient, Patient, selected, response) if selected else db_patient
 
 @router.get("/", response_model=List[Patient])
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def read_patients(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    patients = crud_patient.get_patients(db, skip=skip, limit=limit)
-    return patients
+async def read_patients(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION), organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_READ))):
+    selected = parse_fields(fields, Patient)
+    if FAST_JSON_RESPONSES:
+        rows = await crud_patient.get_patient_rows(db, resolve_organization_id(current_user, organization_id), skip=skip, limit=limit, after=after, fields=selected)
+        set_next_cursor(response, rows, crud_patient.KEYSET, limit)
+        return fast_json_response(rows, Patient, response, selected)
+    patients = await crud_patient.get_patients(db, resolve_organization_id(current_user, organization_id), skip=skip, limit=limit, after=after, fields=selected)
+    set_next_cursor(response, patients, crud_patient.KEYSET, limit)
+    return sparse_response(patients, Patient, selected, response) if selected else patients
 
 @router.put("/{patient_id}", response_model=Patient)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def update_patient(patient_id: UUID, patient: PatientUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_patient = crud_patient.update_patient(db, patient_id=patient_id, patient=patient)
+async def update_patient(patient_id: UUID, patient: PatientUpdate, request: Request, response: Response, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_tenant_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_WRITE))):
+    db_patient = await crud_patient.update_patient(db, patient_id, resolve_organization_id(current_user, organization_id), patient, if_match_versions(request))
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
+    response.headers["ETag"] = etag(db_patient.version)
     return db_patient
 
 @router.delete("/{patient_id}", response_model=Patient)
-@role_required(["System Administrator", "HIM Specialist"])
-async def delete_patient(patient_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_patient = crud_patient.delete_patient(db, patient_id=patient_id)
+async def delete_patient(patient_id: UUID, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_tenant_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_DELETE))):
+    db_patient = await crud_patient.delete_patient(db, patient_id, resolve_organization_id(current_user, organization_id))
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     return db_patient
 
 @router.get("/{patient_id}/fhir", response_model=dict)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def get_patient_fhir(patient_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_patient = crud_patient.get_patient(db, patient_id=patient_id)
+async def get_patient_fhir(patient_id: UUID, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_READ))):
+    db_patient = await crud_patient.get_patient(db, patient_id, resolve_organization_id(current_user, organization_id))
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return patient_to_fhir(db_patient)
+    # Already plain JSON types; skip the response_model re-validation and jsonable_encoder pass
+    return JSONResponse(content=patient_to_fhir(db_patient))
 
 @router.post("/fhir", response_model=Patient)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def create_patient_fhir(fhir_data: dict = Body(...), db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def create_patient_fhir(fhir_data: dict = Body(...), force: bool = False, current_user: Principal = Depends(require_permissions(Permission.PATIENTS_WRITE))):
     patient_create = fhir_to_patient(fhir_data)
-    return crud_patient.create_patient(db=db, patient=patient_create)
+    async with await shard_router.tenant_session(resolve_organization_id(current_user, patient_create.organization_id), user=current_user.username) as db:
+        await mpi.check_duplicates(db, patient_create, force=force)
+        return await crud_patient.create_patient(db=db, patient=patient_create)
 
 @router.get("/{patient_id}/hl7", response_model=str)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def get_patient_hl7(patient_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_patient = crud_patient.get_patient(db, patient_id=patient_id)
+async def get_patient_hl7(patient_id: UUID, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_READ))):
+    db_patient = await crud_patient.get_patient(db, patient_id, resolve_organization_id(current_user, organization_id))
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
     return patient_to_hl7(db_patient)
 
 @router.post("/hl7", response_model=Patient)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def create_patient_hl7(hl7_message: str = Body(...), db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def create_patient_hl7(hl7_message: str = Body(...), force: bool = False, current_user: Principal = Depends(require_permissions(Permission.PATIENTS_WRITE))):
     patient_create = hl7_to_patient(hl7_message)
-    return crud_patient.create_patient(db=db, patient=patient_create)
+    async with await shard_router.tenant_session(resolve_organization_id(current_user, patient_create.organization_id), user=current_user.username) as db:
+        await mpi.check_duplicates(db, patient_create, force=force)
+        return await crud_patient.create_patient(db=db, patient=patient_create)
+
+@router.post("/import")
+async def bulk_import_patients(request: Request, batch_size: int = Query(bulk_import.IMPORT_BATCH_SIZE, ge=1, le=5000), organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_tenant_db), current_user: Principal = Depends(require_permissions(Permission.PATIENTS_BULK))):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in bulk_import.NDJSON_CONTENT_TYPES:
+        records = bulk_import.iter_ndjson(request.stream())
+    else:
+        records = bulk_import.iter_bundle_stream(request.stream())
+    return await bulk_import.import_patients(db, records, batch_size=batch_size, organization_id=db.info["organization_id"])
 
 @router.post("/send_hl7")
-@role_required(["System Administrator", "HIM Specialist"])
-async def send_hl7(patient_id: UUID, host: str, port: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_patient = crud_patient.get_patient(db, patient_id=patient_id)
+async def send_hl7(patient_id: UUID, host: str, port: int, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.HL7_SEND))):
+    db_patient = await crud_patient.get_patient(db, patient_id, resolve_organization_id(current_user, organization_id))
     if db_patient is None:
         raise HTTPException(status_code=404, detail="Patient not found")
-    hl7_message = patient_to_hl7(db_patient)
+    hl7_message = patient_to_hl7(db_patient, control_id=new_control_id())
     response = await send_hl7_message(host, port, hl7_message)
     return {"message": "HL7 message sent successfully", "response": response}
+
+@router.post("/send_hl7/batch")
+async def send_hl7_batch(host: str, port: int, patient_ids: List[UUID] = Body(...), organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_read_db), current_user: Principal = Depends(require_permissions(Permission.HL7_SEND))):
+    db_patients = {p.patient_id: p for p in await crud_patient.get_patients_by_ids(db, patient_ids, resolve_organization_id(current_user, organization_id))}
+    results, messages = [], []
+    for patient_id in patient_ids:
+        db_patient = db_patients.get(patient_id)
+        if db_patient is None:
+            results.append({"patient_id": patient_id, "error": "Patient not found"})
+            continue
+        message_id = new_control_id()
+        messages.append(patient_to_hl7(db_patient, control_id=message_id))
+        results.append({"patient_id": patient_id, "control_id": message_id})
+    # Pipelined over the destination's persistent connections; ACKs are matched by control ID
+    acks = iter(await get_pool(host, port).send_many(messages))
+    for result in results:
+        if "control_id" not in result:
+            continue
+        ack = next(acks)
+        if isinstance(ack, Exception):
+            result["error"] = str(ack)
+            continue
+        try:
+            result["ack_code"] = parse_ack(ack)[0]
+        except MLLPError as e:
+            result["error"] = str(e)
+    sent = sum(1 for r in results if r.get("ack_code") == "AA")
+    return {"sent": sent, "failed": len(results) - sent, "results": results}
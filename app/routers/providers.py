@@ -1,48 +1,61 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.crud import provider as crud_provider
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.crud import bulk
+from app.crud.aio import provider as crud_provider
 from app.schemas.provider import Provider, ProviderCreate, ProviderUpdate
-from app.database import get_db
-from app.auth.utils import get_current_active_user
-from app.auth.role_checker import role_required
-from app.schemas.user import User
+from app.database import get_async_db
+from app.pagination import set_next_cursor
+from app.conditional import conditional, if_match_versions
+from app.crud.versioning import etag
+from app.auth.utils import require_permissions
+from app.auth.permissions import Permission, Principal
 from uuid import UUID
 
 router = APIRouter()
 
+# Bulk routes come first so "/bulk" is not taken for a provider id
+@router.post("/bulk")
+async def bulk_create_providers(items: List[dict] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return bulk.bulk_response(await bulk.bulk_create(db, crud_provider.BULK, items, atomic=atomic))
+
+@router.patch("/bulk")
+async def bulk_update_providers(items: List[dict] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return bulk.bulk_response(await bulk.bulk_update(db, crud_provider.BULK, items, atomic=atomic))
+
+@router.delete("/bulk")
+async def bulk_delete_providers(ids: List[UUID] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_DELETE))):
+    return bulk.bulk_response(await bulk.bulk_delete(db, crud_provider.BULK, ids, atomic=atomic))
+
 @router.post("/", response_model=Provider)
-@role_required(["System Administrator", "HIM Specialist"])
-async def create_provider(provider: ProviderCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    return crud_provider.create_provider(db=db, provider=provider)
+async def create_provider(provider: ProviderCreate, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    return await crud_provider.create_provider(db=db, provider=provider)
 
 @router.get("/{provider_id}", response_model=Provider)
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def read_provider(provider_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_provider = crud_provider.get_provider(db, provider_id=provider_id)
-    if db_provider is None:
+async def read_provider(provider_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.PROVIDERS_READ))):
+    cached = await crud_provider.get_cached_provider(db, provider_id=provider_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Provider not found")
-    return db_provider
+    return conditional(request, response, cached)
 
 @router.get("/", response_model=List[Provider])
-@role_required(["System Administrator", "HIM Specialist", "Physician", "Nurse", "Medical Assistant"])
-async def read_providers(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    providers = crud_provider.get_providers(db, skip=skip, limit=limit)
-    return providers
+async def read_providers(request: Request, response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.PROVIDERS_READ))):
+    cached = await crud_provider.get_cached_providers(db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, cached.value, crud_provider.KEYSET, limit)
+    return conditional(request, response, cached, use_last_modified=False)
 
 @router.put("/{provider_id}", response_model=Provider)
-@role_required(["System Administrator", "HIM Specialist"])
-async def update_provider(provider_id: UUID, provider: ProviderUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_provider = crud_provider.update_provider(db, provider_id=provider_id, provider=provider)
+async def update_provider(provider_id: UUID, provider: ProviderUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_WRITE))):
+    db_provider = await crud_provider.update_provider(db, provider_id=provider_id, provider=provider, versions=if_match_versions(request))
     if db_provider is None:
         raise HTTPException(status_code=404, detail="Provider not found")
+    response.headers["ETag"] = etag(db_provider.version)
     return db_provider
 
 @router.delete("/{provider_id}", response_model=Provider)
-@role_required(["System Administrator"])
-async def delete_provider(provider_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_provider = crud_provider.delete_provider(db, provider_id=provider_id)
+async def delete_provider(provider_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.FACILITIES_DELETE))):
+    db_provider = await crud_provider.delete_provider(db, provider_id=provider_id)
     if db_provider is None:
         raise HTTPException(status_code=404, detail="Provider not found")
     return db_provider
@@ -1,110 +1,147 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, status, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import timedelta
-from app.crud import user as crud_user
+from app.crud.aio import user as crud_user
 from app.schemas.user import User, UserCreate, UserUpdate, Role, RoleCreate, RoleUpdate, Token
-from app.database import get_db
-from app.auth.utils import authenticate_user, create_access_token, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.auth.role_checker import role_required
+from app.database import get_async_db
+from app.pagination import set_next_cursor
+from app.fast_json import FAST_JSON_RESPONSES, fast_json_response
+from app.auth.utils import authenticate_user, create_access_token, get_current_active_user, require_permissions, resolve_organization_id, token_claims, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.auth.permissions import Permission, Principal
+from app.auth.principal_cache import principal_cache
+from app.auth.hashing import password_pool
+from app.crud import bulk, hierarchy_cache
 from uuid import UUID
 
 router = APIRouter()
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if user.status != "active":
+        raise HTTPException(status_code=400, detail="Inactive user")
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    # Requests are authorized from these claims alone; "org" also carries the tenant (partition) key
+    access_token = create_access_token(data=token_claims(user), expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/users/", response_model=User)
-@role_required(["System Administrator"])
-async def create_user(user: UserCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_user = crud_user.get_user_by_username(db, username=user.username)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_MANAGE))):
+    resolve_organization_id(current_user, user.organization_id)
+    # Usernames are unique across tenants, so this check cannot be scoped to one
+    db_user = await crud_user.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return crud_user.create_user(db=db, user=user)
+    return await crud_user.create_user(db=db, user=user)
+
+def _check_organization(current_user: Principal):
+    def check(values: dict):
+        if "organization_id" in values:
+            resolve_organization_id(current_user, values["organization_id"])
+    return check
+
+@router.post("/users/bulk")
+async def bulk_create_users(items: List[dict] = Body(...), atomic: bool = True, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_MANAGE))):
+    # Duplicate usernames and emails are reported per item by the unique constraints
+    return bulk.bulk_response(await bulk.bulk_create(db, crud_user.USER_BULK, items, atomic=atomic, check=_check_organization(current_user)))
+
+@router.patch("/users/bulk")
+async def bulk_update_users(items: List[dict] = Body(...), atomic: bool = True, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_MANAGE))):
+    scope = resolve_organization_id(current_user, organization_id)
+    return bulk.bulk_response(await bulk.bulk_update(db, crud_user.USER_BULK, items, atomic=atomic, scope=scope, check=_check_organization(current_user)))
+
+@router.delete("/users/bulk")
+async def bulk_delete_users(ids: List[UUID] = Body(...), atomic: bool = True, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_MANAGE))):
+    scope = resolve_organization_id(current_user, organization_id)
+    return bulk.bulk_response(await bulk.bulk_delete(db, crud_user.USER_BULK, ids, atomic=atomic, scope=scope))
 
 @router.get("/users/", response_model=List[User])
-@role_required(["System Administrator", "HIM Specialist"])
-async def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    users = crud_user.get_users(db, skip=skip, limit=limit)
+async def read_users(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_READ))):
+    if FAST_JSON_RESPONSES:
+        rows = await crud_user.get_user_rows(db, resolve_organization_id(current_user, organization_id), skip=skip, limit=limit, after=after)
+        set_next_cursor(response, rows, crud_user.USER_KEYSET, limit)
+        return fast_json_response(rows, User, response)
+    users = await crud_user.get_users(db, resolve_organization_id(current_user, organization_id), skip=skip, limit=limit, after=after)
+    set_next_cursor(response, users, crud_user.USER_KEYSET, limit)
     return users
 
 @router.get("/users/me", response_model=User)
 async def read_users_me(current_user: User = Depends(get_current_active_user)):
     return current_user
 
+@router.get("/principal-cache")
+async def read_principal_cache_stats(current_user: Principal = Depends(require_permissions(Permission.SYSTEM_STATS))):
+    return principal_cache.stats()
+
+@router.get("/hierarchy-cache")
+async def read_hierarchy_cache_stats(current_user: Principal = Depends(require_permissions(Permission.SYSTEM_STATS))):
+    return hierarchy_cache.stats()
+
+@router.get("/password-hashing")
+async def read_password_hashing_stats(current_user: Principal = Depends(require_permissions(Permission.SYSTEM_STATS))):
+    return password_pool.stats()
+
 @router.get("/users/{user_id}", response_model=User)
-@role_required(["System Administrator", "HIM Specialist"])
-async def read_user(user_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_user = crud_user.get_user(db, user_id=user_id)
+async def read_user(user_id: UUID, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_READ))):
+    db_user = await crud_user.get_user(db, user_id, resolve_organization_id(current_user, organization_id))
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @router.put("/users/{user_id}", response_model=User)
-@role_required(["System Administrator"])
-async def update_user(user_id: UUID, user: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_user = crud_user.update_user(db, user_id=user_id, user=user)
+async def update_user(user_id: UUID, user: UserUpdate, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_MANAGE))):
+    db_user = await crud_user.update_user(db, user_id, resolve_organization_id(current_user, organization_id), user)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 @router.delete("/users/{user_id}", response_model=User)
-@role_required(["System Administrator"])
-async def delete_user(user_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_user = crud_user.delete_user(db, user_id=user_id)
+async def delete_user(user_id: UUID, organization_id: Optional[UUID] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.USERS_MANAGE))):
+    db_user = await crud_user.delete_user(db, user_id, resolve_organization_id(current_user, organization_id))
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return db_user
 
 # Role routes
 @router.post("/roles/", response_model=Role)
-@role_required(["System Administrator"])
-async def create_role(role: RoleCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_role = crud_user.get_role_by_name(db, name=role.name)
+async def create_role(role: RoleCreate, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ROLES_MANAGE))):
+    db_role = await crud_user.get_role_by_name(db, name=role.name)
     if db_role:
         raise HTTPException(status_code=400, detail="Role already exists")
-    return crud_user.create_role(db=db, role=role)
+    return await crud_user.create_role(db=db, role=role)
 
 @router.get("/roles/", response_model=List[Role])
-@role_required(["System Administrator", "HIM Specialist"])
-async def read_roles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    roles = crud_user.get_roles(db, skip=skip, limit=limit)
+async def read_roles(response: Response, skip: int = 0, limit: int = 100, after: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ROLES_READ))):
+    roles = await crud_user.get_roles(db, skip=skip, limit=limit, after=after)
+    set_next_cursor(response, roles, crud_user.ROLE_KEYSET, limit)
     return roles
 
 @router.get("/roles/{role_id}", response_model=Role)
-@role_required(["System Administrator", "HIM Specialist"])
-async def read_role(role_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_role = crud_user.get_role(db, role_id=role_id)
+async def read_role(role_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ROLES_READ))):
+    db_role = await crud_user.get_role(db, role_id=role_id)
     if db_role is None:
         raise HTTPException(status_code=404, detail="Role not found")
     return db_role
 
 @router.put("/roles/{role_id}", response_model=Role)
-@role_required(["System Administrator"])
-async def update_role(role_id: UUID, role: RoleUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_role = crud_user.update_role(db, role_id=role_id, role=role)
+async def update_role(role_id: UUID, role: RoleUpdate, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ROLES_MANAGE))):
+    db_role = await crud_user.update_role(db, role_id=role_id, role=role)
     if db_role is None:
         raise HTTPException(status_code=404, detail="Role not found")
     return db_role
 
 @router.delete("/roles/{role_id}", response_model=Role)
-@role_required(["System Administrator"])
-async def delete_role(role_id: UUID, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_role = crud_user.delete_role(db, role_id=role_id)
+async def delete_role(role_id: UUID, db: AsyncSession = Depends(get_async_db), current_user: Principal = Depends(require_permissions(Permission.ROLES_MANAGE))):
+    db_role = await crud_user.delete_role(db, role_id=role_id)
     if db_role is None:
         raise HTTPException(status_code=404, detail="Role not found")
     return db_role
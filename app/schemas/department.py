@@ -1,7 +1,8 @@
 
 from pydantic import BaseModel, UUID4
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from app.schemas.provider import Provider
 
 class DepartmentBase(BaseModel):
     name: str
@@ -26,3 +27,6 @@ class DepartmentInDB(DepartmentBase):
 
 class Department(DepartmentInDB):
     pass
+
+class DepartmentTree(Department):
+    providers: List[Provider] = []
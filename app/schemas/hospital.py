@@ -1,7 +1,8 @@
 
 from pydantic import BaseModel, UUID4
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from app.schemas.department import DepartmentTree
 
 class HospitalBase(BaseModel):
     name: str
@@ -27,3 +28,6 @@ class HospitalInDB(HospitalBase):
 
 class Hospital(HospitalInDB):
     pass
+
+class HospitalTree(Hospital):
+    departments: List[DepartmentTree] = []
@@ -1,7 +1,8 @@
 
 from pydantic import BaseModel, UUID4
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+from app.schemas.hospital import HospitalTree
 
 class OrganizationBase(BaseModel):
     name: str
@@ -26,3 +27,6 @@ class OrganizationInDB(OrganizationBase):
 
 class Organization(OrganizationInDB):
     pass
+
+class OrganizationTree(Organization):
+    hospitals: List[HospitalTree] = []
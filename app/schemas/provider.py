@@ -12,16 +12,17 @@ class ProviderBase(BaseModel):
     status: Optional[str] = "active"
 
 class ProviderCreate(ProviderBase):
-    hospital_id: UUID4
+    department_id: UUID4
 
 class ProviderUpdate(ProviderBase):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
-    hospital_id: Optional[UUID4] = None
+    email: Optional[EmailStr] = None
+    department_id: Optional[UUID4] = None
 
 class ProviderInDB(ProviderBase):
     provider_id: UUID4
-    hospital_id: UUID4
+    department_id: UUID4
     created_at: datetime
     updated_at: datetime
 
@@ -44,6 +44,10 @@ class UserCreate(UserBase):
     role_id: UUID4
 
 class UserUpdate(UserBase):
+    username: Optional[str] = None
+    email: Optional[EmailStr] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
     password: Optional[str] = None
     organization_id: Optional[UUID4] = None
     role_id: Optional[UUID4] = None
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+from fastapi import Depends, HTTPException
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.auth.permissions import Principal
+from app.auth.utils import get_principal, resolve_organization_id
+from app.cache import TTLLRUCache
+from app.database import ASYNC_SQLALCHEMY_DATABASE_URL, AsyncSessionLocal, create_instrumented_engine, parameter_chunks
+from app.models.organization import Organization, TenantShard
+from app.models.patient import Patient, PatientBlockingKey
+from app.replicas import DATABASE_REPLICA_URLS, ReplicaSet, wrote_recently
+
+# JSON object {"shard name": "async database URL"}, inline or as a path to a JSON file. A value may
+# also be {"primary": URL, "replicas": [URL, ...]}. Unset means a single shard: the directory
+# database itself, with DATABASE_REPLICA_URLS as its replicas.
+SHARD_MAP = os.getenv("SHARD_MAP")
+# Shard of tenants that have no tenant_shards row (everything created before sharding)
+DEFAULT_SHARD = os.getenv("DEFAULT_SHARD", "default")
+TENANT_SHARD_CACHE_SIZE = int(os.getenv("TENANT_SHARD_CACHE_SIZE", "10000"))
+# Also how long a tenant move waits for every process to notice the tenant is moving
+TENANT_SHARD_CACHE_TTL_SECONDS = float(os.getenv("TENANT_SHARD_CACHE_TTL_SECONDS", "10"))
+
+# Per-tenant tables stored on the shards, parents first. Users, roles and the
+# organization hierarchy stay in the directory database.
+TENANT_TABLES = (Patient.__table__, PatientBlockingKey.__table__)
+
+def load_shard_map(value: Optional[str] = SHARD_MAP, default_shard: str = DEFAULT_SHARD) -> dict:
+    if not value:
+        return {default_shard: {"primary": ASYNC_SQLALCHEMY_DATABASE_URL, "replicas": DATABASE_REPLICA_URLS}}
+    if value.lstrip().startswith("{"):
+        return json.loads(value)
+    with open(value) as f:
+        return json.load(f)
+
+class ShardRouter:
+    """Maps organizations to database shards and hands out sessions bound to them.
+
+    Assignments are read from `tenant_shards` in the directory database and cached for
+    `cache_ttl` seconds; engines are created the first time a shard is used. Read-only
+    sessions go to one of the shard's replicas when it has usable ones.
+    """
+
+    def __init__(self, shard_map: dict, directory=AsyncSessionLocal, default_shard: str = DEFAULT_SHARD,
+                 cache_ttl: float = TENANT_SHARD_CACHE_TTL_SECONDS, directory_url: str = ASYNC_SQLALCHEMY_DATABASE_URL):
+        if default_shard not in shard_map:
+            raise ValueError(f"DEFAULT_SHARD {default_shard!r} is not in the shard map")
+        specs = {name: spec if isinstance(spec, dict) else {"primary": spec} for name, spec in shard_map.items()}
+        self.urls = {name: spec["primary"] for name, spec in specs.items()}
+        self.replica_urls = {name: list(spec.get("replicas") or []) for name, spec in specs.items()}
+        self._replica_sets = {}
+        self.directory = directory
+        self.default_shard = default_shard
+        self.cache_ttl = cache_ttl
+        self._directory_url = directory_url
+        self._factories = {}
+        self._engines = []
+        self._assignments = TTLLRUCache(TENANT_SHARD_CACHE_SIZE, cache_ttl)
+
+    def session_factory(self, shard: str):
+        factory = self._factories.get(shard)
+        if factory is None:
+            if shard not in self.urls:
+                raise KeyError(f"Unknown shard {shard!r}")
+            if self.urls[shard] == self._directory_url:
+                # Share the directory's pool instead of opening a second one to the same database
+                factory = self.directory
+            else:
+                engine = create_instrumented_engine(self.urls[shard], f"shard-{shard}")
+                self._engines.append(engine)
+                factory = sessionmaker(engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False)
+            self._factories[shard] = factory
+        return factory
+
+    def replica_set(self, shard: str) -> ReplicaSet:
+        replicas = self._replica_sets.get(shard)
+        if replicas is None:
+            replicas = self._replica_sets[shard] = ReplicaSet(self.replica_urls[shard], name=f"{shard}-replica")
+        return replicas
+
+    async def assignment(self, organization_id: UUID) -> Tuple[str, str]:
+        """(shard, status) of an organization, read from the directory without the cache."""
+        async with self.directory() as db:
+            row = (await db.execute(
+                select(TenantShard.shard, TenantShard.status).where(TenantShard.organization_id == organization_id)
+            )).first()
+        return (row.shard, row.status) if row else (self.default_shard, "active")
+
+    async def set_assignment(self, organization_id: UUID, shard: str, status: str = "active"):
+        async with self.directory() as db:
+            row = await db.get(TenantShard, organization_id)
+            if row is None:
+                db.add(TenantShard(organization_id=organization_id, shard=shard, status=status))
+            else:
+                row.shard, row.status = shard, status
+            await db.commit()
+        self._assignments.pop(organization_id)
+
+    async def shard_for(self, organization_id: UUID) -> str:
+        cached = self._assignments.get(organization_id)
+        if cached is None:
+            cached = await self.assignment(organization_id)
+            self._assignments.set(organization_id, cached)
+        shard, status = cached
+        if status == "moving":
+            raise HTTPException(status_code=503, detail="Organization is being moved to another database shard; retry shortly",
+                                headers={"Retry-After": str(int(self.cache_ttl) + 1)})
+        return shard
+
+    async def tenant_session(self, organization_id: UUID, read_only: bool = False, user: Optional[str] = None) -> AsyncSession:
+        """Session on the organization's shard; `user` is remembered after a commit so their next reads see it."""
+        shard = await self.shard_for(organization_id)
+        factory, replica = self.session_factory(shard), None
+        if read_only and self.replica_urls[shard] and not wrote_recently(user):
+            replica = await self.replica_set(shard).choose()
+            if replica is not None:
+                factory = replica.session_factory
+        db = factory()
+        db.info.update(organization_id=organization_id, shard=shard, user=user, replica=replica.url if replica else None)
+        return db
+
+    async def ensure_organization(self, shard: str, organization_id: UUID):
+        """Copy the organization row to a shard so the foreign keys of tenant tables resolve there."""
+        async with self.directory() as db:
+            row = (await db.execute(select(Organization.__table__).where(Organization.organization_id == organization_id))).first()
+        if row is None:
+            raise KeyError(f"Organization {organization_id} not found")
+        async with self.session_factory(shard)() as db:
+            exists = await db.scalar(select(func.count()).select_from(Organization.__table__).where(Organization.organization_id == organization_id))
+            if not exists:
+                await db.execute(insert(Organization.__table__).values(**row._mapping))
+                await db.commit()
+
+    async def provision(self, organization_id: UUID) -> str:
+        """Place a new organization on the shard with the fewest tenants."""
+        async with self.directory() as db:
+            counts = dict((await db.execute(select(TenantShard.shard, func.count()).group_by(TenantShard.shard))).all())
+        shard = min(self.urls, key=lambda name: (counts.get(name, 0), name))
+        await self.ensure_organization(shard, organization_id)
+        await self.set_assignment(organization_id, shard)
+        return shard
+
+    def replica_stats(self) -> dict:
+        return {shard: replicas.stats() for shard, replicas in self._replica_sets.items()}
+
+    async def dispose(self):
+        for engine in self._engines:
+            await engine.dispose()
+        for replicas in self._replica_sets.values():
+            await replicas.dispose()
+
+shard_router = ShardRouter(load_shard_map())
+
+async def get_tenant_db(organization_id: Optional[UUID] = None, current_user: Principal = Depends(get_principal)):
+    """Session on the primary of the request's organization's shard: the caller's, or the one a system administrator names."""
+    organization_id = resolve_organization_id(current_user, organization_id)
+    async with await shard_router.tenant_session(organization_id, user=current_user.username) as db:
+        yield db
+
+async def get_read_db(organization_id: Optional[UUID] = None, current_user: Principal = Depends(get_principal)):
+    """Like get_tenant_db, but for routes that only read: may be served by a replica."""
+    organization_id = resolve_organization_id(current_user, organization_id)
+    async with await shard_router.tenant_session(organization_id, read_only=True, user=current_user.username) as db:
+        yield db
+
+async def count_tenant_rows(db: AsyncSession, organization_id: UUID) -> Dict[str, int]:
+    return {
+        table.name: await db.scalar(select(func.count()).select_from(table).where(table.c.organization_id == organization_id))
+        for table in TENANT_TABLES
+    }
+
+async def delete_tenant_rows(db: AsyncSession, organization_id: UUID):
+    for table in reversed(TENANT_TABLES):
+        await db.execute(delete(table).where(table.c.organization_id == organization_id))
+    await db.commit()
+
+async def copy_tenant(router: ShardRouter, organization_id: UUID, source: str, target: str, batch_size: int = 5000) -> Dict[str, int]:
+    await router.ensure_organization(target, organization_id)
+    async with router.session_factory(source)() as src, router.session_factory(target)() as dst:
+        # Rows left behind by an interrupted move would collide with the copy
+        await delete_tenant_rows(dst, organization_id)
+        for table in TENANT_TABLES:
+            result = await src.stream(
+                select(table).where(table.c.organization_id == organization_id)
+                .execution_options(stream_results=True, max_row_buffer=batch_size)
+            )
+            async for rows in result.partitions(batch_size):
+                for chunk in parameter_chunks(rows, len(table.c)):
+                    await dst.execute(insert(table).values([dict(row._mapping) for row in chunk]))
+                await dst.commit()
+        copied, expected = await count_tenant_rows(dst, organization_id), await count_tenant_rows(src, organization_id)
+    if copied != expected:
+        raise RuntimeError(f"Row counts differ after copy: {source} {expected}, {target} {copied}")
+    return copied
+
+async def move_tenant(router: ShardRouter, organization_id: UUID, target: str, batch_size: int = 5000,
+                      drain_seconds: Optional[float] = None, keep_source: bool = False) -> dict:
+    """Move an organization's rows to another shard.
+
+    The tenant is marked "moving" (requests get 503) and, after every process's cached
+    assignment has expired, copied and verified; then it is switched to the target and
+    deleted from the source. On failure it stays on the source.
+    """
+    if target not in router.urls:
+        raise KeyError(f"Unknown shard {target!r}")
+    source, _ = await router.assignment(organization_id)
+    if source == target:
+        return {"organization_id": str(organization_id), "shard": target, "moved": False}
+    await router.set_assignment(organization_id, source, "moving")
+    try:
+        await asyncio.sleep(router.cache_ttl if drain_seconds is None else drain_seconds)
+        copied = await copy_tenant(router, organization_id, source, target, batch_size)
+    except BaseException:
+        await router.set_assignment(organization_id, source, "active")
+        raise
+    await router.set_assignment(organization_id, target, "active")
+    if not keep_source:
+        async with router.session_factory(source)() as db:
+            await delete_tenant_rows(db, organization_id)
+    return {"organization_id": str(organization_id), "source": source, "shard": target, "moved": True, "rows": copied}
@@ -0,0 +1,75 @@
+"""Concurrent-request throughput of the sync vs async database layers.
+
+Each simulated request runs inside the event loop the way a router does: the
+"sync" variant calls the blocking `app.crud` functions directly (the old
+behaviour), the "async" variant awaits `app.crud.aio`. `--latency` adds a
+`pg_sleep` per request to emulate a slow query or a distant database.
+
+    python -m benchmarks.bench_async_db <organization_id> --requests 500 --concurrency 50 --latency 0.01
+"""
+import argparse
+import asyncio
+import time
+from uuid import UUID
+from sqlalchemy import text
+from app.crud import patient as crud_patient
+from app.crud.aio import patient as crud_patient_aio
+from app.database import SessionLocal, AsyncSessionLocal
+from benchmarks.common import emit, summarize
+
+async def run_sync(requests, concurrency, latency, limit, organization_id):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def handler():
+        async with semaphore:
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                if latency:
+                    db.execute(text("SELECT pg_sleep(:s)"), {"s": latency})
+                crud_patient.get_patients(db, organization_id, limit=limit)
+            finally:
+                db.close()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(requests)))
+    return summarize(latencies, time.perf_counter() - started)
+
+async def run_async(requests, concurrency, latency, limit, organization_id):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def handler():
+        async with semaphore:
+            started = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                if latency:
+                    await db.execute(text("SELECT pg_sleep(:s)"), {"s": latency})
+                await crud_patient_aio.get_patients(db, organization_id, limit=limit)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(requests)))
+    return summarize(latencies, time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("organization_id", type=UUID, help="tenant whose patients are listed")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds of pg_sleep per request")
+    parser.add_argument("--limit", type=int, default=50, help="rows fetched per request")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    results = {
+        "sync": asyncio.run(run_sync(args.requests, args.concurrency, args.latency, args.limit, args.organization_id)),
+        "async": asyncio.run(run_async(args.requests, args.concurrency, args.latency, args.limit, args.organization_id)),
+    }
+    results["speedup"] = round(results["async"]["throughput_per_s"] / max(results["sync"]["throughput_per_s"], 1e-9), 2)
+    emit("async_db", results, args.output)
+
+if __name__ == "__main__":
+    main()
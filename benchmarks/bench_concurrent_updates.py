@@ -0,0 +1,98 @@
+"""Lost updates and update latency: read-modify-write vs versioned single-statement updates.
+
+Concurrent writers ("nurses") each read one patient, think for `--think` seconds and write back
+the phone number incremented by one. The "legacy" writers update the way update_patient used to
+(SELECT, UPDATE, COMMIT, refresh SELECT) without a version check, so increments are lost when
+writers overlap. The "versioned" writers send the version they read as If-Match would and
+re-read on 412, so every increment lands. Update latency is the write alone, retries excluded.
+
+    python -m benchmarks.bench_concurrent_updates <organization_id> --writers 20 --rounds 10 --think 0.005
+"""
+import argparse
+import asyncio
+import time
+from datetime import date
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.future import select
+from app import mpi
+from app.crud.aio import patient as crud_patient
+from app.models.patient import Patient
+from app.schemas.patient import PatientCreate, PatientUpdate
+from app.sharding import shard_router
+from benchmarks.common import emit, summarize
+
+async def legacy_update(db, patient_id, organization_id, phone):
+    where = [Patient.organization_id == organization_id, Patient.patient_id == patient_id]
+    db_patient = (await db.execute(select(Patient).where(*where))).scalars().first()
+    await db.execute(update(Patient.__table__).where(*where).values(phone=phone))
+    await mpi.index_patient(db, db_patient)
+    await db.commit()
+    return (await db.execute(select(Patient).where(*where).execution_options(populate_existing=True))).scalars().first()
+
+async def run(mode, organization_id, patient_id, writers, rounds, think):
+    latencies = []
+    conflicts = 0
+
+    async def writer():
+        nonlocal conflicts
+        for _ in range(rounds):
+            while True:
+                async with await shard_router.tenant_session(organization_id) as db:
+                    current = await crud_patient.get_patient(db, patient_id, organization_id)
+                    phone, version = str(int(current.phone) + 1), current.version
+                await asyncio.sleep(think)
+                async with await shard_router.tenant_session(organization_id) as db:
+                    started = time.perf_counter()
+                    try:
+                        if mode == "legacy":
+                            await legacy_update(db, patient_id, organization_id, phone)
+                        else:
+                            await crud_patient.update_patient(db, patient_id, organization_id, PatientUpdate(phone=phone), [version])
+                    except HTTPException as e:
+                        if e.status_code != 412:
+                            raise
+                        conflicts += 1
+                        continue
+                    latencies.append(time.perf_counter() - started)
+                    break
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(writers)))
+    elapsed = time.perf_counter() - started
+    async with await shard_router.tenant_session(organization_id) as db:
+        final = int((await crud_patient.get_patient(db, patient_id, organization_id)).phone)
+    expected = writers * rounds
+    return {"expected": expected, "final": final, "lost_updates": expected - final, "conflicts": conflicts, "update": summarize(latencies, elapsed)}
+
+async def main_async(args):
+    results = {}
+    try:
+        for mode in ("legacy", "versioned"):
+            async with await shard_router.tenant_session(args.organization_id) as db:
+                patient = await crud_patient.create_patient(db, PatientCreate(
+                    first_name="Bench", last_name="Concurrency", date_of_birth=date(1980, 1, 1), phone="0", organization_id=args.organization_id))
+                patient_id = patient.patient_id
+            try:
+                results[mode] = await run(mode, args.organization_id, patient_id, args.writers, args.rounds, args.think)
+            finally:
+                async with await shard_router.tenant_session(args.organization_id) as db:
+                    await crud_patient.delete_patient(db, patient_id, args.organization_id)
+    finally:
+        await shard_router.dispose()
+    results["update_p50_speedup"] = round(results["legacy"]["update"]["p50_ms"] / results["versioned"]["update"]["p50_ms"], 2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("organization_id", type=UUID, help="tenant the test patient is created in")
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10, help="increments per writer")
+    parser.add_argument("--think", type=float, default=0.005, help="seconds between a writer's read and its write")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    emit("concurrent_updates", asyncio.run(main_async(args)), args.output)
+
+if __name__ == "__main__":
+    main()
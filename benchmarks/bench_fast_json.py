@@ -0,0 +1,71 @@
+"""Latency of ORM + orm_mode serialization vs the fast JSON path for patient and user pages.
+
+Each iteration fetches one page of a seeded tenant's patients (or users) and serializes it the way
+GET /patients/ (or /auth/users/) does: ORM objects validated through the response model and written
+with the stdlib encoder, or Core rows through the precompiled encoder and orjson. Both bodies are
+checked to be byte-identical before timing.
+
+    python -m benchmarks.bench_fast_json <organization_id> --limit 1000 --iterations 50
+"""
+import argparse
+import asyncio
+import time
+from uuid import UUID
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.crud.aio import patient as crud_patient, user as crud_user
+from app.fast_json import fast_json_response
+from app.schemas.patient import Patient
+from app.schemas.user import User
+from app.sharding import shard_router
+from benchmarks.common import emit, summarize
+
+async def orm_page(get, db, organization_id, limit, schema):
+    rows = await get(db, organization_id, limit=limit)
+    return JSONResponse(content=jsonable_encoder([schema.from_orm(row) for row in rows])).body
+
+async def fast_page(get_rows, db, organization_id, limit, schema):
+    rows = await get_rows(db, organization_id, limit=limit)
+    response = fast_json_response(rows, schema, Response())
+    if isinstance(response, StreamingResponse):
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return response.body
+
+async def time_pages(page, iterations):
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await page()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+async def compare(db, args, get, get_rows, schema):
+    orm = lambda: orm_page(get, db, args.organization_id, args.limit, schema)
+    fast = lambda: fast_page(get_rows, db, args.organization_id, args.limit, schema)
+    results = {"byte_identical": await orm() == await fast(), "orm": await time_pages(orm, args.iterations), "fast": await time_pages(fast, args.iterations)}
+    results["p50_speedup"] = round(results["orm"]["p50_ms"] / results["fast"]["p50_ms"], 2)
+    return results
+
+async def run(args):
+    try:
+        async with await shard_router.tenant_session(args.organization_id, read_only=True) as db:
+            return {
+                "patients": await compare(db, args, crud_patient.get_patients, crud_patient.get_patient_rows, Patient),
+                "users": await compare(db, args, crud_user.get_users, crud_user.get_user_rows, User),
+            }
+    finally:
+        await shard_router.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("organization_id", type=UUID, help="seeded tenant whose patients and users are paged")
+    parser.add_argument("--limit", type=int, default=1000, help="rows per page")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    emit("fast_json", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""FHIR Patient serialization: fhir.resources validation round trip vs the direct mapping.
+
+Times `patient_to_fhir` in strict and fast mode for single resources, and the full
+searchset Bundle response body (including the final JSON encoding) for `--bundle-size`
+patients. No database is needed.
+
+    python -m benchmarks.bench_fhir_serializer --patients 2000 --bundle-size 100
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import date
+from app.interoperability import patient_to_fhir, patients_to_bundle
+from app.models.patient import Patient
+# Import the related models so the Patient mapper can configure
+from app.models import organization, hospital, department, provider, user  # noqa: F401
+from benchmarks.common import emit, summarize
+
+def sample_patients(n):
+    return [
+        Patient(patient_id=uuid.uuid4(), organization_id=uuid.uuid4(), first_name=f"Given{i}", last_name=f"Family{i}",
+                date_of_birth=date(1950 + i % 50, 1 + i % 12, 1 + i % 28), gender="female" if i % 2 else "male")
+        for i in range(n)
+    ]
+
+def time_each(fn, items):
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--bundle-size", type=int, default=100)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    patients = sample_patients(args.patients)
+    bundles = [patients[i:i + args.bundle_size] for i in range(0, len(patients), args.bundle_size)]
+    results = {}
+    for mode, strict in (("strict", True), ("fast", False)):
+        results[f"resource_{mode}"] = time_each(lambda p: json.dumps(patient_to_fhir(p, strict)), patients)
+        results[f"bundle_{mode}"] = time_each(lambda b: json.dumps(patients_to_bundle(b, strict)), bundles)
+    results["speedup"] = round(results["resource_strict"]["mean_ms"] / results["resource_fast"]["mean_ms"], 1) if results["resource_fast"]["mean_ms"] else None
+    emit("fhir_serializer", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Login throughput and latency of unrelated requests during a login storm.
+
+Simulates `POST /auth/token` handlers verifying bcrypt hashes while a probe
+coroutine, standing in for an unrelated endpoint, runs every `--probe-interval`
+seconds on the same event loop. The "inline" variant verifies on the event loop
+(the old behaviour), the "pool" variant goes through `app.auth.hashing`.
+
+    python -m benchmarks.bench_login_storm --logins 64 --concurrency 32 --workers 4
+"""
+import argparse
+import asyncio
+import time
+from app.auth.hashing import PasswordHashingPool, hash_password_sync, verify_password_sync
+from benchmarks.common import emit, summarize
+
+async def storm(verify, logins, concurrency, probe_interval):
+    semaphore = asyncio.Semaphore(concurrency)
+    login_latencies, probe_latencies = [], []
+    done = asyncio.Event()
+
+    async def login():
+        async with semaphore:
+            started = time.perf_counter()
+            await verify()
+            login_latencies.append(time.perf_counter() - started)
+
+    async def probe():
+        # Latency of a trivial handler is how late it gets scheduled
+        while not done.is_set():
+            scheduled = time.perf_counter()
+            await asyncio.sleep(probe_interval)
+            probe_latencies.append(max(0.0, time.perf_counter() - scheduled - probe_interval))
+
+    probe_task = asyncio.get_event_loop().create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+    return {"logins": summarize(login_latencies, elapsed), "unrelated_requests": summarize(probe_latencies, elapsed)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+
+    hashed = hash_password_sync("correct horse battery staple")
+    pool = PasswordHashingPool(kind=args.executor, workers=args.workers, max_pending=args.logins)
+
+    async def inline():
+        verify_password_sync("correct horse battery staple", hashed)
+
+    async def pooled():
+        await pool.run(verify_password_sync, "correct horse battery staple", hashed)
+
+    results = {
+        "inline": asyncio.run(storm(inline, args.logins, args.concurrency, args.probe_interval)),
+        "pool": asyncio.run(storm(pooled, args.logins, args.concurrency, args.probe_interval)),
+    }
+    results["pool"]["hashing_pool"] = pool.stats()
+    pool.shutdown()
+    emit("login_storm", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Overhead of the always-on request and query instrumentation.
+
+Calls a trivial FastAPI route in-process (no network) with and without
+MetricsMiddleware, and runs `SELECT 1` on an in-memory SQLite engine with and
+without the cursor hooks, so the difference is the cost of the instrumentation.
+No database server is needed.
+
+    python -m benchmarks.bench_metrics_overhead --requests 20000 --queries 50000
+"""
+import argparse
+import asyncio
+import time
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+from app.metrics import MetricsMiddleware, track_queries
+from benchmarks.common import emit, summarize
+
+def make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"item_id": item_id}
+    return app
+
+async def call(app, path):
+    scope = {"type": "http", "http_version": "1.1", "method": "GET", "path": path, "raw_path": path.encode(),
+             "root_path": "", "scheme": "http", "query_string": b"", "headers": [], "server": ("test", 80), "client": ("test", 1)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+    await app(scope, receive, send)
+
+async def time_requests(app, requests):
+    for i in range(100):
+        await call(app, f"/items/{i}")
+    latencies = []
+    started = time.perf_counter()
+    for i in range(requests):
+        t0 = time.perf_counter()
+        await call(app, f"/items/{i}")
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+def time_queries(instrumented: bool, queries):
+    engine = create_engine("sqlite://")
+    if instrumented:
+        track_queries(engine, "overhead-bench")
+    latencies = []
+    with engine.connect() as conn:
+        statement = text("SELECT 1")
+        started = time.perf_counter()
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            conn.execute(statement)
+            latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+def overhead_us(results, name):
+    return round((results[f"{name}_instrumented"]["mean_ms"] - results[f"{name}_plain"]["mean_ms"]) * 1000, 2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=50000)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    results = {
+        "requests_plain": asyncio.run(time_requests(make_app(False), args.requests)),
+        "requests_instrumented": asyncio.run(time_requests(make_app(True), args.requests)),
+        "queries_plain": time_queries(False, args.queries),
+        "queries_instrumented": time_queries(True, args.queries),
+    }
+    results["overhead_per_request_us"] = overhead_us(results, "requests")
+    results["overhead_per_query_us"] = overhead_us(results, "queries")
+    emit("metrics_overhead", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Micro-benchmarks of the interoperability converters, password hashing and CRUD functions.
+
+Conversions and bcrypt need no database. CRUD timings run against the configured
+database when `--organization-id` names a seeded tenant (see `benchmarks.seed`);
+they are skipped otherwise.
+
+    python -m benchmarks.bench_micro --iterations 2000 --organization-id <id> --output results/micro.json
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date
+from app.auth.hashing import hash_password_sync, verify_password_sync
+from app.crud.aio import hospital as crud_hospital
+from app.crud.aio import organization as crud_organization
+from app.crud.aio import patient as crud_patient
+from app.database import AsyncSessionLocal, async_engine
+from app.fhir_search import patient_search_filters
+from app.interoperability import hl7_to_patient, patient_to_fhir, patient_to_hl7
+from app.schemas.patient import PatientCreate, PatientUpdate
+from app.sharding import shard_router
+from benchmarks.bench_fhir_serializer import sample_patients
+from benchmarks.common import emit, summarize
+
+def time_calls(fn, iterations):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+async def time_awaits(fn, iterations):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        await fn(i)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+def conversions(iterations):
+    patients = sample_patients(min(iterations, 1000))
+    messages = [patient_to_hl7(p) for p in patients]
+    return {
+        "patient_to_fhir": time_calls(lambda i: patient_to_fhir(patients[i % len(patients)]), iterations),
+        "patient_to_fhir_strict": time_calls(lambda i: patient_to_fhir(patients[i % len(patients)], strict=True), iterations),
+        "patient_to_hl7": time_calls(lambda i: patient_to_hl7(patients[i % len(patients)]), iterations),
+        "hl7_to_patient": time_calls(lambda i: hl7_to_patient(messages[i % len(messages)]), iterations),
+    }
+
+def bcrypt(iterations):
+    hashed = hash_password_sync("correct horse battery staple")
+    return {
+        "bcrypt_hash": time_calls(lambda i: hash_password_sync("correct horse battery staple"), iterations),
+        "bcrypt_verify": time_calls(lambda i: verify_password_sync("correct horse battery staple", hashed), iterations),
+    }
+
+async def crud(organization_id, iterations):
+    results = {}
+    try:
+        async with AsyncSessionLocal() as db:
+            results["get_organization_tree"] = await time_awaits(lambda i: crud_organization.get_organization_tree(db, organization_id), iterations)
+            results["get_hospitals"] = await time_awaits(lambda i: crud_hospital.get_hospitals(db, limit=100), iterations)
+        async with await shard_router.tenant_session(organization_id) as db:
+            page = await crud_patient.get_patients(db, organization_id, limit=100)
+            ids = [p.patient_id for p in page] or [uuid.uuid4()]
+            results["get_patient"] = await time_awaits(lambda i: crud_patient.get_patient(db, ids[i % len(ids)], organization_id), iterations)
+            results["get_patients"] = await time_awaits(lambda i: crud_patient.get_patients(db, organization_id, limit=100), iterations)
+            filters = patient_search_filters([("family", "smi")])
+            results["search_patients"] = await time_awaits(lambda i: crud_patient.search_patients(db, organization_id, filters), iterations)
+            created = []
+
+            async def create(i):
+                created.append(await crud_patient.create_patient(db, PatientCreate(
+                    first_name="Bench", last_name=f"Mark{i}", date_of_birth=date(1980, 1, 1), organization_id=organization_id)))
+            results["create_patient"] = await time_awaits(create, iterations)
+            results["update_patient"] = await time_awaits(
+                lambda i: crud_patient.update_patient(db, created[i].patient_id, organization_id, PatientUpdate(phone=str(i))), iterations)
+            results["delete_patient"] = await time_awaits(lambda i: crud_patient.delete_patient(db, created[i].patient_id, organization_id), iterations)
+    finally:
+        await shard_router.dispose()
+        await async_engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--bcrypt-iterations", type=int, default=20)
+    parser.add_argument("--crud-iterations", type=int, default=200)
+    parser.add_argument("--organization-id", type=uuid.UUID, help="seeded tenant to run the CRUD benchmarks on")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    results = conversions(args.iterations)
+    results.update(bcrypt(args.bcrypt_iterations))
+    if args.organization_id:
+        results.update(asyncio.run(crud(args.organization_id, args.crud_iterations)))
+    emit("micro", results, args.output)
+
+if __name__ == "__main__":
+    main()
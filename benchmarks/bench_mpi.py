@@ -0,0 +1,111 @@
+"""Master patient index matching throughput on a synthetic population.
+
+Builds the blocking-key index for `--patients` synthetic patients in memory, then
+matches `--probes` records against it: half are perturbed copies of existing patients
+(misspelled surname, short first name, reformatted phone), half are new people. It
+reports indexing and matching throughput, candidates compared per probe, recall and
+false positives at the create threshold, and a full-scan baseline for comparison.
+
+    python -m benchmarks.bench_mpi --patients 1000000 --probes 10000
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from app import mpi
+from benchmarks.common import emit, summarize
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+              "Lee", "Perez", "Thompson", "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson"]
+
+def person(rng, i):
+    return {
+        "patient_id": i,
+        "first_name": rng.choice(FIRST_NAMES),
+        "last_name": rng.choice(LAST_NAMES) + rng.choice(["", "", "son", "s", "ley", "ton"]),
+        "date_of_birth": date(1930, 1, 1) + timedelta(days=rng.randint(0, 33000)),
+        "gender": rng.choice(["male", "female"]),
+        "phone": f"555{rng.randint(0, 9999999):07d}" if rng.random() < 0.7 else None,
+        "email": f"user{i}@example.com" if rng.random() < 0.4 else None,
+    }
+
+def perturb(rng, record):
+    copy = dict(record, patient_id=None)
+    last = copy["last_name"]
+    if len(last) > 3 and rng.random() < 0.5:
+        # Swap two inner letters, a typical keying error
+        j = rng.randint(1, len(last) - 3)
+        copy["last_name"] = last[:j] + last[j + 1] + last[j] + last[j + 2:]
+    if rng.random() < 0.3:
+        copy["first_name"] = copy["first_name"][:3]
+    if copy["phone"] and rng.random() < 0.5:
+        p = copy["phone"]
+        copy["phone"] = f"+1 ({p[:3]}) {p[3:6]}-{p[6:]}"
+    return copy
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=1000000)
+    parser.add_argument("--probes", type=int, default=10000)
+    parser.add_argument("--scan-probes", type=int, default=3, help="probes for the full-scan baseline")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    population = [person(rng, i) for i in range(args.patients)]
+    started = time.perf_counter()
+    index = defaultdict(list)
+    for record in population:
+        for key in mpi.blocking_keys(record):
+            index[key].append(record)
+    index_elapsed = time.perf_counter() - started
+
+    probes = []
+    for i in range(args.probes):
+        if i % 2 == 0:
+            original = rng.choice(population)
+            probes.append((perturb(rng, original), original["patient_id"]))
+        else:
+            probes.append((person(rng, -i), None))
+
+    latencies, compared, found, false_positives = [], 0, 0, 0
+    started = time.perf_counter()
+    for record, expected in probes:
+        t0 = time.perf_counter()
+        candidates = {}
+        for key in mpi.blocking_keys(record):
+            block = index.get(key, ())
+            if len(block) <= mpi.MPI_MAX_BLOCK_SIZE:
+                candidates.update((c["patient_id"], c) for c in block)
+        matches = [pid for pid, c in candidates.items() if mpi.score(record, c) >= mpi.MPI_MATCH_THRESHOLD]
+        latencies.append(time.perf_counter() - t0)
+        compared += len(candidates)
+        found += expected is not None and expected in matches
+        false_positives += sum(1 for pid in matches if pid != expected)
+    matching = summarize(latencies, time.perf_counter() - started)
+
+    scan_latencies = []
+    started = time.perf_counter()
+    for record, _ in probes[:args.scan_probes]:
+        t0 = time.perf_counter()
+        [c for c in population if mpi.score(record, c) >= mpi.MPI_MATCH_THRESHOLD]
+        scan_latencies.append(time.perf_counter() - t0)
+    full_scan = summarize(scan_latencies, time.perf_counter() - started)
+
+    duplicates = sum(1 for _, expected in probes if expected is not None)
+    emit("mpi", {
+        "patients": args.patients,
+        "indexing": {"elapsed_s": round(index_elapsed, 3), "patients_per_s": round(args.patients / index_elapsed, 1), "blocks": len(index)},
+        "blocked_matching": matching,
+        "full_scan_matching": full_scan,
+        "mean_candidates_per_probe": round(compared / len(probes), 2),
+        "recall": round(found / duplicates, 4) if duplicates else None,
+        "false_positives": false_positives,
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
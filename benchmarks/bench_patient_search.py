@@ -0,0 +1,102 @@
+"""Query time of FHIR Patient searches on a seeded tenant.
+
+Seeds `--seed` random patients into a new organization (skip with `--organization-id`
+to reuse an earlier run), then times each search shape through `crud.aio.patient` and
+records the PostgreSQL plan so index use can be checked.
+
+    python -m benchmarks.bench_patient_search --seed 1000000 --repeat 50
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import date, timedelta
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.future import select
+from app.bulk_import import write_patient_batch
+from app.crud.aio import patient as crud_patient
+from app.database import AsyncSessionLocal, async_engine
+from app.fhir_search import patient_search_filters
+from app.models.organization import Organization
+from app.models.patient import Patient
+from app.pagination import paginate
+from benchmarks.common import emit, summarize
+
+FIRST_NAMES = ["James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+               "Wei", "Fatima", "Carlos", "Aisha", "Ivan", "Priya", "Kenji", "Amara", "Lucas", "Sofia"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+              "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin"]
+
+SEARCHES = {
+    "family_prefix": [("family", "smi")],
+    "family_contains": [("family:contains", "nde")],
+    "given_and_family": [("given", "mar"), ("family", "gar")],
+    "birthdate_exact": [("birthdate", "1980-05-17")],
+    "birthdate_range_gender": [("birthdate", "ge1990"), ("birthdate", "lt1991"), ("gender", "female")],
+}
+
+def _surname(rng):
+    # Suffixes keep the names selective enough for the prefix indexes to matter
+    return f"{rng.choice(LAST_NAMES)}{rng.randint(0, 999)}"
+
+async def seed(count, batch_size):
+    rng = random.Random(42)
+    async with AsyncSessionLocal() as db:
+        org = Organization(name=f"search-bench-{uuid.uuid4().hex[:8]}")
+        db.add(org)
+        await db.commit()
+        for start in range(0, count, batch_size):
+            rows = [{
+                "patient_id": uuid.uuid4(), "organization_id": org.organization_id,
+                "first_name": rng.choice(FIRST_NAMES), "last_name": _surname(rng),
+                "date_of_birth": date(1930, 1, 1) + timedelta(days=rng.randint(0, 33000)),
+                "gender": rng.choice(["male", "female"]), "status": "active",
+            } for _ in range(min(batch_size, count - start))]
+            await write_patient_batch(db, rows)
+        await db.execute(text("ANALYZE patients"))
+        await db.commit()
+        return org.organization_id
+
+async def measure(organization_id, repeat, count):
+    results = {}
+    async with AsyncSessionLocal() as db:
+        for name, params in SEARCHES.items():
+            filters = patient_search_filters(params)
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                rows = await crud_patient.search_patients(db, organization_id, filters, limit=count)
+                latencies.append(time.perf_counter() - t0)
+            results[name] = summarize(latencies, time.perf_counter() - started)
+            results[name]["rows"] = len(rows)
+            stmt = paginate(select(Patient).filter(Patient.organization_id == organization_id, *filters), crud_patient.KEYSET, limit=count)
+            sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+            plan = await db.execute(text(f"EXPLAIN {sql}"))
+            results[name]["plan"] = [line for (line,) in plan]
+    return results
+
+async def run(args):
+    try:
+        organization_id = args.organization_id or await seed(args.seed, args.batch_size)
+        results = await measure(organization_id, args.repeat, args.count)
+        results["organization_id"] = str(organization_id)
+        return results
+    finally:
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=1000000, help="patients to create")
+    parser.add_argument("--organization-id", type=uuid.UUID, help="search an already seeded organization")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--count", type=int, default=50, help="_count of each search")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    emit("patient_search", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Behaviour of the connection pool under a burst larger than it can serve.
+
+`--requests` coroutines start at once; each checks out a connection, runs a
+trivial query and holds the connection for `--hold` seconds, standing in for a
+slow request. With a bounded `--pool-timeout` the requests that cannot get a
+connection in time fail fast (the API turns this into 503); with the SQLAlchemy
+default of 30 s they queue for as long as the burst lasts. Defaults to a local
+SQLite file so it runs anywhere; pass `--url` to measure against PostgreSQL.
+
+    python -m benchmarks.bench_pool --requests 200 --pool-size 10 --max-overflow 5 --hold 0.5 --pool-timeout 1
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.metrics import InstrumentedAsyncAdaptedQueuePool, instrument
+from benchmarks.common import emit, summarize
+
+async def burst(url, requests, pool_size, max_overflow, pool_timeout, hold):
+    engine = create_async_engine(url, poolclass=InstrumentedAsyncAdaptedQueuePool, pool_size=pool_size,
+                                 max_overflow=max_overflow, pool_timeout=pool_timeout)
+    metrics = instrument(engine, "bench")
+    served, shed = [], []
+
+    async def request():
+        started = time.perf_counter()
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                await asyncio.sleep(hold)
+            served.append(time.perf_counter() - started)
+        except PoolTimeoutError:
+            shed.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    pool = metrics.snapshot()
+    return {
+        "pool_timeout_s": pool_timeout,
+        "served": summarize(served, elapsed),
+        "shed": summarize(shed, elapsed),
+        "overflow_events": pool["overflow_events"],
+        "wait_seconds": pool["wait_seconds"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="async database URL (default: a temporary SQLite file)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--max-overflow", type=int, default=5)
+    parser.add_argument("--hold", type=float, default=0.5, help="seconds each request keeps its connection")
+    parser.add_argument("--pool-timeout", type=float, default=1.0)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    url = args.url or f"sqlite+aiosqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_pool.db')}"
+    results = {
+        "bounded": asyncio.run(burst(url, args.requests, args.pool_size, args.max_overflow, args.pool_timeout, args.hold)),
+        "default_timeout": asyncio.run(burst(url, args.requests, args.pool_size, args.max_overflow, 30.0, args.hold)),
+    }
+    emit("pool", results, args.output)
+
+if __name__ == "__main__":
+    main()
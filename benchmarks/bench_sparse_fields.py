@@ -0,0 +1,66 @@
+"""Payload size and latency of full vs sparse (`?fields=`) patient pages.
+
+Each iteration fetches one page of a seeded tenant's patients and serializes it the way
+GET /patients/ does: through the full Patient model, or with `fields` selected via load_only and
+the trimmed model. Latency covers the query and the serialization; payload is the JSON body.
+
+    python -m benchmarks.bench_sparse_fields <organization_id> --limit 1000 --iterations 50 --fields first_name,last_name,date_of_birth
+"""
+import argparse
+import asyncio
+import time
+from uuid import UUID
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.crud.aio import patient as crud_patient
+from app.fieldsets import parse_fields, sparse_response
+from app.schemas.patient import Patient
+from app.sharding import shard_router
+from benchmarks.common import emit, summarize
+
+async def full_page(db, organization_id, limit):
+    patients = await crud_patient.get_patients(db, organization_id, limit=limit)
+    return JSONResponse(content=jsonable_encoder([Patient.from_orm(patient) for patient in patients])).body
+
+async def sparse_page(db, organization_id, limit, fields):
+    patients = await crud_patient.get_patients(db, organization_id, limit=limit, fields=fields)
+    return sparse_response(patients, Patient, fields, Response()).body
+
+async def time_pages(page, iterations):
+    latencies, size = [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        size = len(await page())
+        latencies.append(time.perf_counter() - t0)
+    return {**summarize(latencies, time.perf_counter() - started), "payload_bytes": size}
+
+async def run(args):
+    fields = parse_fields(args.fields, Patient)
+    try:
+        async with await shard_router.tenant_session(args.organization_id, read_only=True) as db:
+            await full_page(db, args.organization_id, args.limit)
+            results = {
+                "full": await time_pages(lambda: full_page(db, args.organization_id, args.limit), args.iterations),
+                "sparse": await time_pages(lambda: sparse_page(db, args.organization_id, args.limit, fields), args.iterations),
+            }
+    finally:
+        await shard_router.dispose()
+    results["fields"] = list(fields)
+    results["payload_reduction_pct"] = round(100 * (1 - results["sparse"]["payload_bytes"] / results["full"]["payload_bytes"]), 1)
+    results["p50_speedup"] = round(results["full"]["p50_ms"] / results["sparse"]["p50_ms"], 2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("organization_id", type=UUID, help="seeded tenant whose patients are paged")
+    parser.add_argument("--limit", type=int, default=1000, help="rows per page")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--fields", default="first_name,last_name,date_of_birth")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    emit("sparse_fields", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
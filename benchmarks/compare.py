@@ -0,0 +1,61 @@
+"""Compare two benchmark result files written with `--output` and flag regressions.
+
+Every latency summary found in both files (matched by its path, e.g. routes.read_patient)
+is compared. A metric that got worse by more than `--threshold` percent is a regression
+and makes the exit status 1, so the comparison can gate CI.
+
+    python -m benchmarks.compare results/base/load.json results/head/load.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# Metrics compared, and whether a higher value is better
+METRICS = {"throughput_per_s": True, "mean_ms": False, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+
+def summaries(node, path=""):
+    """Yield (path, summary) for every dict that carries latency metrics."""
+    if isinstance(node, dict):
+        if "p50_ms" in node:
+            yield path, node
+        for key, value in node.items():
+            yield from summaries(value, f"{path}.{key}" if path else key)
+
+def compare(base: dict, head: dict, threshold: float) -> list:
+    head_summaries = dict(summaries(head.get("results", head)))
+    rows = []
+    for path, before in summaries(base.get("results", base)):
+        after = head_summaries.get(path)
+        if after is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if higher_is_better else change
+            rows.append({"path": path, "metric": metric, "base": old, "head": new, "change_pct": round(change, 1), "regression": worse > threshold})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    parser.add_argument("--all", action="store_true", help="list unchanged metrics too")
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    rows = compare(base, head, args.threshold)
+    for row in rows:
+        if args.all or row["regression"] or abs(row["change_pct"]) > args.threshold:
+            flag = "REGRESSION" if row["regression"] else "improved"
+            print(f"{flag:<10}  {row['path']:<40} {row['metric']:<16} {row['base']:>12} -> {row['head']:<12} ({row['change_pct']:+.1f}%)")
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{len(rows)} metrics compared, {regressions} regressions over {args.threshold}%")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""HTTP load scenario runner: throughput and p50/p95/p99 latency per route of a running API.
+
+`--concurrency` virtual users log in as users from a `benchmarks.seed` manifest and issue
+requests drawn from a weighted route mix for `--duration` seconds, each over its own
+keep-alive connection. Path placeholders ({organization}, {hospital}, {department},
+{provider}, {patient}) are filled from the virtual user's tenant. `--scenario` replaces the
+default mix with a JSON file of the same shape as DEFAULT_SCENARIO.
+
+    python -m benchmarks.load --base-url http://localhost:8000 --manifest results/seed.json \\
+        --concurrency 50 --duration 60 --output results/load.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import ssl
+import time
+from collections import Counter, defaultdict
+from typing import Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+from benchmarks.common import emit, summarize
+
+DEFAULT_SCENARIO = {
+    "routes": [
+        {"name": "list_patients", "method": "GET", "path": "/patients/?limit=50", "weight": 20},
+        {"name": "read_patient", "method": "GET", "path": "/patients/{patient}", "weight": 25},
+        {"name": "read_patient_fhir", "method": "GET", "path": "/patients/{patient}/fhir", "weight": 10},
+        {"name": "fhir_search", "method": "GET", "path": "/Patient?family=smi&_count=20", "weight": 10},
+        {"name": "list_hospitals", "method": "GET", "path": "/hospitals/", "weight": 8},
+        {"name": "read_department", "method": "GET", "path": "/departments/{department}", "weight": 8},
+        {"name": "read_provider", "method": "GET", "path": "/providers/{provider}", "weight": 8},
+        {"name": "organization_tree", "method": "GET", "path": "/organizations/{organization}/tree", "weight": 3},
+        {"name": "create_patient", "method": "POST", "path": "/patients/", "weight": 5, "body": {
+            "first_name": "Load", "last_name": "Test", "date_of_birth": "1985-04-12", "gender": "female", "organization_id": "{organization}"}},
+        {"name": "me", "method": "GET", "path": "/auth/users/me", "weight": 3},
+    ]
+}
+# Roles whose permissions cover every route of the default scenario
+PREFERRED_ROLES = ("System Administrator", "HIM Specialist")
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client; enough for JSON APIs without pulling in a client library."""
+
+    def __init__(self, base_url: str):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or (443 if url.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if url.scheme == "https" else None
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers: dict, body: bytes = b"") -> Tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        try:
+            await self.writer.drain()
+            return await self._response(method)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            await self.close()
+            raise
+
+    async def _response(self, method: str) -> Tuple[int, bytes]:
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            body = b"".join(chunks)
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await self.reader.read()
+            headers["connection"] = "close"
+        if headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, body
+
+def fill(template, tenant: dict, rng: random.Random):
+    if isinstance(template, dict):
+        return {key: fill(value, tenant, rng) for key, value in template.items()}
+    if not isinstance(template, str):
+        return template
+    values = {"organization": tenant["organization_id"]}
+    for placeholder, key in (("hospital", "hospitals"), ("department", "departments"), ("provider", "providers"), ("patient", "patients")):
+        if "{" + placeholder + "}" in template and tenant[key]:
+            values[placeholder] = rng.choice(tenant[key])
+    return template.format_map(defaultdict(str, values))
+
+def pick_users(manifest: dict, count: int, rng: random.Random):
+    candidates = [(tenant, user) for tenant in manifest["organizations"] for user in tenant["users"] if user["role"] in PREFERRED_ROLES]
+    if not candidates:
+        candidates = [(tenant, user) for tenant in manifest["organizations"] for user in tenant["users"]]
+    return [rng.choice(candidates) for _ in range(count)]
+
+async def login(connection: Connection, username: str, password: str) -> Optional[str]:
+    body = urlencode({"username": username, "password": password}).encode()
+    status, payload = await connection.request("POST", "/auth/token", {"Content-Type": "application/x-www-form-urlencoded"}, body)
+    return json.loads(payload)["access_token"] if status == 200 else None
+
+async def virtual_user(base_url, tenant, user, password, routes, deadline, rng, latencies, statuses, errors):
+    connection = Connection(base_url)
+    try:
+        token = await login(connection, user["username"], password)
+        if token is None:
+            errors["login"] += 1
+            return
+        auth = {"Authorization": f"Bearer {token}"}
+        weights = [route.get("weight", 1) for route in routes]
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights=weights)[0]
+            headers, body = dict(auth), b""
+            if "body" in route:
+                headers["Content-Type"] = "application/json"
+                body = json.dumps(fill(route["body"], tenant, rng)).encode()
+            started = time.perf_counter()
+            try:
+                status, _ = await connection.request(route["method"], fill(route["path"], tenant, rng), headers, body)
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                errors[route["name"]] += 1
+                continue
+            latencies[route["name"]].append(time.perf_counter() - started)
+            statuses[route["name"]][str(status)] += 1
+    finally:
+        await connection.close()
+
+async def run(args) -> dict:
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    scenario = DEFAULT_SCENARIO
+    if args.scenario:
+        with open(args.scenario) as f:
+            scenario = json.load(f)
+    rng = random.Random(args.random_seed)
+    latencies, statuses, errors = defaultdict(list), defaultdict(Counter), Counter()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        virtual_user(args.base_url, tenant, user, manifest["password"], scenario["routes"], deadline,
+                     random.Random(rng.random()), latencies, statuses, errors)
+        for tenant, user in pick_users(manifest, args.concurrency, rng)
+    ))
+    elapsed = time.perf_counter() - started
+    routes = {}
+    for route in scenario["routes"]:
+        name = route["name"]
+        routes[name] = summarize(latencies[name], elapsed)
+        routes[name]["status"] = dict(statuses[name])
+        routes[name]["errors"] = errors[name]
+    overall = summarize([latency for samples in latencies.values() for latency in samples], elapsed)
+    overall["errors"] = sum(errors.values())
+    return {"concurrency": args.concurrency, "duration_s": args.duration, "overall": overall, "routes": routes, "login_failures": errors["login"]}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--manifest", default="results/seed.json", help="written by benchmarks.seed")
+    parser.add_argument("--scenario", help="JSON route mix replacing the default one")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--random-seed", type=int, default=7)
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    emit("load", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
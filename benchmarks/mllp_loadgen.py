@@ -0,0 +1,77 @@
+"""Load generator for the inbound MLLP listener.
+
+Sends ADT^A01 messages for one organization over pipelined MLLP connections and
+reports ACK latency and throughput. Point it at a running listener, or pass
+`--local` to start one in-process against DATABASE_URL.
+
+    python -m benchmarks.mllp_loadgen --organization-id <uuid> --messages 5000 --connections 4 --in-flight 64
+"""
+import argparse
+import asyncio
+import random
+import time
+from uuid import UUID
+from app.mllp import MLLPConnectionPool, MLLPError, new_control_id, parse_ack
+from benchmarks.common import emit, summarize
+
+FIRST_NAMES = ["John", "Jane", "Maria", "Ahmed", "Wei", "Olga", "Kofi", "Priya"]
+LAST_NAMES = ["Doe", "Smith", "Garcia", "Khan", "Chen", "Ivanova", "Mensah", "Patel"]
+
+def adt_a01(organization_id: UUID) -> str:
+    birth = f"{random.randint(1930, 2020)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+    return (
+        f"MSH|^~\\&|LOADGEN|UPSTREAM|INFOCTOR|HOSPITAL|{time.strftime('%Y%m%d%H%M%S')}||ADT^A01|{new_control_id()}|P|2.3\r"
+        f"PID|||{organization_id}||{random.choice(LAST_NAMES)}^{random.choice(FIRST_NAMES)}||{birth}|{random.choice(['male', 'female'])}"
+    )
+
+async def generate(host, port, organization_id, messages, connections, in_flight):
+    pool = MLLPConnectionPool(host, port, size=connections, max_in_flight=in_flight)
+    latencies = []
+    codes = {}
+
+    async def send_one():
+        started = time.perf_counter()
+        try:
+            code, _ = parse_ack(await pool.send(adt_a01(organization_id)))
+        except MLLPError:
+            code = "undelivered"
+        latencies.append(time.perf_counter() - started)
+        codes[code] = codes.get(code, 0) + 1
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(send_one() for _ in range(messages)))
+    finally:
+        await pool.close()
+    return {"acks": summarize(latencies, time.perf_counter() - started), "ack_codes": codes}
+
+async def run(args):
+    if not args.local:
+        return await generate(args.host, args.port, args.organization_id, args.messages, args.connections, args.in_flight)
+    from app.database import AsyncSessionLocal, async_engine
+    from app.mllp_listener import MLLPListener
+    listener = await MLLPListener(AsyncSessionLocal, host="127.0.0.1", port=0).start()
+    try:
+        port = listener.sockets[0].getsockname()[1]
+        results = await generate("127.0.0.1", port, args.organization_id, args.messages, args.connections, args.in_flight)
+        results["listener"] = listener.stats()
+        return results
+    finally:
+        await listener.close()
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2575)
+    parser.add_argument("--organization-id", type=UUID, required=True)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--in-flight", type=int, default=64)
+    parser.add_argument("--local", action="store_true", help="run the listener in-process")
+    parser.add_argument("--output", help="write JSON results to this path")
+    args = parser.parse_args()
+    emit("mllp_loadgen", asyncio.run(run(args)), args.output)
+
+if __name__ == "__main__":
+    main()
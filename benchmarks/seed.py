@@ -0,0 +1,160 @@
+"""Synthetic multi-tenant data set for benchmarks and load tests.
+
+Creates `--organizations` tenants whose sizes follow a Zipf distribution (`--skew`;
+0 makes them equal), so a few large health systems sit next to many small clinics,
+the way production tenants do. Hospitals, departments, providers, users and patients
+are spread accordingly; patients go to each tenant's shard. Every user gets the
+password `--password`. A manifest of the created ids is written for `benchmarks.load`.
+
+    python -m benchmarks.seed --organizations 50 --patients 200000 --users 500 --manifest results/seed.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import uuid
+from datetime import date, timedelta
+from typing import List
+from sqlalchemy import insert
+from app.auth.hashing import hash_password_sync
+from app.auth.permissions import ROLE_PERMISSIONS
+from app.bulk_import import write_patient_batch
+from app.crud.aio import user as crud_user
+from app.database import AsyncSessionLocal, async_engine
+from app.models.department import Department
+from app.models.hospital import Hospital
+from app.models.organization import Organization
+from app.models.provider import Provider
+from app.models.user import User
+from app.schemas.user import RoleCreate
+from app.sharding import shard_router
+from benchmarks.bench_patient_search import FIRST_NAMES, LAST_NAMES
+
+SPECIALTIES = ["Cardiology", "Oncology", "Pediatrics", "Emergency", "Radiology", "Neurology", "Orthopedics", "General Medicine"]
+# How often each role is handed out; most users are clinical staff
+ROLE_WEIGHTS = {"Nurse": 40, "Physician": 25, "Medical Assistant": 20, "HIM Specialist": 8, "Compliance Officer": 4, "System Administrator": 3}
+# Patients kept per organization in the manifest for routes that need an existing id
+MANIFEST_PATIENTS = 200
+
+def zipf_weights(n: int, skew: float) -> List[float]:
+    weights = [1.0 / (rank + 1) ** skew for rank in range(n)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+def split(total: int, weights: List[float], minimum: int = 0) -> List[int]:
+    """Divide `total` proportionally to `weights` (largest remainder), giving every share at least `minimum`."""
+    spare = max(total - minimum * len(weights), 0)
+    exact = [spare * w for w in weights]
+    counts = [int(x) for x in exact]
+    for i in sorted(range(len(weights)), key=lambda i: exact[i] - counts[i], reverse=True)[:spare - sum(counts)]:
+        counts[i] += 1
+    return [minimum + c for c in counts]
+
+def patient_rows(rng: random.Random, organization_id: uuid.UUID, count: int):
+    for _ in range(count):
+        yield {
+            "patient_id": uuid.uuid4(), "organization_id": organization_id,
+            "first_name": rng.choice(FIRST_NAMES), "last_name": f"{rng.choice(LAST_NAMES)}{rng.randint(0, 999)}",
+            "date_of_birth": date(1930, 1, 1) + timedelta(days=rng.randint(0, 33000)),
+            "gender": rng.choice(["male", "female"]), "status": "active" if rng.random() < 0.95 else "inactive",
+        }
+
+async def ensure_roles(db) -> dict:
+    roles = {}
+    for name in ROLE_PERMISSIONS:
+        role = await crud_user.get_role_by_name(db, name) or await crud_user.create_role(db, RoleCreate(name=name))
+        roles[name] = role.role_id
+    return roles
+
+async def seed_organization(rng, run, index, roles, password_hash, hospitals, patients, users, batch_size):
+    organization_id = uuid.uuid4()
+    tenant = {"organization_id": str(organization_id), "hospitals": [], "departments": [], "providers": [], "patients": [], "users": []}
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Organization.__table__).values(
+            organization_id=organization_id, name=f"{run} health system {index}", subscription_plan=rng.choice(["basic", "pro", "enterprise"])))
+        hospital_rows, department_rows, provider_rows = [], [], []
+        for h in range(hospitals):
+            hospital_id = uuid.uuid4()
+            hospital_rows.append({"hospital_id": hospital_id, "organization_id": organization_id, "name": f"Hospital {index}.{h}"})
+            for specialty in rng.sample(SPECIALTIES, rng.randint(2, len(SPECIALTIES))):
+                department_id = uuid.uuid4()
+                department_rows.append({"department_id": department_id, "hospital_id": hospital_id, "name": specialty, "specialty": specialty})
+                for _ in range(max(1, int(rng.paretovariate(1.5) * 3))):
+                    provider_rows.append({
+                        "provider_id": uuid.uuid4(), "department_id": department_id, "first_name": rng.choice(FIRST_NAMES),
+                        "last_name": rng.choice(LAST_NAMES), "speciality": specialty,
+                        "email": f"{run}.{index}.{h}.{len(provider_rows)}@providers.example.com",
+                    })
+        user_rows = []
+        for u in range(users):
+            role = rng.choices(list(ROLE_WEIGHTS), weights=list(ROLE_WEIGHTS.values()))[0]
+            username = f"{run}-{index}-{u}"
+            user_rows.append({
+                "user_id": uuid.uuid4(), "organization_id": organization_id, "role_id": roles[role], "username": username,
+                "password_hash": password_hash, "email": f"{username}@users.example.com",
+                "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES), "status": "active",
+            })
+            tenant["users"].append({"username": username, "role": role})
+        for model, rows in ((Hospital, hospital_rows), (Department, department_rows), (Provider, provider_rows), (User, user_rows)):
+            for start in range(0, len(rows), batch_size):
+                await db.execute(insert(model.__table__).values(rows[start:start + batch_size]))
+        await db.commit()
+    await shard_router.provision(organization_id)
+    async with await shard_router.tenant_session(organization_id) as db:
+        remaining = patients
+        rows = patient_rows(rng, organization_id, patients)
+        while remaining:
+            batch = [next(rows) for _ in range(min(batch_size, remaining))]
+            await write_patient_batch(db, batch)
+            remaining -= len(batch)
+            if len(tenant["patients"]) < MANIFEST_PATIENTS:
+                tenant["patients"] += [str(row["patient_id"]) for row in batch[:MANIFEST_PATIENTS - len(tenant["patients"])]]
+    tenant["hospitals"] = [str(row["hospital_id"]) for row in hospital_rows]
+    tenant["departments"] = [str(row["department_id"]) for row in department_rows]
+    tenant["providers"] = [str(row["provider_id"]) for row in provider_rows]
+    return tenant
+
+async def run(args) -> dict:
+    rng = random.Random(args.random_seed)
+    run_id = uuid.uuid4().hex[:8]
+    weights = zipf_weights(args.organizations, args.skew)
+    hospitals = split(args.hospitals, weights, minimum=1)
+    patients = split(args.patients, weights)
+    users = split(args.users, weights, minimum=1)
+    try:
+        async with AsyncSessionLocal() as db:
+            roles = await ensure_roles(db)
+        password_hash = hash_password_sync(args.password)
+        tenants = []
+        for index in range(args.organizations):
+            tenants.append(await seed_organization(rng, run_id, index, roles, password_hash, hospitals[index], patients[index], users[index], args.batch_size))
+        return {"run": run_id, "password": args.password, "organizations": tenants}
+    finally:
+        await shard_router.dispose()
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--organizations", type=int, default=20)
+    parser.add_argument("--hospitals", type=int, default=60, help="total over all organizations")
+    parser.add_argument("--patients", type=int, default=100000, help="total over all organizations")
+    parser.add_argument("--users", type=int, default=200, help="total over all organizations")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of tenant sizes")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--manifest", default="results/seed.json")
+    args = parser.parse_args()
+    manifest = asyncio.run(run(args))
+    os.makedirs(os.path.dirname(os.path.abspath(args.manifest)), exist_ok=True)
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    sizes = {"organizations": len(manifest["organizations"])}
+    for key in ("hospitals", "departments", "providers", "users"):
+        sizes[key] = sum(len(t[key]) for t in manifest["organizations"])
+    sizes["patients"] = args.patients
+    print(json.dumps({"run": manifest["run"], "manifest": args.manifest, "created": sizes}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,16 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import organizations, hospitals, departments, providers, patients, users
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app.auth.hashing import password_pool
+from app.database import async_engine, engine
+from app.metrics import MetricsMiddleware, pool_stats, render_prometheus
+from app.mllp import close_pools
+from app.pagination import NEXT_CURSOR_HEADER
+from app.profiling import QUERY_PROFILE_HEADER, QUERY_PROFILING, QueryProfileMiddleware
+from app.routers import organizations, hospitals, departments, providers, patients, users, fhir
+from app.sharding import shard_router
 
 app = FastAPI(title="Infoctor EHR API", version="1.0.0")
 
@@ -12,7 +21,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", QUERY_PROFILE_HEADER],
 )
+# Per-route latency, query count and database time, exported at /metrics
+app.add_middleware(MetricsMiddleware)
+if QUERY_PROFILING:
+    app.add_middleware(QueryProfileMiddleware)
 
 # Include routers
 app.include_router(organizations.router, prefix="/organizations", tags=["organizations"])
@@ -21,6 +35,28 @@ app.include_router(departments.router, prefix="/departments", tags=["departments
 app.include_router(providers.router, prefix="/providers", tags=["providers"])
 app.include_router(patients.router, prefix="/patients", tags=["patients"])
 app.include_router(users.router, prefix="/auth", tags=["authentication"])
+app.include_router(fhir.router, tags=["fhir"])
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    # Every connection stayed busy for DB_POOL_TIMEOUT; shed the request rather than queue it
+    return JSONResponse(status_code=503, content={"detail": "Database is busy, retry shortly"}, headers={"Retry-After": "1"})
+
+@app.on_event("shutdown")
+async def shutdown():
+    password_pool.shutdown()
+    await close_pools()
+    await shard_router.dispose()
+    await async_engine.dispose()
+    engine.dispose()
+
+@app.get("/health/db")
+async def database_health():
+    return {"pools": pool_stats(), "replicas": shard_router.replica_stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
@@ -1,6 +1,7 @@
 
 -- Enable UUID generation
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 
 -- Organizations table (top level)
 CREATE TABLE organizations (
@@ -9,7 +10,8 @@ CREATE TABLE organizations (
     subscription_plan VARCHAR(50),
     status VARCHAR(50) CHECK (status IN ('active', 'suspended', 'terminated')) DEFAULT 'active',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 -- Hospitals table
@@ -21,7 +23,8 @@ CREATE TABLE hospitals (
     phone VARCHAR(20),
     status VARCHAR(50) CHECK (status IN ('active', 'inactive')) DEFAULT 'active',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 -- Departments table
@@ -32,7 +35,8 @@ CREATE TABLE departments (
     specialty VARCHAR(100),
     status VARCHAR(50) CHECK (status IN ('active', 'inactive')) DEFAULT 'active',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 -- Providers table
@@ -46,7 +50,8 @@ CREATE TABLE providers (
     phone VARCHAR(20),
     status VARCHAR(50) CHECK (status IN ('active', 'inactive')) DEFAULT 'active',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 -- Patients table
@@ -62,7 +67,8 @@ CREATE TABLE patients (
     address TEXT,
     status VARCHAR(50) CHECK (status IN ('active', 'inactive')) DEFAULT 'active',
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    version INTEGER NOT NULL DEFAULT 1
 );
 
 -- Users table (for authentication and authorization)
@@ -74,6 +80,7 @@ CREATE TABLE users (
     email VARCHAR(255) UNIQUE NOT NULL,
     role VARCHAR(50) NOT NULL,
     status VARCHAR(50) CHECK (status IN ('active', 'inactive')) DEFAULT 'active',
+    token_version INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -107,6 +114,7 @@ CREATE TABLE users (
     first_name VARCHAR(100) NOT NULL,
     last_name VARCHAR(100) NOT NULL,
     status VARCHAR(50) CHECK (status IN ('active', 'inactive')) DEFAULT 'active',
+    token_version INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -114,6 +122,44 @@ CREATE TABLE users (
 -- Create index for role_id in users table
 CREATE INDEX idx_users_role_id ON users(role_id);
 
+-- Composite indexes backing keyset pagination; each matches the ORDER BY of its list query
+CREATE INDEX idx_organizations_keyset ON organizations(created_at, organization_id);
+CREATE INDEX idx_hospitals_keyset ON hospitals(organization_id, created_at, hospital_id);
+CREATE INDEX idx_departments_keyset ON departments(hospital_id, created_at, department_id);
+CREATE INDEX idx_providers_keyset ON providers(department_id, created_at, provider_id);
+CREATE INDEX idx_patients_keyset ON patients(organization_id, created_at, patient_id);
+
+-- FHIR Patient search: prefix matches on lower(name) (family=, given=), substring
+-- matches through trigrams (family:contains=) and birth date ranges, all per tenant
+CREATE INDEX idx_patients_org_family ON patients(organization_id, lower(last_name) text_pattern_ops);
+CREATE INDEX idx_patients_org_given ON patients(organization_id, lower(first_name) text_pattern_ops);
+CREATE INDEX idx_patients_org_birthdate ON patients(organization_id, date_of_birth);
+CREATE INDEX idx_patients_family_trgm ON patients USING gin (lower(last_name) gin_trgm_ops);
+CREATE INDEX idx_patients_given_trgm ON patients USING gin (lower(first_name) gin_trgm_ops);
+
+-- Master patient index: blocking keys (phonetic name + DOB, phone, email) per patient.
+-- Duplicate candidates are found with an index lookup per key instead of a table scan.
+CREATE TABLE patient_blocking_keys (
+    patient_id UUID NOT NULL REFERENCES patients(patient_id) ON DELETE CASCADE,
+    key_type VARCHAR(20) NOT NULL,
+    key_value VARCHAR(255) NOT NULL,
+    organization_id UUID NOT NULL REFERENCES organizations(organization_id) ON DELETE CASCADE,
+    PRIMARY KEY (patient_id, key_type, key_value)
+);
+
+-- Shard assignment of each tenant (directory database only). Tenants without a row
+-- live on DEFAULT_SHARD.
+CREATE TABLE tenant_shards (
+    organization_id UUID PRIMARY KEY REFERENCES organizations(organization_id) ON DELETE CASCADE,
+    shard VARCHAR(100) NOT NULL,
+    status VARCHAR(20) NOT NULL CHECK (status IN ('active', 'moving')) DEFAULT 'active',
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX idx_patient_blocking_keys_lookup ON patient_blocking_keys(organization_id, key_type, key_value);
+CREATE INDEX idx_users_keyset ON users(organization_id, created_at, user_id);
+CREATE INDEX idx_roles_keyset ON roles(created_at, role_id);
+
 -- Insert predefined roles
 INSERT INTO roles (name, description) VALUES
 ('System Administrator', 'Manages overall system configuration, user accounts, and security settings.'),
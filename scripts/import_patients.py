@@ -0,0 +1,51 @@
+"""Bulk-load patients from an NDJSON file or a FHIR Bundle.
+
+    python -m scripts.import_patients <organization_id> patients.ndjson
+    python -m scripts.import_patients <organization_id> bundle.json --format bundle --batch-size 2000
+
+Each NDJSON line is either a FHIR Patient resource or a plain patient object
+(the `POST /patients/` payload). Lines that fail validation or violate a
+constraint are listed in the report; the rest of the file is still imported.
+Records must belong to the given organization, whose shard they are written to.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from uuid import UUID
+from app import bulk_import
+from app.database import async_engine
+from app.sharding import shard_router
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            yield line_no, line
+
+async def run(organization_id, path, fmt, batch_size):
+    if fmt == "bundle":
+        with open(path, encoding="utf-8") as f:
+            records = bulk_import.iter_bundle(json.load(f))
+    else:
+        records = read_lines(path)
+    try:
+        async with await shard_router.tenant_session(organization_id) as db:
+            return await bulk_import.import_patients(db, records, batch_size=batch_size, organization_id=organization_id)
+    finally:
+        await shard_router.dispose()
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("organization_id", type=UUID)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["ndjson", "bundle"], default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=bulk_import.IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.organization_id, args.path, args.format, args.batch_size))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    sys.exit(1 if report["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Run the inbound MLLP listener for ADT feeds.
+
+    python -m scripts.mllp_listener --port 2575
+
+ADT^A01/A04/A05/A28 create patients, ADT^A08/A31 update the patient named in
+PID-2. Every message is answered with an AA or AE ACK. Tuning knobs are the
+MLLP_* environment variables listed in the README.
+"""
+import argparse
+import asyncio
+import json
+import logging
+from app.database import async_engine
+from app.mllp_listener import MLLP_LISTEN_HOST, MLLP_LISTEN_PORT, MLLPListener
+from app.sharding import shard_router
+
+logger = logging.getLogger("mllp_listener")
+
+async def run(host, port, stats_interval):
+    listener = await MLLPListener(shard_router.directory, host=host, port=port, shard_router=shard_router).start()
+    logger.info("Listening for MLLP on %s:%s", host, port)
+    try:
+        while True:
+            await asyncio.sleep(stats_interval)
+            logger.info("stats %s", json.dumps(listener.stats()))
+    finally:
+        await listener.close()
+        await shard_router.dispose()
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=MLLP_LISTEN_HOST)
+    parser.add_argument("--port", type=int, default=MLLP_LISTEN_PORT)
+    parser.add_argument("--stats-interval", type=float, default=30.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        asyncio.run(run(args.host, args.port, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
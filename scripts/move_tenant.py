@@ -0,0 +1,38 @@
+"""Move an organization's patient data to another database shard.
+
+    python -m scripts.move_tenant <organization_id> <shard> --batch-size 5000
+
+The shards are those of SHARD_MAP. While the move runs, requests for the
+organization get 503 with Retry-After; other tenants are unaffected. The move
+waits TENANT_SHARD_CACHE_TTL_SECONDS before copying so that no API process still
+routes the tenant to the old shard, verifies row counts, switches the assignment
+and then deletes the rows from the old shard (unless --keep-source).
+"""
+import argparse
+import asyncio
+import json
+import sys
+from uuid import UUID
+from app.database import async_engine
+from app.sharding import move_tenant, shard_router
+
+async def run(organization_id, shard, batch_size, keep_source):
+    try:
+        return await move_tenant(shard_router, organization_id, shard, batch_size=batch_size, keep_source=keep_source)
+    finally:
+        await shard_router.dispose()
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("organization_id", type=UUID)
+    parser.add_argument("shard", choices=sorted(shard_router.urls))
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--keep-source", action="store_true", help="leave the copied rows on the old shard")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.organization_id, args.shard, args.batch_size, args.keep_source))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
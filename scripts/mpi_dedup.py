@@ -0,0 +1,38 @@
+"""Report likely duplicate patients of an organization from the master patient index.
+
+    python -m scripts.mpi_dedup <organization_id> --rebuild --threshold 0.85
+
+`--rebuild` recomputes the blocking keys first, which is needed once for patients
+created before the index existed. Pairs are printed as JSON, best matches first.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from uuid import UUID
+from app import mpi
+from app.database import async_engine
+from app.sharding import shard_router
+
+async def run(organization_id, rebuild, threshold):
+    try:
+        async with await shard_router.tenant_session(organization_id) as db:
+            indexed = await mpi.rebuild_keys(db, organization_id) if rebuild else None
+            duplicates = await mpi.find_duplicates(db, organization_id, threshold=threshold)
+        return {"indexed": indexed, "duplicates": duplicates}
+    finally:
+        await shard_router.dispose()
+        await async_engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("organization_id", type=UUID)
+    parser.add_argument("--rebuild", action="store_true", help="recompute blocking keys before matching")
+    parser.add_argument("--threshold", type=float, default=mpi.MPI_REVIEW_THRESHOLD)
+    args = parser.parse_args()
+    report = asyncio.run(run(args.organization_id, args.rebuild, args.threshold))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
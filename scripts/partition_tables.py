@@ -0,0 +1,220 @@
+"""Move `patients` or `users` to a table hash-partitioned by organization_id, online.
+
+    python -m scripts.partition_tables prepare patients --partitions 16
+    python -m scripts.partition_tables copy patients --batch-size 5000
+    python -m scripts.partition_tables cutover patients
+
+`prepare` creates `<table>_partitioned` with its partitions and partition-aware
+indexes, and installs a trigger that mirrors every write on the live table into
+it. `copy` backfills existing rows in primary-key-ordered batches, each in its own short
+transaction, while the application keeps running. `cutover` takes an exclusive lock,
+reconciles the copy with the live table row by row (dropping rows deleted or changed
+while the backfill ran, adding missing ones), swaps the table names and re-points
+foreign keys; the old table is kept as `<table>_unpartitioned` until you drop it.
+`all` runs the three steps in a row (use it on an empty database for a fresh partitioned install).
+Add `--print-sql` to see the statements of prepare/cutover without running them.
+
+Usernames and emails must stay unique across tenants, which a hash-partitioned
+table cannot enforce by itself, so partitioned `users` gets a `user_identities`
+table maintained by trigger.
+"""
+import argparse
+import sys
+from sqlalchemy import text
+from app.database import engine
+
+TABLES = {
+    "patients": {
+        "key": "patient_id",
+        "foreign_keys": [
+            "FOREIGN KEY (organization_id) REFERENCES organizations(organization_id) ON DELETE CASCADE",
+        ],
+        "indexes": [
+            "(organization_id, created_at, patient_id)",
+            "(organization_id, lower(last_name) text_pattern_ops)",
+            "(organization_id, lower(first_name) text_pattern_ops)",
+            "(organization_id, date_of_birth)",
+            "USING gin (lower(last_name) gin_trgm_ops)",
+            "USING gin (lower(first_name) gin_trgm_ops)",
+        ],
+        # (table, constraint, columns) of foreign keys pointing at this table
+        "referenced_by": [("patient_blocking_keys", "patient_blocking_keys_patient_id_fkey", "patient_id")],
+    },
+    "users": {
+        "key": "user_id",
+        "foreign_keys": [
+            "FOREIGN KEY (organization_id) REFERENCES organizations(organization_id) ON DELETE CASCADE",
+            "FOREIGN KEY (role_id) REFERENCES roles(role_id)",
+        ],
+        "indexes": [
+            "(organization_id, created_at, user_id)",
+            "(username)",
+            "(role_id)",
+        ],
+        "referenced_by": [],
+    },
+}
+
+USER_IDENTITIES_SQL = """
+CREATE TABLE IF NOT EXISTS user_identities (
+    username VARCHAR(50) PRIMARY KEY,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    organization_id UUID NOT NULL,
+    user_id UUID NOT NULL
+);
+CREATE OR REPLACE FUNCTION users_partitioned_identity() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM user_identities WHERE username = OLD.username;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO user_identities (username, email, organization_id, user_id)
+        VALUES (NEW.username, NEW.email, NEW.organization_id, NEW.user_id);
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+CREATE TRIGGER users_partitioned_identity AFTER INSERT OR UPDATE OR DELETE ON users_partitioned
+    FOR EACH ROW EXECUTE FUNCTION users_partitioned_identity();
+"""
+
+def prepare_sql(table: str, partitions: int) -> list:
+    spec, new = TABLES[table], f"{table}_partitioned"
+    key = spec["key"]
+    statements = [
+        f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY HASH (organization_id)",
+        # Unique constraints on a partitioned table must include the partition key
+        f"ALTER TABLE {new} ADD PRIMARY KEY (organization_id, {key})",
+    ]
+    statements += [f"ALTER TABLE {new} ADD {fk}" for fk in spec["foreign_keys"]]
+    statements += [
+        f"CREATE TABLE {table}_p{i} PARTITION OF {new} FOR VALUES WITH (MODULUS {partitions}, REMAINDER {i})"
+        for i in range(partitions)
+    ]
+    # Indexes on the parent are created on every partition, current and future
+    statements += [f"CREATE INDEX idx_{new}_{i} ON {new} {columns}" for i, columns in enumerate(spec["indexes"])]
+    if table == "users":
+        statements.append(USER_IDENTITIES_SQL)
+    statements.append(f"""
+CREATE OR REPLACE FUNCTION {table}_mirror() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM {new} WHERE organization_id = OLD.organization_id AND {key} = OLD.{key};
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {new} SELECT (NEW).* ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql""")
+    statements.append(f"CREATE TRIGGER {table}_mirror AFTER INSERT OR UPDATE OR DELETE ON {table} FOR EACH ROW EXECUTE FUNCTION {table}_mirror()")
+    return statements
+
+def reconcile_sql(table: str) -> list:
+    """Make `<table>_partitioned` equal to the live table, run under cutover's exclusive lock.
+
+    Drops rows that are gone from (or differ in) the live table, then inserts the live rows
+    that are missing, so rows a racing backfill resurrected or left stale are fixed.
+    """
+    new, key = f"{table}_partitioned", TABLES[table]["key"]
+    return [
+        f"DELETE FROM {new} n WHERE NOT EXISTS (SELECT 1 FROM {table} l WHERE l.organization_id = n.organization_id "
+        f"AND l.{key} = n.{key} AND ROW(l.*) IS NOT DISTINCT FROM ROW(n.*))",
+        f"INSERT INTO {new} SELECT * FROM {table} l WHERE NOT EXISTS (SELECT 1 FROM {new} n "
+        f"WHERE n.organization_id = l.organization_id AND n.{key} = l.{key})",
+    ]
+
+def cutover_sql(table: str) -> list:
+    spec, new = TABLES[table], f"{table}_partitioned"
+    key = spec["key"]
+    statements = [
+        f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE",
+        *reconcile_sql(table),
+        f"DROP TRIGGER {table}_mirror ON {table}",
+        f"DROP FUNCTION {table}_mirror()",
+    ]
+    statements += [f"ALTER TABLE {ref} DROP CONSTRAINT IF EXISTS {constraint}" for ref, constraint, _ in spec["referenced_by"]]
+    statements += [
+        f"ALTER TABLE {table} RENAME TO {table}_unpartitioned",
+        f"ALTER TABLE {new} RENAME TO {table}",
+    ]
+    statements += [
+        f"ALTER TABLE {ref} ADD CONSTRAINT {constraint} FOREIGN KEY (organization_id, {column}) "
+        f"REFERENCES {table}(organization_id, {key}) ON DELETE CASCADE"
+        for ref, constraint, column in spec["referenced_by"]
+    ]
+    return statements
+
+def prepare(table: str, partitions: int):
+    with engine.begin() as conn:
+        for statement in prepare_sql(table, partitions):
+            conn.execute(text(statement))
+    print(f"{table}_partitioned created with {partitions} partitions; writes to {table} are mirrored")
+
+def _columns(conn, table: str) -> list:
+    return conn.execute(text(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = :table "
+        "ORDER BY ordinal_position"
+    ), {"table": table}).scalars().all()
+
+def copy(table: str, batch_size: int):
+    key = TABLES[table]["key"]
+    with engine.connect() as conn:
+        assignments = ", ".join(f"{column} = EXCLUDED.{column}" for column in _columns(conn, table))
+    # Batches follow the live table's primary key, so each one is a range scan of its index. The batch
+    # is locked while it is copied, so a concurrent UPDATE or DELETE waits and is then mirrored on top
+    # of the copy; rows already mirrored are overwritten with the live version instead of skipped
+    last, copied = None, 0
+    while True:
+        where = f"WHERE {key} > :key" if last else ""
+        params = {"key": last} if last else {}
+        with engine.begin() as conn:
+            row = conn.execute(text(
+                f"WITH batch AS (SELECT * FROM {table} {where} ORDER BY {key} LIMIT {int(batch_size)} FOR SHARE), "
+                f"copied AS (INSERT INTO {table}_partitioned SELECT * FROM batch "
+                f"ON CONFLICT (organization_id, {key}) DO UPDATE SET {assignments}) "
+                f"SELECT {key}, (SELECT count(*) FROM batch) FROM batch ORDER BY {key} DESC LIMIT 1"
+            ), params).first()
+        if row is None:
+            break
+        last = row[0]
+        copied += row[1]
+        print(f"{table}: {copied} rows copied", file=sys.stderr)
+    print(f"{table}: backfill complete")
+
+def cutover(table: str):
+    statements = cutover_sql(table)
+    locked = 1 + len(reconcile_sql(table))
+    with engine.begin() as conn:
+        conn.execute(text(statements[0]))
+        removed, added = (conn.execute(text(statement)).rowcount for statement in statements[1:locked])
+        if removed or added:
+            print(f"{table}: reconciled {removed} stale and {added} missing rows", file=sys.stderr)
+        old = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar()
+        new = conn.execute(text(f"SELECT count(*) FROM {table}_partitioned")).scalar()
+        if old != new:
+            raise SystemExit(f"{table} has {old} rows but {table}_partitioned has {new} after reconciling")
+        for statement in statements[locked:]:
+            conn.execute(text(statement))
+    print(f"{table} is now partitioned; the previous table is {table}_unpartitioned")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("step", choices=["prepare", "copy", "cutover", "all"])
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--print-sql", action="store_true")
+    args = parser.parse_args()
+    if args.print_sql:
+        statements = (prepare_sql(args.table, args.partitions) if args.step in ("prepare", "all") else []) + \
+                     (cutover_sql(args.table) if args.step in ("cutover", "all") else [])
+        print(";\n".join(s.strip() for s in statements) + ";")
+        return
+    if args.step in ("prepare", "all"):
+        prepare(args.table, args.partitions)
+    if args.step in ("copy", "all"):
+        copy(args.table, args.batch_size)
+    if args.step in ("cutover", "all"):
+        cutover(args.table)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import pytest
+from contextlib import asynccontextmanager
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from app.database import Base
+# Import every model so relationship() strings resolve when mappers configure
+from app.models import organization, hospital, department, provider, patient, user  # noqa: F401
+
+pytest_plugins = ["query_budget"]
+
+# SQLite stands in for PostgreSQL in tests; store UUIDs as text
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    return "CHAR(36)"
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+    dbapi_connection.isolation_level = None
+
+@asynccontextmanager
+async def sqlite_session(url: str):
+    engine = create_async_engine(url)
+    event.listen(engine.sync_engine, "connect", _configure_sqlite)
+    # Let SQLAlchemy emit BEGIN itself, so SAVEPOINTs nest inside the transaction as they do on PostgreSQL;
+    # the raw cursor keeps it out of statement counts
+    event.listen(engine.sync_engine, "begin", lambda conn: conn.connection.cursor().execute("BEGIN"))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield db
+    finally:
+        await engine.dispose()
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    return f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+
+@pytest.fixture
+def async_session(sqlite_url):
+    return lambda: sqlite_session(sqlite_url)
@@ -0,0 +1,62 @@
+"""pytest plugin failing tests that run more SQL statements than they declare.
+
+    @pytest.mark.query_budget(10)          # the test body; fixture setup is not counted
+    def test_something(): ...
+
+    def test_route(query_budget):
+        with query_budget(4, n_plus_one=3):  # only the block
+            ...
+
+`n_plus_one` additionally fails when one statement fingerprint repeats that many times.
+Statements are counted on every engine, sync or async, through class-level cursor hooks.
+"""
+import contextvars
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.profiling import QueryProfile
+
+_profile: contextvars.ContextVar = contextvars.ContextVar("query_budget_profile", default=None)
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    profile = _profile.get()
+    if profile is not None and not conn.info.get("explaining"):
+        profile.record(statement, 0.0)
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "query_budget(max_queries, n_plus_one=None): fail when the test runs more SQL statements")
+    if not event.contains(Engine, "after_cursor_execute", _record):
+        event.listen(Engine, "after_cursor_execute", _record)
+
+def check(profile: QueryProfile, max_queries: int, n_plus_one=None):
+    problems = []
+    if profile.queries > max_queries:
+        problems.append(f"{profile.queries} SQL statements run, budget is {max_queries}")
+    if n_plus_one:
+        problems += [f"N+1: {item['count']} x {item['fingerprint']}" for item in profile.n_plus_one(n_plus_one)]
+    if problems:
+        statements = "\n".join(f"  {count} x {sql}" for sql, count in profile.counts.most_common())
+        pytest.fail("\n".join(problems) + "\nStatements:\n" + statements, pytrace=False)
+
+@contextmanager
+def budget(max_queries: int, n_plus_one=None):
+    profile = QueryProfile()
+    token = _profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _profile.reset(token)
+    check(profile, max_queries, n_plus_one)
+
+@pytest.fixture
+def query_budget():
+    return budget
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker("query_budget")
+    if marker is None:
+        return (yield)
+    with budget(*marker.args, **marker.kwargs):
+        return (yield)
@@ -0,0 +1,99 @@
+import asyncio
+from uuid import uuid4
+from sqlalchemy import event
+from sqlalchemy.future import select
+from app import database
+from app.crud import bulk, hierarchy_cache
+from app.crud.aio import hospital as crud_hospital, user as crud_user
+from app.models.hospital import Hospital
+from app.models.organization import Organization
+from app.models.user import Role, User
+
+def test_bulk_hospital_writes_in_partial_and_atomic_mode(async_session, query_budget):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            await crud_hospital.get_cached_hospitals(db)
+
+            items = [{"name": f"Hospital {i}", "organization_id": str(org.organization_id)} for i in range(20)]
+            with query_budget(3):
+                report = await bulk.bulk_create(db, crud_hospital.BULK, items + [{"organization_id": str(org.organization_id)}], atomic=False)
+            assert report["succeeded"] == 20 and report["failed"] == 1
+            assert report["results"][20]["error"].startswith("name:")
+            assert report["results"][0]["data"]["name"] == "Hospital 0"
+            assert hierarchy_cache.caches["hospitals"].stats()["size"] == 0
+            ids = [result["id"] for result in report["results"][:20]]
+
+            changes = [{"hospital_id": str(id_), "status": "inactive"} for id_ in ids[:10]] + [{"hospital_id": str(ids[10]), "name": "Renamed"}]
+            with query_budget(6):
+                report = await bulk.bulk_update(db, crud_hospital.BULK, changes + [{"hospital_id": str(uuid4()), "name": "Ghost"}], atomic=False)
+            assert report["succeeded"] == 11 and report["results"][11]["error"] == "Not found"
+            assert report["results"][10]["data"]["name"] == "Renamed"
+
+            # One unknown organization rolls the whole atomic request back
+            report = await bulk.bulk_create(db, crud_hospital.BULK, [items[0], {"name": "Orphan", "organization_id": str(uuid4())}])
+            assert report["failed"] == 1 and report["results"][0]["status"] == "rolled_back"
+            assert bulk.bulk_response(report).status_code == 422
+
+            report = await bulk.bulk_delete(db, crud_hospital.BULK, ids[:5] + [uuid4()])
+            assert report["failed"] == 1 and bulk.bulk_response(report).status_code == 422
+            report = await bulk.bulk_delete(db, crud_hospital.BULK, ids[:5] + [uuid4()], atomic=False)
+            assert report["succeeded"] == 5 and bulk.bulk_response(report).status_code == 207
+
+            rows = (await db.execute(select(Hospital))).scalars().all()
+            assert len(rows) == 15
+            assert sum(1 for row in rows if row.status == "inactive") == 5
+    asyncio.run(scenario())
+
+def test_bulk_statements_are_split_at_the_bind_parameter_limit(async_session, monkeypatch):
+    # Five hospital rows (9 columns) per INSERT
+    monkeypatch.setattr(database, "MAX_BIND_PARAMETERS", 45)
+
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2].split()[0]))
+            items = [{"name": f"Hospital {i}", "organization_id": str(org.organization_id)} for i in range(20)]
+            created = await bulk.bulk_create(db, crud_hospital.BULK, items)
+            changes = [{"hospital_id": str(result["id"]), "status": "inactive"} for result in created["results"]]
+            updated = await bulk.bulk_update(db, crud_hospital.BULK, changes)
+            return created, updated, statements
+    created, updated, statements = asyncio.run(scenario())
+    assert created["succeeded"] == 20 and updated["succeeded"] == 20
+    # (45 - 10) // 2 rows per UPDATE; no per-row SAVEPOINT fallback
+    assert statements.count("INSERT") == 4 and statements.count("UPDATE") == 2 and "SAVEPOINT" not in statements
+
+def test_bulk_users_hash_passwords_report_duplicates_and_stay_in_their_organization(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org, other = Organization(name="Acme Health"), Organization(name="Other")
+            role = Role(name="clinician")
+            db.add_all([org, other, role])
+            await db.commit()
+            # The failed insert rolls the session back, which expires these objects
+            org_id, other_id, role_id = org.organization_id, other.organization_id, role.role_id
+
+            def user(name):
+                return {"username": name, "email": f"{name}@example.com", "first_name": "A", "last_name": "B", "password": "secret",
+                        "organization_id": str(org_id), "role_id": str(role_id)}
+            report = await bulk.bulk_create(db, crud_user.USER_BULK, [user("ann"), user("bob"), user("ann")], atomic=False)
+            assert [result["status"] for result in report["results"]] == ["created", "created", "error"]
+            assert "password" not in report["results"][0]["data"]
+            ann, bob = report["results"][0]["id"], report["results"][1]["id"]
+
+            report = await bulk.bulk_update(db, crud_user.USER_BULK, [{"user_id": str(ann), "status": "inactive"}, {"user_id": str(bob), "first_name": "Bo"}],
+                                            scope=other_id)
+            assert report["failed"] == 2
+            report = await bulk.bulk_update(db, crud_user.USER_BULK, [{"user_id": str(ann), "status": "inactive"}, {"user_id": str(bob), "first_name": "Bo"}],
+                                            scope=org_id)
+            assert report["succeeded"] == 2
+
+            users = {row.username: row for row in (await db.execute(select(User))).scalars().all()}
+            assert users["ann"].password_hash != "secret" and users["ann"].token_version == 1
+            assert users["bob"].first_name == "Bo" and users["bob"].token_version == 0
+    asyncio.run(scenario())
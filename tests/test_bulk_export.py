@@ -0,0 +1,78 @@
+import asyncio
+import gzip
+import json
+import os
+import time
+from uuid import uuid4
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import bulk_export
+from app.models.organization import Organization
+from app.models.patient import Patient
+
+async def _resources(n):
+    for i in range(n):
+        yield {"resourceType": "Patient", "id": str(i), "identifier": [{"value": uuid4().hex}]}
+
+def test_gzip_ndjson_round_trip(monkeypatch):
+    monkeypatch.setattr(bulk_export, "EXPORT_CHUNK_SIZE", 1024)
+
+    async def collect():
+        return [chunk async for chunk in bulk_export.gzip_ndjson(_resources(5000))]
+    chunks = asyncio.run(collect())
+    assert len(chunks) > 1
+    lines = gzip.decompress(b"".join(chunks)).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [str(i) for i in range(5000)]
+
+def test_export_job_writes_tenant_files(async_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_export, "EXPORT_DIR", str(tmp_path / "exports"))
+    monkeypatch.setattr(bulk_export, "EXPORT_FILE_MAX_RESOURCES", 2)
+
+    async def scenario():
+        async with async_session() as db:
+            org, other = Organization(name="Acme Health"), Organization(name="Other")
+            db.add_all([org, other])
+            await db.flush()
+            db.add_all([
+                Patient(organization_id=tenant.organization_id, first_name=f"P{i}", last_name="Doe", date_of_birth=date(1990, 1, 1), gender="female")
+                for tenant, i in [(org, 0), (org, 1), (org, 2), (other, 3)]
+            ])
+            await db.commit()
+
+            job = bulk_export.ExportJob(org.organization_id, "http://test/Patient/$export")
+            await bulk_export.run_export_job(job, lambda: AsyncSession(db.bind))
+            return job
+    job = asyncio.run(scenario())
+    assert job.status == "completed"
+    assert job.files == [("Patient.1.ndjson.gz", 2), ("Patient.2.ndjson.gz", 1)]
+    names = []
+    for name, _ in job.files:
+        with gzip.open(os.path.join(job.directory, name)) as f:
+            names += [json.loads(line)["name"][0]["given"][0] for line in f]
+    assert sorted(names) == ["P0", "P1", "P2"]
+    manifest = job.manifest("http://test/")
+    assert [o["url"] for o in manifest["output"]] == [f"http://test/bulkfiles/{job.job_id}/Patient.1.ndjson.gz", f"http://test/bulkfiles/{job.job_id}/Patient.2.ndjson.gz"]
+
+def test_job_state_is_shared_through_the_export_directory_and_expires(async_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_export, "EXPORT_DIR", str(tmp_path / "exports"))
+
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.flush()
+            db.add(Patient(organization_id=org.organization_id, first_name="Ann", last_name="Doe", date_of_birth=date(1990, 1, 1)))
+            await db.commit()
+            job = bulk_export.start_export_job(bulk_export.ExportJob(org.organization_id, "http://test/Patient/$export"), lambda: AsyncSession(db.bind))
+            await job.task
+            return job
+    job = asyncio.run(scenario())
+    # Another worker knows the job only from its state file
+    bulk_export.EXPORT_JOBS.clear()
+    seen = bulk_export.get_export_job(job.job_id)
+    assert (seen.status, seen.exported, seen.files, seen.organization_id) == ("completed", 1, [("Patient.1.ndjson.gz", 1)], job.organization_id)
+    assert bulk_export.get_export_job("../etc") is None and bulk_export.get_export_job(uuid4().hex) is None
+
+    assert bulk_export.expire_export_jobs() == 0
+    assert bulk_export.expire_export_jobs(now=time.time() + bulk_export.EXPORT_RETENTION_SECONDS + 1) == 1
+    assert not os.path.exists(job.directory) and bulk_export.get_export_job(job.job_id) is None
@@ -0,0 +1,81 @@
+import asyncio
+import json
+from uuid import UUID, uuid4
+from fastapi import HTTPException
+from sqlalchemy import event
+from app import bulk_import, database
+from app.crud.aio import patient as crud_patient
+from app.models.organization import Organization
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def test_iter_ndjson_handles_lines_split_across_chunks():
+    body = b'{"a": 1}\n{"b": 2}\n\n{"c": 3}'
+
+    async def collect():
+        return [item async for item in bulk_import.iter_ndjson(_chunks(body, 3))]
+    assert asyncio.run(collect()) == [(1, '{"a": 1}'), (2, '{"b": 2}'), (3, ""), (4, '{"c": 3}')]
+
+def test_iter_bundle_stream_yields_entries_split_across_chunks():
+    body = json.dumps({"resourceType": "Bundle", "type": "collection", "total": 12345,
+                       "entry": [{"resource": {"name": "Zoë"}}, {"fullUrl": "x"}, 7, {"resource": {"n": 1.5}}],
+                       "meta": {"tag": []}}).encode()
+
+    async def collect(body):
+        return [item async for item in bulk_import.iter_bundle_stream(_chunks(body, 3))]
+    assert asyncio.run(collect(body)) == [(1, {"name": "Zoë"}), (2, None), (3, None), (4, {"n": 1.5})]
+    assert asyncio.run(collect(b'{"resourceType": "Bundle", "entry": []}')) == []
+    for bad in (b'{"resourceType": "Patient", "entry": [{}]}', b'{"resourceType": "Bundle", "entry": [{"resource": {}}', b"[]"):
+        try:
+            asyncio.run(collect(bad))
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError(bad)
+
+def test_import_reports_bad_lines_and_keeps_going(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            org_id = str(org.organization_id)
+            lines = [
+                json.dumps({"first_name": "Ann", "last_name": "Lee", "date_of_birth": "1980-02-03", "organization_id": org_id}),
+                "{not json",
+                json.dumps({"resourceType": "Patient", "name": [{"family": "Doe", "given": ["John"]}],
+                            "gender": "male", "birthDate": "1990-01-01", "identifier": [{"value": org_id}]}),
+                json.dumps({"first_name": "NoBirthDate", "last_name": "X", "organization_id": org_id}),
+                # Unknown organization: passes validation but violates the foreign key
+                json.dumps({"first_name": "Orphan", "last_name": "Y", "date_of_birth": "2000-01-01", "organization_id": str(uuid4())}),
+                json.dumps({"first_name": "Bo", "last_name": "Kim", "date_of_birth": "1975-07-08", "organization_id": org_id}),
+            ]
+            report = await bulk_import.import_patients(db, enumerate(lines, start=1), batch_size=2)
+            assert report["processed"] == 6
+            assert report["created"] == 3
+            assert [e["line"] for e in report["errors"]] == [2, 4, 5]
+            names = sorted(p.first_name for p in await crud_patient.get_patients(db, UUID(org_id)))
+            assert names == ["Ann", "Bo", "John"]
+    asyncio.run(scenario())
+
+def test_large_batches_are_split_at_the_bind_parameter_limit(async_session, monkeypatch):
+    # Two patient rows (13 columns) or six blocking-key rows (4 columns) per INSERT
+    monkeypatch.setattr(database, "MAX_BIND_PARAMETERS", 26)
+
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2].split()[0]))
+            lines = [json.dumps({"first_name": f"P{i}", "last_name": "Lee", "date_of_birth": f"1980-02-{i + 1:02d}",
+                                 "organization_id": str(org.organization_id)}) for i in range(5)]
+            report = await bulk_import.import_patients(db, enumerate(lines, start=1), batch_size=5)
+            return report, statements
+    report, statements = asyncio.run(scenario())
+    assert report["created"] == 5 and "SAVEPOINT" not in statements
+    # Three INSERTs for the patients and two for their ten blocking keys
+    assert statements.count("INSERT") == 5
@@ -0,0 +1,58 @@
+import asyncio
+from datetime import date
+from app.crud.aio import organization as crud_organization
+from app.crud.aio import patient as crud_patient
+from app.crud.aio import user as crud_user
+from app.schemas.organization import OrganizationCreate
+from app.schemas.patient import PatientCreate, PatientUpdate
+from app.schemas.user import RoleCreate, UserCreate
+
+def test_patient_crud(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = await crud_organization.create_organization(db, OrganizationCreate(name="Acme Health"))
+            created = await crud_patient.create_patient(db, PatientCreate(
+                first_name="John", last_name="Doe", date_of_birth=date(1990, 1, 1), organization_id=org.organization_id
+            ))
+            org_id = org.organization_id
+            assert (await crud_patient.get_patient(db, created.patient_id, org_id)).last_name == "Doe"
+            assert len(await crud_patient.get_patients(db, org_id)) == 1
+
+            updated = await crud_patient.update_patient(db, created.patient_id, org_id, PatientUpdate(last_name="Smith"))
+            assert updated.last_name == "Smith"
+            assert updated.first_name == "John"
+
+            assert await crud_patient.delete_patient(db, created.patient_id, org_id) is not None
+            assert await crud_patient.get_patient(db, created.patient_id, org_id) is None
+    asyncio.run(scenario())
+
+def test_user_role_is_eager_loaded(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = await crud_organization.create_organization(db, OrganizationCreate(name="Acme Health"))
+            role = await crud_user.create_role(db, RoleCreate(name="Nurse"))
+            await crud_user.create_user(db, UserCreate(
+                username="jdoe", email="jdoe@example.com", first_name="Jane", last_name="Doe",
+                password="secret", organization_id=org.organization_id, role_id=role.role_id
+            ))
+            db.expunge_all()
+            db_user = await crud_user.get_user_by_username(db, "jdoe")
+            # Accessing an unloaded relationship on an AsyncSession would raise
+            assert db_user.role.name == "Nurse"
+            assert [u.role.name for u in await crud_user.get_users(db, org.organization_id)] == ["Nurse"]
+    asyncio.run(scenario())
+
+def test_queries_are_tenant_scoped(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = await crud_organization.create_organization(db, OrganizationCreate(name="Acme Health"))
+            other = await crud_organization.create_organization(db, OrganizationCreate(name="Other"))
+            created = await crud_patient.create_patient(db, PatientCreate(
+                first_name="John", last_name="Doe", date_of_birth=date(1990, 1, 1), organization_id=org.organization_id
+            ))
+            assert await crud_patient.get_patient(db, created.patient_id, other.organization_id) is None
+            assert await crud_patient.get_patients(db, other.organization_id) == []
+            assert await crud_patient.update_patient(db, created.patient_id, other.organization_id, PatientUpdate(last_name="Smith")) is None
+            assert await crud_patient.delete_patient(db, created.patient_id, other.organization_id) is None
+            assert (await crud_patient.get_patient(db, created.patient_id, org.organization_id)).last_name == "Doe"
+    asyncio.run(scenario())
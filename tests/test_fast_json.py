@@ -0,0 +1,65 @@
+import asyncio
+from datetime import date, datetime
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from app import fast_json
+from app.crud.aio import patient as crud_patient, user as crud_user
+from app.fieldsets import sparse_response
+from app.models.organization import Organization
+from app.models.patient import Patient as PatientModel
+from app.models.user import Role, User as UserModel
+from app.pagination import NEXT_CURSOR_HEADER, set_next_cursor
+from app.schemas.patient import Patient
+from app.schemas.user import User
+
+def orm_body(rows, schema):
+    return JSONResponse(content=jsonable_encoder([schema.from_orm(row) for row in rows])).body
+
+async def streamed_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+def test_fast_path_is_byte_identical_to_orm_serialization(async_session, monkeypatch):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            role = Role(name="clinician", description="Médecin \"généraliste\"\n")
+            db.add_all([org, role])
+            await db.commit()
+            created = datetime(2024, 1, 2, 3, 4, 5, 123456)
+            db.add_all([PatientModel(organization_id=org.organization_id, first_name=f"Zoë {i}", last_name="Ørsted", date_of_birth=date(1980, 1, 1),
+                                     email=f"Zoe.{i}@Example.COM" if i % 2 else None, address="1 Rue d'Été\t/", created_at=created.replace(second=i))
+                        for i in range(7)])
+            db.add_all([UserModel(organization_id=org.organization_id, role_id=role.role_id, username=f"user{i}", password_hash="x",
+                                  email=f"User{i}@Example.org", first_name="José", last_name="Nuñez") for i in range(3)])
+            await db.commit()
+
+            patients = await crud_patient.get_patients(db, org.organization_id, limit=5)
+            patient_rows = await crud_patient.get_patient_rows(db, org.organization_id, limit=5)
+            users = await crud_user.get_users(db, org.organization_id)
+            user_rows = await crud_user.get_user_rows(db, org.organization_id)
+            sparse = await crud_patient.get_patients(db, org.organization_id, fields=("first_name", "email"))
+            sparse_rows = await crud_patient.get_patient_rows(db, org.organization_id, fields=("first_name", "email"))
+            all_rows = await crud_patient.get_patient_rows(db, org.organization_id)
+            all_patients = await crud_patient.get_patients(db, org.organization_id)
+
+            orm_response, fast_response = Response(), Response()
+            set_next_cursor(orm_response, patients, crud_patient.KEYSET, 5)
+            set_next_cursor(fast_response, patient_rows, crud_patient.KEYSET, 5)
+            fast = fast_json.fast_json_response(patient_rows, Patient, fast_response)
+            assert fast.body == orm_body(patients, Patient)
+            assert fast.headers[NEXT_CURSOR_HEADER] == orm_response.headers[NEXT_CURSOR_HEADER]
+            assert fast.headers["content-type"] == "application/json"
+
+            assert fast_json.fast_json_response(user_rows, User, Response()).body == orm_body(users, User)
+            assert b"password_hash" not in fast_json.fast_json_response(user_rows, User, Response()).body
+            assert (fast_json.fast_json_response(sparse_rows, Patient, Response(), ("first_name", "email")).body
+                    == sparse_response(sparse, Patient, ("first_name", "email"), Response()).body)
+
+            monkeypatch.setattr(fast_json, "FAST_JSON_STREAM_ROWS", 3)
+            monkeypatch.setattr(fast_json, "FAST_JSON_CHUNK_ROWS", 2)
+            streamed = fast_json.fast_json_response(all_rows, Patient, Response())
+            assert isinstance(streamed, StreamingResponse)
+            assert await streamed_body(streamed) == orm_body(all_patients, Patient)
+            assert fast_json.fast_json_response([], Patient, Response()).body == b"[]"
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from app.crud.aio import patient as crud_patient
+from app.fhir_search import parse_date, patient_search_filters, search_count
+from app.models.organization import Organization
+from app.models.patient import Patient
+
+def test_parse_date_precision():
+    assert parse_date("1990") == ("eq", date(1990, 1, 1), date(1990, 12, 31))
+    assert parse_date("ge1990-02") == ("ge", date(1990, 2, 1), date(1990, 2, 28))
+    assert parse_date("lt1990-02-03") == ("lt", date(1990, 2, 3), date(1990, 2, 3))
+    with pytest.raises(HTTPException):
+        parse_date("1990-13")
+
+def test_search_count_bounds():
+    assert search_count(None) == 50
+    assert search_count("5000") == 1000
+
+def test_search_patients(async_session):
+    people = [("John", "Smith", date(1990, 1, 1), "male"), ("Jane", "Smithers", date(1985, 6, 1), "female"),
+              ("Joan", "Blacksmith", date(1990, 7, 4), "female"), ("Mark", "Doe", date(2001, 3, 3), "male")]
+
+    async def scenario():
+        async with async_session() as db:
+            org, other = Organization(name="Acme Health"), Organization(name="Other")
+            db.add_all([org, other])
+            await db.flush()
+            db.add_all([Patient(organization_id=org.organization_id, first_name=f, last_name=l, date_of_birth=d, gender=g) for f, l, d, g in people])
+            db.add(Patient(organization_id=other.organization_id, first_name="John", last_name="Smith", date_of_birth=date(1990, 1, 1), gender="male"))
+            await db.commit()
+
+            async def names(*params, limit=50, after=None):
+                rows = await crud_patient.search_patients(db, org.organization_id, patient_search_filters(list(params)), limit=limit, after=after)
+                return sorted(p.first_name for p in rows)
+            return {
+                "family": await names(("family", "SMITH")),
+                "contains": await names(("family:contains", "smith")),
+                "exact": await names(("family:exact", "Smith")),
+                "year_and_gender": await names(("birthdate", "1990"), ("gender", "female")),
+                "range": await names(("birthdate", "ge1986"), ("birthdate", "lt2000")),
+                "any_given": await names(("given", "ma,jan")),
+                "bad_id": await names(("_id", "not-a-uuid")),
+            }
+    results = asyncio.run(scenario())
+    assert results["family"] == ["Jane", "John"]
+    assert results["contains"] == ["Jane", "Joan", "John"]
+    assert results["exact"] == ["John"]
+    assert results["year_and_gender"] == ["Joan"]
+    assert results["range"] == ["Joan", "John"]
+    assert results["any_given"] == ["Jane", "Mark"]
+    assert results["bad_id"] == []
@@ -0,0 +1,47 @@
+import asyncio
+import json
+from datetime import date
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import event
+from app.crud.aio import patient as crud_patient
+from app.fieldsets import parse_fields, sparse_model, sparse_response
+from app.models.organization import Organization
+from app.pagination import NEXT_CURSOR_HEADER, set_next_cursor
+from app.schemas.patient import Patient, PatientCreate
+
+def test_parse_fields_orders_selection_and_rejects_unknown_fields():
+    assert parse_fields(None, Patient) is None and parse_fields(" , ", Patient) is None
+    assert parse_fields("date_of_birth, first_name,first_name", Patient) == ("first_name", "date_of_birth")
+    with pytest.raises(HTTPException) as error:
+        parse_fields("first_name,password_hash", Patient)
+    assert error.value.status_code == 400 and "password_hash" in error.value.detail
+    assert sparse_model(Patient, ("first_name", "status")) is sparse_model(Patient, ("first_name", "status"))
+
+def test_sparse_page_selects_and_serializes_only_the_requested_columns(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            for i in range(3):
+                await crud_patient.create_patient(db, PatientCreate(first_name=f"Ann{i}", last_name="Lee", date_of_birth=date(1980, 1, 1),
+                                                                    email=f"ann{i}@example.com", organization_id=org.organization_id))
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+            fields = parse_fields("first_name,date_of_birth", Patient)
+            page = await crud_patient.get_patients(db, org.organization_id, limit=2, fields=fields)
+            one = await crud_patient.get_patient(db, page[0].patient_id, org.organization_id, fields=("status",))
+            return page, one, statements, fields
+    page, one, statements, fields = asyncio.run(scenario())
+    assert "email" not in statements[0] and "address" not in statements[0] and "first_name" in statements[0]
+    assert "first_name" not in statements[1] and "version" in statements[1]
+
+    response = Response()
+    set_next_cursor(response, page, crud_patient.KEYSET, 2)
+    sparse = sparse_response(page, Patient, fields, response)
+    body = json.loads(sparse.body)
+    assert [sorted(row) for row in body] == [["date_of_birth", "first_name"]] * 2
+    assert [row["first_name"] for row in body] == [patient.first_name for patient in page]
+    assert sparse.headers[NEXT_CURSOR_HEADER] == response.headers[NEXT_CURSOR_HEADER]
+    assert json.loads(sparse_response(one, Patient, ("status",), Response()).body) == {"status": "active"}
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+from email.utils import format_datetime
+from fastapi import Response
+from sqlalchemy import event
+from starlette.requests import Request
+from app.conditional import conditional
+from app.crud import hierarchy_cache
+from app.crud.aio import hospital as crud_hospital
+from app.models.organization import Organization
+from app.schemas.hospital import Hospital, HospitalCreate, HospitalUpdate
+
+def make_request(**headers) -> Request:
+    return Request({"type": "http", "method": "GET", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+def test_hospital_reads_are_cached_until_written(async_session):
+    for cache in hierarchy_cache.caches.values():
+        cache.clear()
+
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            hospital = await crud_hospital.create_hospital(db, HospitalCreate(name="General", organization_id=org.organization_id))
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+            first = await crud_hospital.get_cached_hospital(db, hospital.hospital_id)
+            listed = await crud_hospital.get_cached_hospitals(db)
+            queries = len(statements)
+            assert await crud_hospital.get_cached_hospital(db, hospital.hospital_id) is first
+            assert await crud_hospital.get_cached_hospitals(db) is listed
+            assert len(statements) == queries
+            assert [h.name for h in listed.value] == ["General"]
+
+            await crud_hospital.update_hospital(db, hospital.hospital_id, HospitalUpdate(name="St. Mary"))
+            updated = await crud_hospital.get_cached_hospital(db, hospital.hospital_id)
+            assert updated.value.name == "St. Mary"
+            assert (await crud_hospital.get_cached_hospitals(db)).value[0].name == "St. Mary"
+            return first, updated
+    first, updated = asyncio.run(scenario())
+
+    response = Response()
+    assert conditional(make_request(), response, updated) is updated.value
+    assert response.headers["etag"] == updated.etag
+    assert conditional(make_request(if_none_match=updated.etag), Response(), updated).status_code == 304
+    assert conditional(make_request(if_none_match=first.etag), Response(), updated) is updated.value
+    since = format_datetime(updated.last_modified, usegmt=True)
+    assert conditional(make_request(if_modified_since=since), Response(), updated).status_code == 304
+    assert conditional(make_request(if_modified_since=since), Response(), updated, use_last_modified=False) is updated.value
+
+def test_list_etag_changes_when_a_row_is_deleted():
+    rows = [Hospital(hospital_id=uuid4(), organization_id=uuid4(), name=name, created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1))
+            for name in ("General", "St. Mary")]
+    both = hierarchy_cache.snapshot(rows, Hospital)
+    one = hierarchy_cache.snapshot(rows[:1], Hospital)
+    assert both.etag != one.etag and both.last_modified == one.last_modified
+
+def test_deletes_invalidate_the_resources_their_cascade_reaches():
+    for resource, cache in hierarchy_cache.caches.items():
+        cache.set("key", resource)
+    hierarchy_cache.invalidate("hospitals")
+    assert hierarchy_cache.caches["departments"].get("key") == "departments"
+    hierarchy_cache.invalidate("hospitals", cascade=True)
+    assert {resource: cache.get("key") for resource, cache in hierarchy_cache.caches.items()} == {
+        "organizations": "organizations", "hospitals": None, "departments": None, "providers": None}
@@ -1,8 +1,9 @@
 
+import json
 import pytest
 from datetime import date
 from uuid import UUID
-from app.interoperability import patient_to_fhir, fhir_to_patient, patient_to_hl7, hl7_to_patient
+from app.interoperability import patient_to_fhir, patients_to_bundle, fhir_to_patient, patient_to_hl7, hl7_to_patient
 from app.models.patient import Patient
 from app.schemas.patient import PatientCreate
 from fastapi import HTTPException
@@ -70,3 +71,14 @@ def test_hl7_to_patient_invalid_message():
     with pytest.raises(HTTPException) as excinfo:
         hl7_to_patient(invalid_hl7_message)
     assert "Invalid HL7 message: Missing required field" in str(excinfo.value)
+
+def test_patient_to_fhir_fast_path_matches_strict(sample_patient):
+    fast = patient_to_fhir(sample_patient, strict=False)
+    assert json.dumps(fast) == json.dumps(patient_to_fhir(sample_patient, strict=True))
+    sample_patient.gender = None
+    assert json.dumps(patient_to_fhir(sample_patient, strict=False)) == json.dumps(patient_to_fhir(sample_patient, strict=True))
+
+def test_patients_to_bundle(sample_patient):
+    bundle = patients_to_bundle([sample_patient], total=1)
+    assert bundle["resourceType"] == "Bundle" and bundle["type"] == "searchset" and bundle["total"] == 1
+    assert bundle["entry"][0]["resource"] == patient_to_fhir(sample_patient)
@@ -0,0 +1,75 @@
+import asyncio
+import random
+from contextlib import asynccontextmanager
+import pytest
+from app.mllp import MLLPConnectionPool, MLLPError, build_ack, control_id, frame, parse_ack, read_frame
+
+def _message(message_id: str) -> str:
+    return f"MSH|^~\\&|INFOCTOR|HOSPITAL|HL7RECV|ANYWHERE|20230101000000||ADT^A01|{message_id}|P|2.3\rPID|||1||Doe^John"
+
+@asynccontextmanager
+async def mllp_echo_server(shuffle=False, close_after=None):
+    """Local MLLP peer that ACKs every message, optionally out of order or dropping connections."""
+    stats = {"connections": 0, "messages": 0}
+
+    async def handle(reader, writer):
+        stats["connections"] += 1
+        handled = 0
+        try:
+            while True:
+                message = await read_frame(reader)
+                stats["messages"] += 1
+                handled += 1
+                if close_after is not None and stats["connections"] == 1 and handled > close_after:
+                    break
+
+                async def reply(message=message):
+                    if shuffle:
+                        await asyncio.sleep(random.random() / 100)
+                    writer.write(frame(build_ack(message)))
+                asyncio.get_event_loop().create_task(reply())
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    try:
+        yield server.sockets[0].getsockname()[1], stats
+    finally:
+        server.close()
+        await server.wait_closed()
+
+def test_ack_helpers():
+    ack = build_ack(_message("ABC123"))
+    assert parse_ack(ack) == ("AA", "ABC123")
+    assert control_id(ack) != "ABC123"
+    with pytest.raises(MLLPError):
+        control_id("PID|||1")
+
+def test_pipelined_sends_share_one_connection_and_correlate_acks():
+    async def scenario():
+        async with mllp_echo_server(shuffle=True) as (port, stats):
+            pool = MLLPConnectionPool("127.0.0.1", port, size=2, max_in_flight=64)
+            ids = [f"MSG{i:05d}" for i in range(50)]
+            acks = await pool.send_many([_message(i) for i in ids])
+            await pool.close()
+            return ids, acks, stats
+    ids, acks, stats = asyncio.run(scenario())
+    assert [parse_ack(ack) for ack in acks] == [("AA", i) for i in ids]
+    assert stats["connections"] == 1
+
+def test_pool_reconnects_after_connection_loss():
+    async def scenario():
+        async with mllp_echo_server(close_after=1) as (port, stats):
+            pool = MLLPConnectionPool("127.0.0.1", port, size=1)
+            first = await pool.send(_message("FIRST"))
+            # The server drops the connection instead of acknowledging this one
+            second = await pool.send(_message("SECOND"))
+            await pool.close()
+            return first, second, stats, pool.stats()
+    first, second, stats, pool_stats = asyncio.run(scenario())
+    assert parse_ack(first)[1] == "FIRST"
+    assert parse_ack(second)[1] == "SECOND"
+    assert stats["connections"] == 2
+    assert pool_stats["reconnects"] == 1
@@ -0,0 +1,117 @@
+import asyncio
+from datetime import date, timedelta
+from uuid import uuid4
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from fastapi import HTTPException
+from app.mllp import MLLPConnectionPool, new_control_id, parse_ack
+from app.crud.aio import patient as crud_patient
+from app.mllp_listener import InboundError, MLLPListener, PatientBatchWriter, parse_adt
+from app.models.organization import Organization
+from app.models.patient import Patient, PatientBlockingKey
+from app.schemas.patient import PatientUpdate
+import pytest
+
+def _adt(event, organization_id, first="John", patient_id="", birth=date(1990, 1, 1)):
+    return (
+        f"MSH|^~\\&|UPSTREAM|HOSP|INFOCTOR|HOSPITAL|20230101000000||ADT^{event}|{new_control_id()}|P|2.3\r"
+        f"PID||{patient_id}|{organization_id}||Doe^{first}||{birth}|male"
+    )
+
+def test_parse_adt_maps_events():
+    org = uuid4()
+    insert = parse_adt(_adt("A01", org))
+    assert insert.kind == "insert" and insert.values["first_name"] == "John" and insert.values["organization_id"] == org
+    patient_id = uuid4()
+    update = parse_adt(_adt("A08", org, patient_id=patient_id))
+    assert update.kind == "update" and update.patient_id == patient_id
+    with pytest.raises(InboundError, match="PID-2"):
+        parse_adt(_adt("A08", org))
+    with pytest.raises(InboundError, match="Unsupported"):
+        parse_adt(_adt("A03", org))
+
+def test_listener_batches_and_acks(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.flush()
+            existing = Patient(organization_id=org.organization_id, first_name="Old", last_name="Doe", date_of_birth=date(1990, 1, 1), gender="male")
+            db.add(existing)
+            await db.commit()
+
+            listener = await MLLPListener(lambda: AsyncSession(db.bind), host="127.0.0.1", port=0, batch_size=50, queue_size=10).start()
+            pool = MLLPConnectionPool("127.0.0.1", listener.sockets[0].getsockname()[1], size=2, max_in_flight=32)
+            try:
+                messages = [_adt("A01", org.organization_id, first=f"P{i}", birth=date(1950, 1, 1) + timedelta(days=i)) for i in range(200)]
+                messages.append(_adt("A08", org.organization_id, first="New", patient_id=existing.patient_id))
+                messages.append(_adt("A08", org.organization_id, patient_id=uuid4()))
+                messages.append(_adt("A01", uuid4()))
+                # A re-sent registration is acknowledged without creating a second patient
+                messages.append(_adt("A01", org.organization_id, first="P7", birth=date(1950, 1, 8)))
+                acks = await pool.send_many(messages)
+            finally:
+                await pool.close()
+                await listener.close()
+            codes = [parse_ack(ack)[0] for ack in acks]
+            names = (await db.execute(select(Patient.first_name).where(Patient.organization_id == org.organization_id))).scalars().all()
+            return codes, names, listener.stats()
+    codes, names, stats = asyncio.run(scenario())
+    assert codes[:201] == ["AA"] * 201
+    # Unknown patient for A08, unknown organization violates the foreign key
+    assert codes[201:203] == ["AE", "AE"]
+    assert codes[203] == "AA"
+    assert sorted(names) == sorted([f"P{i}" for i in range(200)] + ["New"])
+    assert stats["accepted"] == 202 and stats["rejected"] == 2
+    assert stats["writer"]["duplicates"] == 1
+    assert stats["writer"]["batches"] < 200
+
+def test_a08_update_bumps_the_version_so_stale_if_match_is_rejected(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.flush()
+            existing = Patient(organization_id=org.organization_id, first_name="Old", last_name="Doe", date_of_birth=date(1990, 1, 1))
+            db.add(existing)
+            await db.commit()
+            org_id, patient_id = org.organization_id, existing.patient_id
+
+            writer = PatientBatchWriter(lambda: AsyncSession(db.bind))
+            batch = [(parse_adt(_adt("A08", org_id, first="Feed", patient_id=patient_id)), None)]
+            assert await writer._write(batch) == [None]
+
+            # A client still holding the ETag read before the feed's update must not overwrite it
+            with pytest.raises(HTTPException) as conflict:
+                await crud_patient.update_patient(db, patient_id, org_id, PatientUpdate(phone="555-0100"), [1])
+        async with AsyncSession(db.bind) as fresh:
+            current = await crud_patient.get_patient(fresh, patient_id, org_id)
+            return conflict.value, current.first_name, current.version
+    conflict, first_name, version = asyncio.run(scenario())
+    assert conflict.status_code == 412 and conflict.headers["ETag"] == '"2"'
+    assert (first_name, version) == ("Feed", 2)
+
+def test_a08_only_updates_the_fields_the_message_carries(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.flush()
+            existing = Patient(organization_id=org.organization_id, first_name="Old", last_name="Doe", date_of_birth=date(1990, 1, 1),
+                               phone="555-0100", email="jane@example.com", address="1 Main St", status="inactive")
+            db.add(existing)
+            await db.commit()
+            org_id, patient_id = org.organization_id, existing.patient_id
+
+            operation = parse_adt(_adt("A08", org_id, first="Feed", patient_id=patient_id))
+            assert "phone" not in operation.values and "status" not in operation.values
+            writer = PatientBatchWriter(lambda: AsyncSession(db.bind))
+            assert await writer._write([(operation, None)]) == [None]
+        async with AsyncSession(db.bind) as fresh:
+            current = await crud_patient.get_patient(fresh, patient_id, org_id)
+            keys = (await fresh.execute(select(PatientBlockingKey.key_type).where(PatientBlockingKey.patient_id == patient_id))).scalars().all()
+            return current, keys
+    current, keys = asyncio.run(scenario())
+    assert current.first_name == "Feed"
+    assert (current.phone, current.email, current.address, current.status) == ("555-0100", "jane@example.com", "1 Main St", "inactive")
+    assert {"phone", "email"} <= set(keys)
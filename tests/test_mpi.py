@@ -0,0 +1,79 @@
+import asyncio
+from datetime import date, timedelta
+from uuid import uuid4
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event, func
+from sqlalchemy.future import select
+from app import database, mpi
+from app.crud.aio import patient as crud_patient
+from app.models.organization import Organization
+from app.models.patient import Patient, PatientBlockingKey
+from app.schemas.patient import PatientCreate, PatientUpdate
+
+@pytest.mark.parametrize("name, code", [("Robert", "R163"), ("Rupert", "R163"), ("Ashcraft", "A261"), ("Tymczak", "T522"), ("Pfister", "P236"), ("Lee", "L000")])
+def test_soundex(name, code):
+    assert mpi.soundex(name) == code
+
+def test_blocking_keys_and_score():
+    a = {"first_name": "Jon", "last_name": "Smyth", "date_of_birth": date(1980, 5, 17), "phone": "+1 (555) 123-4567", "gender": "male"}
+    b = {"first_name": "Jonathan", "last_name": "Smith", "date_of_birth": "1980-05-17", "phone": "555.123.4567", "gender": "male"}
+    assert set(mpi.blocking_keys(a)) & set(mpi.blocking_keys(b)) >= {("sdx_last_dob", "S530|1980-05-17"), ("phone", "5551234567")}
+    assert mpi.score(a, b) >= mpi.MPI_REVIEW_THRESHOLD
+    assert mpi.score(a, {**b, "gender": "female", "first_name": "Mary"}) < mpi.MPI_REVIEW_THRESHOLD
+
+def test_duplicate_detection(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            create = PatientCreate(organization_id=org.organization_id, first_name="John", last_name="Doe", date_of_birth=date(1990, 1, 1), gender="male", phone="555-000-1111")
+            john = await crud_patient.create_patient(db, create)
+            with pytest.raises(HTTPException) as excinfo:
+                await mpi.check_duplicates(db, create.copy(update={"last_name": "DOE"}))
+            conflict = excinfo.value
+            await mpi.check_duplicates(db, create, force=True)
+            await mpi.check_duplicates(db, create.copy(update={"first_name": "Jane", "gender": "female", "phone": None}))
+
+            # Keys follow updates
+            await crud_patient.update_patient(db, john.patient_id, org.organization_id, PatientUpdate(last_name="Roe"))
+            keys = (await db.execute(select(PatientBlockingKey.key_value).where(PatientBlockingKey.key_type == "sdx_last_dob"))).scalars().all()
+
+            db.add(Patient(organization_id=org.organization_id, first_name="Jon", last_name="Roe", date_of_birth=date(1990, 1, 1), gender="male"))
+            await db.commit()
+            indexed = await mpi.rebuild_keys(db, org.organization_id)
+            duplicates = await mpi.find_duplicates(db, org.organization_id)
+            return conflict, keys, indexed, duplicates, john
+    conflict, keys, indexed, duplicates, john = asyncio.run(scenario())
+    assert conflict.status_code == 409 and conflict.detail["candidates"][0]["last_name"] == "Doe"
+    assert keys == ["R000|1990-01-01"]
+    assert indexed == 2
+    assert len(duplicates) == 1 and str(john.patient_id) in (duplicates[0]["patient_id"], duplicates[0]["duplicate_of"])
+
+def test_index_writes_stay_under_the_bind_parameter_limit(async_session, monkeypatch):
+    # Ten blocking-key rows (4 columns) per INSERT
+    monkeypatch.setattr(database, "MAX_BIND_PARAMETERS", 40)
+
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            records = [{"patient_id": uuid4(), "organization_id": org.organization_id, "first_name": f"Ann{i}", "last_name": "Lee",
+                        "date_of_birth": date(1950, 1, 1) + timedelta(days=i), "phone": f"555{i:07d}", "email": f"ann{i}@example.com"}
+                       for i in range(10)]
+            db.add_all([Patient(**record) for record in records])
+            await db.flush()
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+            await mpi.index_patients(db, records)
+            await db.commit()
+            indexed = await mpi.rebuild_keys(db, org.organization_id)
+            keys = await db.scalar(select(func.count()).select_from(PatientBlockingKey))
+            inserts = [sql for sql in statements if sql.startswith("INSERT INTO patient_blocking_keys")]
+            return indexed, keys, inserts
+    indexed, keys, inserts = asyncio.run(scenario())
+    assert indexed == 10 and keys >= 40
+    # Both index_patients and rebuild_keys split their keys over several statements
+    assert all(sql.count("?") <= 40 for sql in inserts) and len(inserts) >= 2 * (keys // 10)
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, update
+from starlette.requests import Request
+from app.conditional import if_match_versions
+from app.crud import hierarchy_cache
+from app.crud.aio import hospital as crud_hospital, patient as crud_patient
+from app.crud.versioning import delete_versioned
+from app.models.organization import Organization
+from app.models.patient import Patient as PatientModel
+from app.schemas.hospital import HospitalCreate, HospitalUpdate
+from app.schemas.patient import PatientCreate, PatientUpdate
+
+def make_request(if_match: str) -> Request:
+    return Request({"type": "http", "method": "PUT", "headers": [(b"if-match", if_match.encode())]})
+
+def test_if_match_versions():
+    assert if_match_versions(Request({"type": "http", "method": "PUT", "headers": []})) is None
+    assert if_match_versions(make_request("*")) is None
+    assert if_match_versions(make_request('"3", "4"')) == [3, 4]
+    # Weak and foreign tags can never match
+    assert if_match_versions(make_request('W/"3", "abc"')) == []
+
+def test_stale_version_is_rejected_instead_of_overwriting(async_session, query_budget):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            org_id = org.organization_id
+            patient = await crud_patient.create_patient(db, PatientCreate(first_name="Ann", last_name="Lee", date_of_birth=date(1980, 1, 1),
+                                                                          organization_id=org_id))
+            patient_id = patient.patient_id
+            assert patient.version == 1
+
+            updated = await crud_patient.update_patient(db, patient_id, org_id, PatientUpdate(phone="555-0100"), [1])
+            assert (updated.phone, updated.version) == ("555-0100", 2)
+
+            # A second nurse still holding version 1 gets 412 and the current ETag
+            with pytest.raises(HTTPException) as conflict:
+                await crud_patient.update_patient(db, patient_id, org_id, PatientUpdate(phone="555-0199"), [1])
+            assert conflict.value.status_code == 412 and conflict.value.headers["ETag"] == '"2"'
+            await db.rollback()
+            assert (await crud_patient.get_patient(db, patient_id, org_id)).phone == "555-0100"
+
+            assert await crud_patient.update_patient(db, org_id, org_id, PatientUpdate(phone="1"), [1]) is None
+
+            hospital = await crud_hospital.create_hospital(db, HospitalCreate(name="General", organization_id=org_id))
+            cached = await crud_hospital.get_cached_hospital(db, hospital.hospital_id)
+            assert cached.etag == '"1"'
+            # Without If-Match the update is unconditional; SQLite needs a SELECT after the UPDATE, PostgreSQL RETURNING
+            with query_budget(2):
+                renamed = await crud_hospital.update_hospital(db, hospital.hospital_id, HospitalUpdate(name="St. Mary"))
+            assert renamed.version == 2 and renamed.name == "St. Mary"
+            assert (await crud_hospital.get_cached_hospital(db, hospital.hospital_id)).etag == '"2"'
+    hierarchy_cache.caches["hospitals"].clear()
+    asyncio.run(scenario())
+
+def test_delete_racing_an_update_is_a_conflict_not_a_server_error(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            org_id = org.organization_id
+            patient = await crud_patient.create_patient(db, PatientCreate(first_name="Ann", last_name="Lee", date_of_birth=date(1980, 1, 1),
+                                                                          organization_id=org_id))
+            patient_id = patient.patient_id
+            where = [PatientModel.organization_id == org_id, PatientModel.patient_id == patient_id]
+            # Another request updates the patient after this one loaded it at version 1; a Core UPDATE
+            # leaves the loaded copy as it was
+            await db.execute(update(PatientModel.__table__).where(*where).values(phone="555-0100", version=2))
+            await db.commit()
+            with pytest.raises(HTTPException) as conflict:
+                await crud_patient.delete_patient(db, patient_id, org_id)
+            assert conflict.value.status_code == 409 and conflict.value.headers["ETag"] == '"2"'
+
+            # The rollback expired the stale copy, so a retry deletes the current row
+            assert (await crud_patient.delete_patient(db, patient_id, org_id)).phone == "555-0100"
+
+            # A row deleted by someone else in between is reported as gone
+            patient = await crud_patient.create_patient(db, PatientCreate(first_name="Bo", last_name="Kim", date_of_birth=date(1975, 7, 8),
+                                                                          organization_id=org_id))
+            await db.execute(delete(PatientModel.__table__).where(PatientModel.patient_id == patient.patient_id))
+            await db.commit()
+            assert await delete_versioned(db, patient) is False
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import asyncio
+from sqlalchemy import event
+from app.crud.aio import organization as crud_organization
+from app.models.department import Department
+from app.models.hospital import Hospital
+from app.models.organization import Organization
+from app.models.provider import Provider
+from app.schemas.organization import OrganizationTree
+
+def test_tree_loads_in_one_query_per_level(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.flush()
+            for h in range(3):
+                hospital = Hospital(organization_id=org.organization_id, name=f"Hospital {h}", status="inactive" if h == 2 else "active")
+                db.add(hospital)
+                await db.flush()
+                for d in range(4):
+                    department = Department(hospital_id=hospital.hospital_id, name=f"Department {h}.{d}")
+                    db.add(department)
+                    await db.flush()
+                    for p in range(5):
+                        db.add(Provider(department_id=department.department_id, first_name="Pat", last_name=f"{h}.{d}.{p}",
+                                        email=f"p{h}{d}{p}@example.com"))
+            await db.commit()
+            organization_id = org.organization_id
+
+        async with async_session() as db:
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+            tree = OrganizationTree.from_orm(await crud_organization.get_organization_tree(db, organization_id))
+            assert len(statements) == 4
+            assert sorted(h.name for h in tree.hospitals) == ["Hospital 0", "Hospital 1", "Hospital 2"]
+            assert sum(len(d.providers) for h in tree.hospitals for d in h.departments) == 60
+
+            statements.clear()
+            active = OrganizationTree.from_orm(await crud_organization.get_organization_tree(db, organization_id, depth=1, status="active"))
+            assert len(statements) == 2
+            assert sorted(h.name for h in active.hospitals) == ["Hospital 0", "Hospital 1"]
+            assert all(h.departments == [] for h in active.hospitals)
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from uuid import uuid4
+import pytest
+from fastapi import HTTPException, Response
+from app.crud.aio import patient as crud_patient
+from app.models.organization import Organization
+from app.models.patient import Patient
+from app.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, set_next_cursor
+
+def test_cursor_round_trip():
+    patient = Patient(organization_id=uuid4(), patient_id=uuid4(), created_at=datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc))
+    cursor = encode_cursor(patient, crud_patient.KEYSET)
+    assert decode_cursor(cursor, crud_patient.KEYSET) == [patient.organization_id, patient.created_at, patient.patient_id]
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "e30", encode_cursor(Organization(organization_id=uuid4(), created_at=datetime(2024, 1, 1)), (Organization.created_at, Organization.organization_id))])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as excinfo:
+        decode_cursor(cursor, crud_patient.KEYSET)
+    assert excinfo.value.status_code == 400
+
+def test_keyset_pages_cover_every_row_once(async_session):
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.flush()
+            base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+            # Duplicate created_at values exercise the patient_id tie-breaker
+            db.add_all([
+                Patient(organization_id=org.organization_id, first_name=f"P{i}", last_name="Doe",
+                        date_of_birth=date(1990, 1, 1), created_at=base + timedelta(seconds=i // 3))
+                for i in range(10)
+            ])
+            await db.commit()
+
+            seen, after = [], None
+            while True:
+                response = Response()
+                page = await crud_patient.get_patients(db, org.organization_id, limit=4, after=after)
+                set_next_cursor(response, page, crud_patient.KEYSET, 4)
+                seen.extend(p.patient_id for p in page)
+                after = response.headers.get(NEXT_CURSOR_HEADER)
+                if after is None:
+                    break
+            assert len(seen) == len(set(seen)) == 10
+            assert seen == [p.patient_id for p in await crud_patient.get_patients(db, org.organization_id, limit=100)]
+    asyncio.run(scenario())
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.auth.hashing import PasswordHashingPool, hash_password_sync, verify_password_sync
+
+def test_pool_hashes_off_the_event_loop_and_caps_concurrency():
+    pool = PasswordHashingPool(kind="thread", workers=2, max_pending=10)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.get_event_loop().create_task(ticker())
+        hashed = await asyncio.gather(*(pool.run(hash_password_sync, f"pw{i}") for i in range(4)))
+        task.cancel()
+        return hashed, ticks
+    hashed, ticks = asyncio.run(scenario())
+    pool.shutdown()
+    assert all(verify_password_sync(f"pw{i}", h) for i, h in enumerate(hashed))
+    # The loop kept running while bcrypt worked in the background
+    assert ticks > 5
+    stats = pool.stats()
+    assert stats["completed"] == 4
+    assert stats["queued"] == 0 and stats["active"] == 0
+    assert stats["max_wait_ms"] > 0  # two calls had to wait for a free worker
+
+def test_pool_rejects_when_queue_is_full():
+    pool = PasswordHashingPool(kind="thread", workers=1, max_pending=1)
+
+    async def scenario():
+        first = asyncio.get_event_loop().create_task(pool.run(hash_password_sync, "pw"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as excinfo:
+            await pool.run(hash_password_sync, "pw")
+        await first
+        return excinfo.value
+    error = asyncio.run(scenario())
+    pool.shutdown()
+    assert error.status_code == 503
+    assert pool.stats()["rejected"] == 1
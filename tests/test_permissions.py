@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from app.auth.permissions import ALL_PERMISSIONS, Permission, permissions_for_role
+from app.auth.principal_cache import token_versions
+from app.auth.utils import create_access_token, get_principal, require_permissions, token_claims
+from app.crud.aio import user as crud_user
+from app.models.organization import Organization
+from app.schemas.user import RoleCreate, RoleUpdate, UserCreate, UserUpdate
+
+def test_role_permissions():
+    assert permissions_for_role("System Administrator") == ALL_PERMISSIONS
+    nurse = permissions_for_role("Nurse")
+    assert Permission.PATIENTS_WRITE in nurse and Permission.PATIENTS_DELETE not in nurse
+    assert permissions_for_role("Unknown") == Permission(0)
+
+def test_token_claims_authorize_without_user_lookup(async_session):
+    token_versions.clear()
+
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            nurse = await crud_user.create_role(db, RoleCreate(name="Nurse"))
+            clerk = await crud_user.create_role(db, RoleCreate(name="Medical Assistant"))
+            db_user = await crud_user.create_user(db, UserCreate(
+                username="jdoe", email="jdoe@example.com", first_name="Jane", last_name="Doe",
+                password="secret", organization_id=org.organization_id, role_id=nurse.role_id
+            ))
+            token = create_access_token(token_claims(db_user))
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+            principal = await get_principal(token=token, db=db)
+            assert principal.organization_id == org.organization_id
+            assert principal.has(Permission.PATIENTS_READ | Permission.HOSPITALS_READ)
+            assert len(statements) == 1 and "token_version" in statements[0]
+            statements.clear()
+            granted = await get_principal(token=token, db=db)
+            assert await require_permissions(Permission.PATIENTS_WRITE)(principal=granted) is granted
+            assert statements == []  # token version now cached
+
+            with pytest.raises(HTTPException) as denied:
+                await require_permissions(Permission.PATIENTS_DELETE)(principal=principal)
+            assert denied.value.status_code == 403
+
+            # Changing the role revokes the outstanding token
+            await crud_user.update_user(db, db_user.user_id, org.organization_id, UserUpdate(
+                username="jdoe", email="jdoe@example.com", first_name="Jane", last_name="Doe", role_id=clerk.role_id
+            ))
+            with pytest.raises(HTTPException) as revoked:
+                await get_principal(token=token, db=db)
+            assert revoked.value.status_code == 401
+
+            db_user = await crud_user.get_user(db, db_user.user_id, org.organization_id)
+            token = create_access_token(token_claims(db_user))
+            assert not (await get_principal(token=token, db=db)).has(Permission.HOSPITALS_READ)
+
+            # Saving unchanged fields keeps it valid; renaming the role revokes it
+            await crud_user.update_user(db, db_user.user_id, org.organization_id, UserUpdate(
+                username="jdoe", email="jdoe@example.com", first_name="Janet", last_name="Doe", role_id=clerk.role_id
+            ))
+            await get_principal(token=token, db=db)
+            await crud_user.update_role(db, clerk.role_id, RoleUpdate(name="Physician"))
+            with pytest.raises(HTTPException):
+                await get_principal(token=token, db=db)
+    asyncio.run(scenario())
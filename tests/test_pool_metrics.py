@@ -0,0 +1,41 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from app import database
+from app.metrics import Histogram, InstrumentedQueuePool, instrument
+
+def test_pool_metrics_count_waits_overflow_and_timeouts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=1, pool_timeout=0.05)
+    metrics = instrument(engine, "test")
+    first, second = engine.connect(), engine.connect()
+    busy = metrics.snapshot()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    first.close()
+    second.close()
+    engine.dispose()
+    with engine.connect():
+        pass
+    stats = metrics.snapshot()
+    assert busy["checked_out"] == 2 and busy["overflow"] == 1
+    assert stats["checkouts"] == 3 and stats["timeouts"] == 1 and stats["overflow_events"] == 1
+    assert stats["wait_seconds"]["count"] == 4 and stats["wait_seconds"]["buckets"]["0.05"] == 3
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.snapshot()["buckets"] == {"0.1": 2, "1.0": 3, "+Inf": 4}
+
+def test_engine_options():
+    assert database.engine_options("sqlite+aiosqlite:///test.db") == {}
+    options = database.engine_options("postgresql+asyncpg://db/infoctor", asynchronous=True)
+    assert options["pool_size"] == database.DB_POOL_SIZE and options["pool_pre_ping"] is database.DB_POOL_PRE_PING
+    assert options["connect_args"]["server_settings"]["statement_timeout"] == str(database.DB_STATEMENT_TIMEOUT_MS)
+    assert "statement_timeout" in database.engine_options("postgresql://db/infoctor")["connect_args"]["options"]
+
+def test_pool_timeout_is_served_as_503():
+    import main
+    response = asyncio.run(main.pool_timeout_handler(None, PoolTimeoutError()))
+    assert response.status_code == 503 and response.headers["retry-after"] == "1"
@@ -0,0 +1,61 @@
+import asyncio
+from sqlalchemy import event
+from app.auth.principal_cache import principal_cache
+from app.auth.utils import create_access_token, get_current_user
+from app.cache import TTLLRUCache
+from app.crud.aio import user as crud_user
+from app.models.organization import Organization
+from app.schemas.user import RoleCreate, RoleUpdate, UserCreate, UserUpdate
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_ttl_lru_cache_expiry_and_eviction():
+    clock = FakeClock()
+    cache = TTLLRUCache(max_size=2, ttl_seconds=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    clock.now = 11
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 2, 1, 1)
+
+def test_current_user_is_cached_and_invalidated(async_session):
+    principal_cache.clear()
+
+    async def scenario():
+        async with async_session() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+            role = await crud_user.create_role(db, RoleCreate(name="Nurse"))
+            db_user = await crud_user.create_user(db, UserCreate(
+                username="jdoe", email="jdoe@example.com", first_name="Jane", last_name="Doe",
+                password="secret", organization_id=org.organization_id, role_id=role.role_id
+            ))
+            token = create_access_token({"sub": "jdoe", "org": str(org.organization_id)})
+            statements = []
+            event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+            first = await get_current_user(token=token, db=db)
+            queries_on_miss = len(statements)
+            second = await get_current_user(token=token, db=db)
+            assert first.role.name == second.role.name == "Nurse"
+            assert len(statements) == queries_on_miss
+
+            await crud_user.update_user(db, db_user.user_id, org.organization_id, UserUpdate(
+                username="jdoe", email="jdoe@example.com", first_name="Janet", last_name="Doe"
+            ))
+            assert principal_cache.get("jdoe") is None
+            assert (await get_current_user(token=token, db=db)).first_name == "Janet"
+
+            await crud_user.update_role(db, role.role_id, RoleUpdate(name="Charge Nurse"))
+            assert (await get_current_user(token=token, db=db)).role.name == "Charge Nurse"
+    asyncio.run(scenario())
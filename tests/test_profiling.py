@@ -0,0 +1,59 @@
+import asyncio
+import json
+import logging
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import profiling
+
+def test_fingerprint_ignores_values():
+    first = profiling.fingerprint("SELECT * FROM patients WHERE id = $1 AND name = 'Ann' AND n IN ($2, $3) LIMIT 10")
+    second = profiling.fingerprint("SELECT *  FROM patients WHERE id = $1 AND name = 'O''Neil' AND n IN ($2, $3, $4) LIMIT 50")
+    assert first == second == "SELECT * FROM patients WHERE id = ? AND name = ? AND n IN (?+) LIMIT ?"
+
+def test_profile_header_flags_n_plus_one_and_slow_queries(sqlite_url, monkeypatch, caplog):
+    monkeypatch.setattr(profiling, "SLOW_QUERY_MS", 0)
+    engine = create_async_engine(sqlite_url)
+    profiling.profile_queries(engine)
+    app = FastAPI()
+    app.add_middleware(profiling.QueryProfileMiddleware, threshold=3)
+
+    @app.get("/items")
+    async def read_items():
+        async with engine.connect() as conn:
+            for i in range(4):
+                await conn.execute(text(f"SELECT {i}"))
+        return []
+
+    with caplog.at_level(logging.WARNING, logger="app.profiling"):
+        response = TestClient(app).get("/items")
+    asyncio.run(engine.dispose())
+    profile = json.loads(response.headers[profiling.QUERY_PROFILE_HEADER])
+    assert profile["queries"] == 4 and profile["slow"] == 4
+    assert profile["n_plus_one"] == [{"fingerprint": "SELECT ?", "count": 4}]
+    assert "Plan:" in caplog.text and "Possible N+1 in GET /items" in caplog.text
+
+@pytest.mark.query_budget(2)
+def test_query_budget_marker(sqlite_url):
+    async def scenario():
+        engine = create_async_engine(sqlite_url)
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+        await engine.dispose()
+    asyncio.run(scenario())
+
+def test_query_budget_fixture_fails_over_budget(sqlite_url, query_budget):
+    async def scenario(count):
+        engine = create_async_engine(sqlite_url)
+        async with engine.connect() as conn:
+            for i in range(count):
+                await conn.execute(text(f"SELECT {i}"))
+        await engine.dispose()
+    with query_budget(3):
+        asyncio.run(scenario(3))
+    with pytest.raises(pytest.fail.Exception, match="N\\+1: 3 x SELECT"):
+        with query_budget(5, n_plus_one=3):
+            asyncio.run(scenario(3))
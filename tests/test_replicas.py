@@ -0,0 +1,137 @@
+import asyncio
+import time
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app import replicas, sharding
+from app.crud.aio import patient as crud_patient
+from app.database import Base
+from app.models.organization import Organization
+from app.schemas.patient import PatientCreate
+
+def test_replica_selection_and_lag_fallback(tmp_path):
+    lags = {}
+
+    async def probe(replica):
+        if lags[replica.url] is None:
+            raise ConnectionError("replica down")
+        return lags[replica.url]
+
+    async def scenario():
+        urls = [f"sqlite+aiosqlite:///{tmp_path / name}.db" for name in ("r1", "r2")]
+        lags.update({urls[0]: 0.1, urls[1]: 0.5})
+        replica_set = replicas.ReplicaSet(urls, max_lag=1.0, check_interval=3600, lag_probe=probe)
+        await replica_set.check()
+        picks = [(await replica_set.choose()).url for _ in range(4)]
+        lags[urls[1]] = 30.0
+        await replica_set.check()
+        lagging = [(await replica_set.choose()).url for _ in range(2)]
+        lags[urls[0]] = None
+        await replica_set.check()
+        down = await replica_set.choose()
+
+        lags.update({urls[0]: 0.0, urls[1]: 0.0})
+        least = replicas.ReplicaSet(urls, strategy="least_connections", check_interval=3600, lag_probe=probe)
+        await least.check()
+        first = await least.choose()
+        async with first.session_factory() as db:
+            # Holds a connection on the first replica until the session closes
+            await db.connection()
+            second = await least.choose()
+        await replica_set.dispose()
+        await least.dispose()
+        return urls, picks, lagging, down, replica_set.fallbacks, first.url, second.url
+
+    urls, picks, lagging, down, fallbacks, first, second = asyncio.run(scenario())
+    assert picks == [urls[0], urls[1], urls[0], urls[1]]
+    assert lagging == [urls[0], urls[0]]
+    assert down is None and fallbacks == 1
+    assert first != second
+
+def test_lag_is_probed_in_the_background_not_by_choose(tmp_path):
+    calls = []
+
+    async def hanging_probe(replica):
+        calls.append(replica.url)
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        replica_set = replicas.ReplicaSet([f"sqlite+aiosqlite:///{tmp_path / 'r1'}.db"], check_interval=3600, lag_timeout=0.05, lag_probe=hanging_probe)
+        started = time.perf_counter()
+        # Nothing measured yet: the primary serves the read while the monitor starts probing
+        chosen = await replica_set.choose()
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.1)
+        probed, lag = list(calls), replica_set.replicas[0].lag
+        await replica_set.dispose()
+        return chosen, elapsed, probed, lag
+
+    chosen, elapsed, probed, lag = asyncio.run(scenario())
+    assert chosen is None and elapsed < 0.05
+    # The probe timed out in the background and the replica stays unusable
+    assert len(probed) == 1 and lag is None
+
+def test_reads_after_a_write_stick_to_the_primary(tmp_path):
+    primary, replica = (f"sqlite+aiosqlite:///{tmp_path / name}.db" for name in ("primary", "replica"))
+
+    async def probe(_):
+        return 0.0
+
+    async def scenario():
+        engines = [create_async_engine(url) for url in (primary, replica)]
+        for engine in engines:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        directory = sessionmaker(engines[0], class_=AsyncSession, expire_on_commit=False)
+        router = sharding.ShardRouter({"main": {"primary": primary, "replicas": [replica]}}, directory, default_shard="main", directory_url=primary)
+        router._replica_sets["main"] = replicas.ReplicaSet([replica], check_interval=3600, lag_probe=probe)
+        await router._replica_sets["main"].check()
+        async with directory() as db:
+            org = Organization(name="Acme Health")
+            db.add(org)
+            await db.commit()
+        org_id = org.organization_id
+        before = (await router.tenant_session(org_id, read_only=True, user="alice")).info["replica"]
+        async with await router.tenant_session(org_id, user="alice") as db:
+            await crud_patient.create_patient(db, PatientCreate(organization_id=org_id, first_name="Jane", last_name="Doe", date_of_birth=date(1990, 1, 1)))
+        async with await router.tenant_session(org_id, read_only=True, user="alice") as db:
+            after = db.info["replica"]
+            seen = len(await crud_patient.get_patients(db, org_id))
+        other = (await router.tenant_session(org_id, read_only=True, user="bob")).info["replica"]
+        await router.dispose()
+        for engine in engines:
+            await engine.dispose()
+        return before, after, seen, other
+
+    before, after, seen, other = asyncio.run(scenario())
+    assert before == replica and other == replica
+    assert after is None and seen == 1
+
+def test_stale_lag_readings_are_not_trusted_and_a_dead_monitor_is_restarted(tmp_path):
+    now = [0.0]
+    calls = []
+
+    async def probe(replica):
+        calls.append(now[0])
+        return 0.0
+
+    async def scenario():
+        replica_set = replicas.ReplicaSet([f"sqlite+aiosqlite:///{tmp_path / 'r1'}.db"], check_interval=10, lag_probe=probe, clock=lambda: now[0])
+        await replica_set.check()
+        # Keep the monitor from probing while the clock is moved by hand
+        replica_set._monitor = asyncio.get_event_loop().create_task(asyncio.sleep(3600))
+        fresh = await replica_set.choose()
+        now[0] = 21.0
+        stale = await replica_set.choose()
+        replica_set._monitor.cancel()
+        await asyncio.sleep(0)
+        # The finished monitor is replaced and measures again
+        restarted = await replica_set.choose()
+        await asyncio.sleep(0.01)
+        recovered = await replica_set.choose()
+        await replica_set.dispose()
+        return fresh, stale, restarted, recovered
+
+    fresh, stale, restarted, recovered = asyncio.run(scenario())
+    assert fresh is not None and stale is None and restarted is None
+    assert recovered is not None and calls == [0.0, 21.0]
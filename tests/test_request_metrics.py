@@ -0,0 +1,36 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app import metrics
+
+def test_requests_are_timed_per_route_with_their_queries(sqlite_url):
+    engine = create_async_engine(sqlite_url)
+    metrics.track_queries(engine, "test")
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        async with engine.connect() as conn:
+            for _ in range(3):
+                await conn.execute(text("SELECT 1"))
+        return {"item_id": item_id}
+
+    client = TestClient(app)
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/missing").status_code == 404
+    asyncio.run(engine.dispose())
+
+    route = metrics.ROUTES[("GET", "/items/{item_id}")]
+    assert route.latency.count == 2 and route.responses[200] == 2
+    assert route.db_queries.sum == 6 and route.db_seconds.sum > 0
+    assert metrics.ROUTES[("GET", "unmatched")].responses[404] >= 1
+    assert metrics.QUERIES["test"].count >= 6
+
+    exposition = metrics.render_prometheus()
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2' in exposition
+    assert 'http_request_db_queries_sum{method="GET",route="/items/{item_id}"} 6' in exposition
+    assert "# TYPE db_query_duration_seconds histogram" in exposition
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import date
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+from app import database, sharding
+from app.crud.aio import patient as crud_patient
+from app.database import Base
+from app.models.organization import Organization
+from app.models.patient import Patient, PatientBlockingKey
+from app.schemas.patient import PatientCreate
+
+def test_parameter_chunks_stay_under_the_bind_limit():
+    rows = list(range(5000))
+    chunks = list(database.parameter_chunks(rows, 13))
+    assert max(len(chunk) for chunk in chunks) * 13 <= database.MAX_BIND_PARAMETERS
+    assert [row for chunk in chunks for row in chunk] == rows
+
+def test_move_tenant_between_shards(tmp_path, monkeypatch):
+    # Small enough that every copied batch is split into several INSERTs
+    monkeypatch.setattr(database, "MAX_BIND_PARAMETERS", 20)
+    urls = {name: f"sqlite+aiosqlite:///{tmp_path / name}.db" for name in ("directory", "a", "b")}
+
+    async def scenario():
+        engine = create_async_engine(urls["directory"])
+        for url in urls.values():
+            shard_engine = create_async_engine(url)
+            async with shard_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            await shard_engine.dispose()
+        directory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        router = sharding.ShardRouter({"a": urls["a"], "b": urls["b"]}, directory, default_shard="a", cache_ttl=60, directory_url=urls["directory"])
+        async with directory() as db:
+            acme, other = Organization(name="Acme Health"), Organization(name="Other Clinic")
+            db.add_all([acme, other])
+            await db.commit()
+        org_id = acme.organization_id
+        placed = [await router.provision(org_id), await router.provision(other.organization_id)]
+        async with await router.tenant_session(org_id) as db:
+            for i in range(3):
+                await crud_patient.create_patient(db, PatientCreate(organization_id=org_id, first_name=f"P{i}", last_name="Doe", date_of_birth=date(1990, 1, i + 1)))
+
+        await router.set_assignment(org_id, "a", "moving")
+        with pytest.raises(HTTPException) as moving:
+            await router.tenant_session(org_id)
+        await router.set_assignment(org_id, "a")
+
+        report = await sharding.move_tenant(router, org_id, "b", batch_size=2, drain_seconds=0)
+        async with await router.tenant_session(org_id) as db:
+            shard = db.info["shard"]
+            moved = len(await crud_patient.get_patients(db, org_id))
+        async with router.session_factory("a")() as db:
+            left = (await db.execute(select(Patient.patient_id))).all() + (await db.execute(select(PatientBlockingKey.patient_id))).all()
+        await router.dispose()
+        await engine.dispose()
+        return placed, moving.value, report, shard, moved, left
+
+    placed, moving, report, shard, moved, left = asyncio.run(scenario())
+    assert placed == ["a", "b"]
+    assert moving.status_code == 503 and "Retry-After" in moving.headers
+    assert report["moved"] and report["rows"] == {"patients": 3, "patient_blocking_keys": 6}
+    assert shard == "b" and moved == 3
+    assert left == []
+
+def test_load_shard_map(tmp_path):
+    path = tmp_path / "shards.json"
+    path.write_text('{"a": "postgresql+asyncpg://db-a/infoctor"}')
+    assert sharding.load_shard_map(str(path)) == {"a": "postgresql+asyncpg://db-a/infoctor"}
+    assert sharding.load_shard_map('{"b": "x"}') == {"b": "x"}
+    assert sharding.load_shard_map(None, "main")["main"]["primary"] == sharding.ASYNC_SQLALCHEMY_DATABASE_URL
+    with pytest.raises(ValueError):
+        sharding.ShardRouter({"a": "x"}, default_shard="main")